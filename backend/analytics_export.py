@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Collections copied into the snapshot, with fields left out (query-only or bulky derived data)
+SNAPSHOT_COLLECTIONS: Dict[str, List[str]] = {
+    "leads": ["search_prefixes", "dedup_keys"],
+    "pricing_plans": [],
+    "quotations": [],
+    "agreements": [],
+    "projects": [],
+    "consultant_assignments": [],
+    "meetings": [],
+    "tasks": [],
+}
+
+PARTITION_COLUMN = "updated_month"
+STATE_FILE = "_export_state.json"
+
+def is_date_column(name: str) -> bool:
+    return name.endswith("_at") or name.endswith("_date")
+
+def _to_cell(value):
+    # Nested documents and arrays become JSON text; Parquet schemas must stay stable across batches
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str, sort_keys=True)
+    return value
+
+def to_frame(documents: List[dict]) -> pd.DataFrame:
+    """
+    One batch of documents as a typed frame: `*_at` / `*_date` columns as UTC timestamps,
+    nested values as JSON strings, mixed-type columns as strings, plus the partition column.
+    """
+    frame = pd.DataFrame.from_records(documents)
+    for column in frame.columns:
+        if is_date_column(column):
+            frame[column] = pd.to_datetime(frame[column], utc=True, errors="coerce", format="ISO8601")
+        elif frame[column].dtype == object:
+            values = frame[column].map(_to_cell)
+            kinds = {type(v) for v in values.dropna()}
+            frame[column] = values.astype("string") if len(kinds) > 1 or str in kinds else values
+
+    changed = frame["updated_at"] if "updated_at" in frame else pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns, UTC]")
+    if "created_at" in frame:
+        changed = changed.fillna(frame["created_at"])
+    frame[PARTITION_COLUMN] = changed.dt.strftime("%Y-%m").fillna("unknown")
+    return frame
+
+def change_filter(since: Optional[str], until: str) -> dict:
+    """Documents changed in (since, until]; insert-only collections only carry created_at"""
+    window = {"$lte": until}
+    if since:
+        window["$gt"] = since
+    return {"$or": [
+        {"updated_at": window},
+        {"updated_at": {"$exists": False}, "created_at": window}
+    ]}
+
+def load_state(root: Path) -> dict:
+    path = root / STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+def save_state(root: Path, state: dict):
+    tmp = root / f"{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    os.replace(tmp, root / STATE_FILE)
+
+async def export_collection(
+    db,
+    name: str,
+    root: Path,
+    since: Optional[str],
+    until: str,
+    batch_size: int = 5000
+) -> int:
+    """
+    Stream one collection into `root/<name>/updated_month=YYYY-MM/*.parquet`, one file per
+    batch and partition. With `since`, only documents changed after it are appended; a
+    full export is written next to the old copy and swapped in when complete.
+    """
+    projection = {"_id": 0, **{field: 0 for field in SNAPSHOT_COLLECTIONS[name]}}
+    run_id = uuid.uuid4().hex[:12]
+    target = root / name
+    out = target if since else root / f".{name}.{run_id}.tmp"
+
+    exported = 0
+    batch = []
+    part = 0
+    cursor = db[name].find(change_filter(since, until), projection).batch_size(batch_size)
+
+    def flush(documents, part):
+        table = pa.Table.from_pandas(to_frame(documents), preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=str(out),
+            partition_cols=[PARTITION_COLUMN],
+            basename_template=f"{run_id}-{part:05d}-{{i}}.parquet"
+        )
+
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            flush(batch, part)
+            exported += len(batch)
+            part += 1
+            batch = []
+    if batch:
+        flush(batch, part)
+        exported += len(batch)
+
+    if not since:
+        if target.exists():
+            shutil.rmtree(target)
+        if out.exists():
+            os.replace(out, target)
+    return exported
+
+async def export_snapshot(
+    db,
+    root: str,
+    collections: Optional[Iterable[str]] = None,
+    incremental: bool = True,
+    batch_size: int = 5000
+) -> dict:
+    """
+    Export the snapshot collections to Parquet under `root`.
+
+    Incremental runs append documents whose updated_at (or created_at) is newer than the
+    previous run of that collection; a collection without a previous run is exported in
+    full. Each run stops at its own start time so writes made during the export are
+    picked up by the next one. Hard deletes are only reflected by a full export, and so
+    are writes that do not bump updated_at (every update to these collections should).
+    """
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    state = load_state(root_path)
+    summary = {}
+    for name in collections or SNAPSHOT_COLLECTIONS:
+        if name not in SNAPSHOT_COLLECTIONS:
+            raise ValueError(f"Unknown snapshot collection: {name}")
+        until = datetime.now(timezone.utc).isoformat()
+        since = state.get(name, {}).get("watermark") if incremental else None
+        count = await export_collection(db, name, root_path, since, until, batch_size)
+        state[name] = {"watermark": until, "mode": "incremental" if since else "full", "documents": count}
+        # Saved per collection so an interrupted run keeps the collections it finished
+        save_state(root_path, state)
+        summary[name] = state[name]
+    return summary
+
+def read_snapshot(root: str, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load one exported collection, keeping only the latest version of each document
+    (incremental runs append a new row every time a document changes)
+    """
+    path = str(Path(root) / name)
+    if not Path(path).exists():
+        # Nothing exported yet, or a full export of an empty collection
+        return pd.DataFrame(columns=columns or [])
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    # Batches can differ in columns (fields added over time) or null-only types; merge them
+    schema = pa.unify_schemas(
+        [fragment.physical_schema for fragment in dataset.get_fragments()] + [dataset.partitioning.schema],
+        promote_options="permissive"
+    )
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", schema=schema)
+    keys = {"id", "updated_at", "created_at"} & set(schema.names)
+    wanted = None if columns is None else sorted(set(columns) | keys)
+    frame = dataset.to_table(columns=wanted).to_pandas()
+    order = [c for c in ("updated_at", "created_at") if c in frame]
+    if order and "id" in frame:
+        frame = frame.sort_values(order).drop_duplicates("id", keep="last")
+    return frame.reset_index(drop=True)
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CONSULTANT_ROLES = ["consultant", "principal_consultant", "project_manager"]
+MODES = ["online", "offline", "mixed"]
+
+# Relative weight of each score component in the final ranking
+RECOMMENDATION_WEIGHTS = {
+    "bandwidth": 0.35,
+    "specialization": 0.35,
+    "meeting_load": 0.15,
+    "mode": 0.15
+}
+
+def _timestamp(value) -> Optional[float]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class ConsultantRecommender:
+    """
+    Ranks consultants for a project from an in-memory feature matrix.
+
+    The matrix (one row per active consultant) is rebuilt lazily from Mongo when
+    it has been marked dirty by an assignment/profile change or is older than
+    `ttl_seconds`; ranking itself is a handful of vectorized NumPy operations.
+    """
+
+    def __init__(self, bandwidth_limits: Dict[str, int], ttl_seconds: float = 300):
+        self.bandwidth_limits = bandwidth_limits
+        self.ttl_seconds = ttl_seconds
+        self._dirty = True
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+        self.consultants: List[dict] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.max_projects = np.zeros(0)
+        self.active_projects = np.zeros(0)
+        self.meeting_load = np.zeros(0)
+        self.mode = np.zeros(0, dtype=np.int8)
+        self.specializations = np.zeros((0, 0), dtype=bool)
+        self.assignment_ends = np.zeros((0, 0))
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    async def ensure_fresh(self, db):
+        if not self._dirty and time.monotonic() - self._built_at < self.ttl_seconds:
+            return
+        async with self._lock:
+            if not self._dirty and time.monotonic() - self._built_at < self.ttl_seconds:
+                return
+            # Clear first so changes made while rebuilding mark the matrix dirty again
+            self._dirty = False
+            await self._rebuild(db)
+            self._built_at = time.monotonic()
+
+    async def _rebuild(self, db):
+        users = await db.users.find(
+            {"role": {"$in": CONSULTANT_ROLES}, "is_active": True},
+            {"_id": 0, "id": 1, "full_name": 1, "email": 1, "role": 1}
+        ).to_list(None)
+        ids = [u['id'] for u in users]
+
+        profiles = {
+            p['user_id']: p
+            for p in await db.consultant_profiles.find(
+                {"user_id": {"$in": ids}},
+                {"_id": 0, "user_id": 1, "specializations": 1, "preferred_mode": 1, "max_projects": 1}
+            ).to_list(None)
+        }
+
+        # Active assignments per consultant with the end date of each project
+        workload = {
+            row['_id']: row
+            for row in await db.consultant_assignments.aggregate([
+                {"$match": {"consultant_id": {"$in": ids}, "is_active": True}},
+                {"$lookup": {
+                    "from": "projects",
+                    "localField": "project_id",
+                    "foreignField": "id",
+                    "as": "project"
+                }},
+                {"$group": {
+                    "_id": "$consultant_id",
+                    "active": {"$sum": 1},
+                    "meeting_load": {"$sum": {"$subtract": [
+                        {"$ifNull": ["$meetings_committed", 0]},
+                        {"$ifNull": ["$meetings_completed", 0]}
+                    ]}},
+                    "end_dates": {"$push": {"$arrayElemAt": ["$project.end_date", 0]}}
+                }}
+            ]).to_list(None)
+        }
+
+        vocabulary: Dict[str, int] = {}
+        for profile in profiles.values():
+            for spec in profile.get('specializations') or []:
+                vocabulary.setdefault(spec.strip().lower(), len(vocabulary))
+
+        n = len(users)
+        widest = max((len(w['end_dates']) for w in workload.values()), default=0)
+        max_projects = np.zeros(n)
+        active = np.zeros(n)
+        load = np.zeros(n)
+        mode = np.zeros(n, dtype=np.int8)
+        specs = np.zeros((n, len(vocabulary)), dtype=bool)
+        # Padded with +inf: an assignment without a known end date never frees its slot
+        ends = np.full((n, widest), np.inf)
+
+        for row, user in enumerate(users):
+            profile = profiles.get(user['id'], {})
+            preferred = profile.get('preferred_mode') or "mixed"
+            mode[row] = MODES.index(preferred) if preferred in MODES else MODES.index("mixed")
+            max_projects[row] = profile.get('max_projects') or self.bandwidth_limits.get(preferred, 8)
+            for spec in profile.get('specializations') or []:
+                specs[row, vocabulary[spec.strip().lower()]] = True
+
+            stats = workload.get(user['id'])
+            if stats:
+                active[row] = stats['active']
+                load[row] = max(stats['meeting_load'], 0)
+                for col, end in enumerate(stats['end_dates']):
+                    ts = _timestamp(end)
+                    if ts is not None:
+                        ends[row, col] = ts
+
+        self.consultants = users
+        self.vocabulary = vocabulary
+        self.max_projects = max_projects
+        self.active_projects = active
+        self.meeting_load = load
+        self.mode = mode
+        self.specializations = specs
+        self.assignment_ends = ends
+
+    def recommend(
+        self,
+        project_type: Optional[str] = None,
+        categories: Optional[List[str]] = None,
+        start_date=None,
+        limit: int = 10,
+        include_unavailable: bool = False
+    ) -> List[dict]:
+        """Top `limit` consultants for the given project profile, best first"""
+        if not self.consultants:
+            return []
+
+        # Slots held by projects that end before the new project starts count as free
+        start_ts = _timestamp(start_date)
+        freed = (self.assignment_ends < start_ts).sum(axis=1) if start_ts and self.assignment_ends.size else 0
+        remaining = self.max_projects - self.active_projects + freed
+        bandwidth = np.clip(remaining / np.maximum(self.max_projects, 1), 0, 1)
+
+        wanted = list(dict.fromkeys(c.strip().lower() for c in categories or [] if c.strip()))
+        columns = [self.vocabulary[c] for c in wanted if c in self.vocabulary]
+        if wanted:
+            matched = self.specializations[:, columns]
+            specialization = matched.sum(axis=1) / len(wanted)
+        else:
+            matched = np.zeros((len(self.consultants), 0), dtype=bool)
+            specialization = np.zeros(len(self.consultants))
+
+        meeting_load = 1 - self.meeting_load / max(self.meeting_load.max(), 1)
+
+        mixed = MODES.index("mixed")
+        if project_type in MODES:
+            wanted_mode = MODES.index(project_type)
+            mode = np.where(self.mode == wanted_mode, 1.0, np.where((self.mode == mixed) | (wanted_mode == mixed), 0.5, 0.0))
+        else:
+            mode = np.full(len(self.consultants), 0.5)
+
+        components = {
+            "bandwidth": bandwidth,
+            "specialization": specialization,
+            "meeting_load": meeting_load,
+            "mode": mode
+        }
+        score = sum(RECOMMENDATION_WEIGHTS[name] * values for name, values in components.items())
+
+        candidates = np.arange(len(self.consultants))
+        if not include_unavailable:
+            candidates = candidates[remaining[candidates] > 0]
+        ranked = candidates[np.argsort(-score[candidates], kind="stable")][:limit]
+
+        matched_names = [c for c in wanted if c in self.vocabulary]
+        results = []
+        for row in ranked:
+            consultant = self.consultants[row]
+            results.append({
+                "consultant_id": consultant['id'],
+                "full_name": consultant.get('full_name'),
+                "email": consultant.get('email'),
+                "role": consultant.get('role'),
+                "score": round(float(score[row]), 4),
+                "remaining_slots": int(remaining[row]),
+                "max_projects": int(self.max_projects[row]),
+                "meeting_load": int(self.meeting_load[row]),
+                "preferred_mode": MODES[self.mode[row]],
+                "matched_specializations": [name for name, hit in zip(matched_names, matched[row]) if hit],
+                "components": {name: round(float(values[row]), 4) for name, values in components.items()}
+            })
+        return results
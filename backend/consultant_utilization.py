@@ -0,0 +1,218 @@
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta, date
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+CONSULTANT_ROLES = ["consultant", "principal_consultant", "project_manager"]
+
+# Projects without an end date are assumed to run this long when spreading commitments
+DEFAULT_PROJECT_WEEKS = 12
+
+def week_start(value) -> Optional[date]:
+    """Monday of the ISO week containing `value` (datetime, date or ISO string)"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        value = value.date()
+    return value - timedelta(days=value.weekday())
+
+def week_range(first: date, last: date) -> List[date]:
+    return [first + timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+
+def utilization_summary(row: dict) -> dict:
+    """Add derived ratios to a weekly rollup row"""
+    committed = row.get('committed', 0)
+    capacity = row.get('max_projects', 0)
+    return {
+        **row,
+        "committed": round(committed, 2),
+        "delivery_rate": round(row.get('delivered', 0) / committed, 3) if committed else None,
+        "load": round(row.get('projects', 0) / capacity, 3) if capacity else None
+    }
+
+async def rebuild_utilization_rollups(
+    db,
+    bandwidth_limits: Dict[str, int],
+    weeks_back: int = 26,
+    weeks_ahead: int = 26,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Recompute consultant_utilization_weekly for [now - weeks_back, now + weeks_ahead].
+
+    Per consultant and ISO week it stores:
+    - committed: meetings_committed of each assignment spread evenly over its
+      project's weeks from when it was assigned (this is what projects load forward);
+      an ended assignment keeps counting for the weeks up to when it was deactivated,
+      so unassigning a consultant does not rewrite their past weeks
+    - delivered / scheduled: meetings held / planned that week on those projects
+    - projects: number of assigned projects running that week, with max_projects
+      for the capacity ratio
+
+    Rows are upserted under a new build id and rows from older builds are removed,
+    so readers never see a half-empty collection.
+    """
+    now = now or datetime.now(timezone.utc)
+    current = week_start(now)
+    first, last = current - timedelta(weeks=weeks_back), current + timedelta(weeks=weeks_ahead)
+    window = set(week_range(first, last))
+
+    consultants = await db.users.find(
+        {"role": {"$in": CONSULTANT_ROLES}, "is_active": True},
+        {"_id": 0, "id": 1}
+    ).to_list(None)
+    consultant_ids = [c['id'] for c in consultants]
+    profiles = {
+        p['user_id']: p
+        for p in await db.consultant_profiles.find(
+            {"user_id": {"$in": consultant_ids}},
+            {"_id": 0, "user_id": 1, "max_projects": 1, "preferred_mode": 1}
+        ).to_list(None)
+    }
+
+    # Deactivation only sets is_active=False and updated_at, so that marks when the assignment ended
+    assignments = await db.consultant_assignments.find(
+        {
+            "consultant_id": {"$in": consultant_ids},
+            "$or": [{"is_active": True}, {"updated_at": {"$gte": first.isoformat()}}]
+        },
+        {
+            "_id": 0, "consultant_id": 1, "project_id": 1, "meetings_committed": 1,
+            "is_active": 1, "assigned_date": 1, "updated_at": 1
+        }
+    ).to_list(None)
+    project_ids = list({a['project_id'] for a in assignments})
+    projects = {
+        p['id']: p
+        for p in await db.projects.find(
+            {"id": {"$in": project_ids}},
+            {"_id": 0, "id": 1, "start_date": 1, "end_date": 1}
+        ).to_list(None)
+    }
+
+    rows = defaultdict(lambda: {"committed": 0.0, "delivered": 0, "scheduled": 0, "projects": 0})
+    # (project_id, week) -> consultants assigned to the project that week
+    consultants_by_week = defaultdict(set)
+
+    for assignment in assignments:
+        project = projects.get(assignment['project_id'])
+        if not project:
+            continue
+        consultant_id = assignment['consultant_id']
+
+        start = week_start(project.get('start_date')) or current
+        end = week_start(project.get('end_date')) or start + timedelta(weeks=DEFAULT_PROJECT_WEEKS - 1)
+        start = max(start, week_start(assignment.get('assigned_date')) or start)
+        if end < start:
+            end = start
+        weeks = week_range(start, end)
+        per_week = (assignment.get('meetings_committed') or 0) / len(weeks)
+        if not assignment.get('is_active', True):
+            ended = week_start(assignment.get('updated_at')) or current
+            weeks = [week for week in weeks if week <= ended]
+        for week in weeks:
+            consultants_by_week[(project['id'], week)].add(consultant_id)
+            if week in window:
+                row = rows[(consultant_id, week)]
+                row['committed'] += per_week
+                row['projects'] += 1
+
+    # Meetings are attributed to assigned consultants who attended, else to every consultant on the project
+    async for meeting in db.meetings.find(
+        {
+            "project_id": {"$in": project_ids},
+            "meeting_date": {"$gte": first.isoformat(), "$lt": (last + timedelta(weeks=1)).isoformat()}
+        },
+        {"_id": 0, "project_id": 1, "meeting_date": 1, "is_delivered": 1, "attendees": 1}
+    ):
+        week = week_start(meeting.get('meeting_date'))
+        if week not in window:
+            continue
+        assigned = consultants_by_week[(meeting['project_id'], week)]
+        attendees = assigned & set(meeting.get('attendees') or [])
+        for consultant_id in attendees or assigned:
+            rows[(consultant_id, week)]['delivered' if meeting.get('is_delivered') else 'scheduled'] += 1
+
+    build_id = str(uuid.uuid4())
+    updated_at = now.isoformat()
+    operations = []
+    for (consultant_id, week), row in rows.items():
+        profile = profiles.get(consultant_id, {})
+        max_projects = profile.get('max_projects') or bandwidth_limits.get(profile.get('preferred_mode') or "mixed", 8)
+        operations.append(UpdateOne(
+            {"consultant_id": consultant_id, "week_start": week.isoformat()},
+            {"$set": {
+                **row,
+                "committed": round(row['committed'], 3),
+                "max_projects": max_projects,
+                "is_projection": week > current,
+                "build_id": build_id,
+                "updated_at": updated_at
+            }},
+            upsert=True
+        ))
+
+    collection = db.consultant_utilization_weekly
+    for i in range(0, len(operations), 1000):
+        await collection.bulk_write(operations[i:i + 1000], ordered=False)
+    await collection.delete_many({"build_id": {"$ne": build_id}})
+    return len(operations)
+
+async def get_consultant_utilization(db, consultant_id: str, first: date, last: date) -> List[dict]:
+    """Weekly rollups for one consultant, oldest first"""
+    rows = await db.consultant_utilization_weekly.find(
+        {
+            "consultant_id": consultant_id,
+            "week_start": {"$gte": first.isoformat(), "$lte": last.isoformat()}
+        },
+        {"_id": 0, "build_id": 0, "consultant_id": 0}
+    ).sort("week_start", 1).to_list(None)
+    return [utilization_summary(row) for row in rows]
+
+async def get_team_utilization(db, first: date, last: date, bandwidth_limits: Dict[str, int]) -> List[dict]:
+    """
+    Weekly rollups summed over all consultants, oldest first. Load is measured
+    against the whole team's max_projects since idle consultants have no rows.
+    """
+    consultant_ids = [
+        c['id'] for c in await db.users.find(
+            {"role": {"$in": CONSULTANT_ROLES}, "is_active": True},
+            {"_id": 0, "id": 1}
+        ).to_list(None)
+    ]
+    profiles = {
+        p['user_id']: p
+        for p in await db.consultant_profiles.find(
+            {"user_id": {"$in": consultant_ids}},
+            {"_id": 0, "user_id": 1, "max_projects": 1}
+        ).to_list(None)
+    }
+    team_capacity = sum(
+        profiles.get(cid, {}).get('max_projects') or bandwidth_limits.get("mixed", 8)
+        for cid in consultant_ids
+    )
+
+    rows = await db.consultant_utilization_weekly.aggregate([
+        {"$match": {"week_start": {"$gte": first.isoformat(), "$lte": last.isoformat()}}},
+        {"$group": {
+            "_id": "$week_start",
+            "committed": {"$sum": "$committed"},
+            "delivered": {"$sum": "$delivered"},
+            "scheduled": {"$sum": "$scheduled"},
+            "projects": {"$sum": "$projects"},
+            "consultants": {"$sum": 1},
+            "is_projection": {"$max": "$is_projection"}
+        }},
+        {"$sort": {"_id": 1}},
+        {"$project": {
+            "_id": 0, "week_start": "$_id", "committed": 1, "delivered": 1, "scheduled": 1,
+            "projects": 1, "consultants": 1, "is_projection": 1
+        }}
+    ]).to_list(None)
+    return [utilization_summary({**row, "max_projects": team_capacity}) for row in rows]
@@ -0,0 +1,239 @@
+import uuid
+from datetime import datetime, timezone
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from lead_search import words, phone_digits
+
+# Pairs scoring at or above this are reported as duplicates
+DUPLICATE_THRESHOLD = 0.85
+
+# Without a shared email/phone, names must be at least this similar before the company counts;
+# otherwise colleagues at one company ("Amit Kumar" / "Sumit Kumar") look like duplicates
+NAME_MATCH_MIN = 0.9
+
+# Subtracted when both leads have an email (or phone) and they differ: likely two people
+CONTACT_CONFLICT_PENALTY = 0.3
+
+# Blocks larger than this (e.g. a very common name) are skipped by the batch scan; the
+# email/phone blocks still catch the real duplicates inside them
+MAX_BLOCK_SIZE = 200
+
+# The batch scan loads leads for roughly this many block members per query, so neither the
+# $in list nor the in-memory lead dict ever approaches the whole collection
+SCAN_FETCH_BATCH = 5000
+
+DEDUP_FIELDS = ("first_name", "last_name", "company", "email", "phone")
+
+# Legal-form and filler words that do not tell companies apart
+COMPANY_STOPWORDS = {
+    "the", "pvt", "private", "ltd", "limited", "llp", "llc", "inc", "incorporated",
+    "corp", "corporation", "co", "company", "plc", "gmbh", "pte", "and"
+}
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lower-cased address without +tags (and without dots for Gmail)"""
+    if not email or "@" not in email:
+        return None
+    local, domain = email.strip().lower().rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}" if local else None
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """National number ("+91-98765-43210" and "9876543210" -> "9876543210"); None if too short"""
+    digits = phone_digits(phone)
+    return digits if len(digits) >= 7 else None
+
+def normalize_company(company: Optional[str]) -> str:
+    """Company words without legal forms ("TechVision India Pvt Ltd" -> "techvision india")"""
+    return " ".join(w for w in words(company) if w not in COMPANY_STOPWORDS)
+
+def normalize_name(lead: dict) -> str:
+    return " ".join(words(lead.get("first_name")) + words(lead.get("last_name")))
+
+def dedup_keys(lead: dict) -> List[str]:
+    """
+    Blocking keys: leads are only compared with leads sharing at least one key.
+    Exact email/phone catch reformatted contact details; the company and name keys
+    are deliberately coarse so spelling variants still land in the same block.
+    """
+    keys = []
+    email = normalize_email(lead.get("email"))
+    if email:
+        keys.append(f"e:{email}")
+    phone = normalize_phone(lead.get("phone"))
+    if phone:
+        keys.append(f"p:{phone}")
+    company = normalize_company(lead.get("company")).replace(" ", "")
+    if company:
+        keys.append(f"c:{company[:6]}")
+    first, last = words(lead.get("first_name")), words(lead.get("last_name"))
+    if first and last:
+        keys.append(f"n:{last[-1][:4]}:{first[0][0]}")
+    return keys
+
+def _similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+def match_score(a: dict, b: dict) -> Tuple[float, List[str]]:
+    """Similarity of two leads in [0, 1] and the fields that drove it"""
+    email_a, email_b = normalize_email(a.get("email")), normalize_email(b.get("email"))
+    if email_a and email_a == email_b:
+        return 1.0, ["email"]
+    phone_a, phone_b = normalize_phone(a.get("phone")), normalize_phone(b.get("phone"))
+    name = _similarity(normalize_name(a), normalize_name(b))
+    company = _similarity(normalize_company(a.get("company")), normalize_company(b.get("company")))
+
+    if phone_a and phone_a == phone_b:
+        # Same number: a duplicate unless the names clearly differ (shared office lines)
+        score, reasons = 0.6 + 0.4 * name, ["phone"]
+    elif name >= NAME_MATCH_MIN:
+        score = 0.6 * name + 0.4 * company
+        reasons = ["name"] + (["company"] if company >= DUPLICATE_THRESHOLD else [])
+    else:
+        score, reasons = 0.6 * name, []
+
+    if (email_a and email_b and email_a != email_b) or (phone_a and phone_b and phone_a != phone_b):
+        score -= CONTACT_CONFLICT_PENALTY
+    return round(max(score, 0.0), 3), reasons
+
+DEDUP_PROJECTION = {
+    "_id": 0, "id": 1, "first_name": 1, "last_name": 1, "company": 1, "email": 1, "phone": 1,
+    "assigned_to": 1, "created_by": 1, "created_at": 1
+}
+
+async def find_matches(leads_collection, lead: dict, threshold: float = DUPLICATE_THRESHOLD, limit: int = 10) -> List[dict]:
+    """Existing leads likely to be the same contact as `lead`, best match first"""
+    keys = dedup_keys(lead)
+    exact = [key for key in keys if key.startswith(("e:", "p:"))]
+    fuzzy = [key for key in keys if key not in exact]
+    seen = [lead["id"]] if lead.get("id") else []
+
+    candidates = []
+    # Exact email/phone blocks are small and must never be cut off by a broad company/name block
+    if exact:
+        candidates = await leads_collection.find(
+            {"dedup_keys": {"$in": exact}, "id": {"$nin": seen}}, DEDUP_PROJECTION
+        ).to_list(None)
+    if fuzzy and len(candidates) < MAX_BLOCK_SIZE:
+        candidates += await leads_collection.find(
+            {"dedup_keys": {"$in": fuzzy}, "id": {"$nin": seen + [c["id"] for c in candidates]}},
+            DEDUP_PROJECTION
+        ).limit(MAX_BLOCK_SIZE - len(candidates)).to_list(None)
+
+    matches = []
+    for candidate in candidates:
+        score, reasons = match_score(lead, candidate)
+        if score >= threshold:
+            matches.append({**candidate, "match_score": score, "match_reasons": reasons})
+    matches.sort(key=lambda m: -m["match_score"])
+    return matches[:limit]
+
+async def scan_duplicates(db, threshold: float = DUPLICATE_THRESHOLD) -> dict:
+    """
+    Batch job: score every pair of leads that share a blocking key and store the
+    connected groups in lead_duplicate_groups (replacing the previous scan).
+
+    Work is sum(block_size^2) over blocks capped at MAX_BLOCK_SIZE, which stays close
+    to linear in the number of leads, unlike comparing every pair.
+    """
+    blocks = db.leads.aggregate([
+        {"$project": {"_id": 0, "id": 1, "dedup_keys": 1}},
+        {"$unwind": "$dedup_keys"},
+        {"$group": {"_id": "$dedup_keys", "ids": {"$push": "$id"}, "size": {"$sum": 1}}},
+        {"$match": {"size": {"$gt": 1, "$lte": MAX_BLOCK_SIZE}}}
+    ], allowDiskUse=True)
+
+    pairs: Dict[Tuple[str, str], dict] = {}
+    compared = set()
+
+    async def score_blocks(batch: List[List[str]]):
+        ids = list({lead_id for block_ids in batch for lead_id in block_ids})
+        leads = {lead["id"]: lead async for lead in db.leads.find({"id": {"$in": ids}}, DEDUP_PROJECTION)}
+        compared.update(leads)
+        for block_ids in batch:
+            for a, b in combinations(sorted(set(block_ids)), 2):
+                if (a, b) in pairs or a not in leads or b not in leads:
+                    continue
+                score, reasons = match_score(leads[a], leads[b])
+                if score >= threshold:
+                    pairs[(a, b)] = {"lead_ids": [a, b], "score": score, "reasons": reasons}
+
+    # Blocks stream from the cursor and are scored a batch at a time
+    block_count = 0
+    batch, batch_size = [], 0
+    async for block in blocks:
+        block_count += 1
+        batch.append(block["ids"])
+        batch_size += len(block["ids"])
+        if batch_size >= SCAN_FETCH_BATCH:
+            await score_blocks(batch)
+            batch, batch_size = [], 0
+    if batch:
+        await score_blocks(batch)
+
+    # Union-find: pairs that share a lead form one group
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+
+    grouped: Dict[str, List[dict]] = {}
+    for (a, _), pair in pairs.items():
+        grouped.setdefault(find(a), []).append(pair)
+
+    scan_id = str(uuid.uuid4())
+    scanned_at = datetime.now(timezone.utc).isoformat()
+    groups = [
+        {
+            "id": str(uuid.uuid4()),
+            "scan_id": scan_id,
+            "lead_ids": sorted({lead_id for pair in group_pairs for lead_id in pair["lead_ids"]}),
+            "pairs": group_pairs,
+            "max_score": max(pair["score"] for pair in group_pairs),
+            "scanned_at": scanned_at
+        }
+        for group_pairs in grouped.values()
+    ]
+    if groups:
+        await db.lead_duplicate_groups.insert_many(groups)
+    await db.lead_duplicate_groups.delete_many({"scan_id": {"$ne": scan_id}})
+
+    return {
+        "scan_id": scan_id,
+        "blocks": block_count,
+        "compared_leads": len(compared),
+        "duplicate_pairs": len(pairs),
+        "groups": len(groups),
+        "scanned_at": scanned_at
+    }
+
+async def backfill_dedup_keys(leads_collection, batch_size: int = 500) -> int:
+    """Fill `dedup_keys` on leads written before dedup existed (or by other tools)"""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in DEDUP_FIELDS}}
+    updated = 0
+    batch = []
+    async for lead in leads_collection.find({"dedup_keys": {"$exists": False}}, projection):
+        batch.append(UpdateOne({"id": lead["id"]}, {"$set": {"dedup_keys": dedup_keys(lead)}}))
+        if len(batch) >= batch_size:
+            await leads_collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await leads_collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,122 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+from pymongo import UpdateOne
+
+# Weights for the leads text index (relevance of a full-word match per field)
+TEXT_INDEX_WEIGHTS = {
+    "first_name": 10,
+    "last_name": 10,
+    "company": 8,
+    "email": 6,
+    "phone": 6,
+    "job_title": 3,
+    "notes": 1,
+}
+
+# Fields whose words are expanded into `search_prefixes` for typeahead; notes stay full-text only
+PREFIX_FIELDS = ("first_name", "last_name", "company", "email", "job_title")
+SEARCH_FIELDS = tuple(TEXT_INDEX_WEIGHTS)
+
+MIN_PREFIX = 2
+MAX_PREFIX = 15
+
+_WORD = re.compile(r"[a-z0-9]+")
+_PHONE_QUERY = re.compile(r"\+?[\d\s().-]*\d[\d\s().-]*")
+
+def words(value: Optional[str]) -> List[str]:
+    """Lower-cased, accent-free alphanumeric words ("José O'Neil" -> ["jose", "o", "neil"])"""
+    if not value:
+        return []
+    folded = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().lower()
+    return _WORD.findall(folded)
+
+def phone_digits(phone: Optional[str]) -> str:
+    """National number digits: drops formatting and any country code beyond 10 digits"""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:]
+
+def edge_ngrams(word: str) -> List[str]:
+    return [word[:n] for n in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1)]
+
+def search_prefixes(lead: dict) -> List[str]:
+    """Edge n-grams of every word in the prefix fields, plus the phone's digits"""
+    prefixes = set()
+    for field in PREFIX_FIELDS:
+        for word in words(lead.get(field)):
+            prefixes.update(edge_ngrams(word))
+    digits = phone_digits(lead.get("phone"))
+    if digits:
+        prefixes.update(edge_ngrams(digits))
+    return sorted(prefixes)
+
+def query_prefixes(query: str) -> List[str]:
+    """Prefixes a typeahead query must all match; words longer than MAX_PREFIX are truncated"""
+    if _PHONE_QUERY.fullmatch(query.strip()):
+        groups = re.findall(r"\d+", query)
+        if query.strip().startswith("+") and len(groups) > 1:
+            groups = groups[1:]  # "+91 98765 ..." -> drop the country code
+        digits = "".join(groups)[-10:]
+        return [digits[:MAX_PREFIX]] if len(digits) >= MIN_PREFIX else []
+
+    terms = set()
+    for word in words(query):
+        if len(word) >= MIN_PREFIX:
+            terms.add(word[:MAX_PREFIX])
+    return sorted(terms)
+
+def touches_search_fields(update: dict) -> bool:
+    return any(field in update for field in PREFIX_FIELDS + ("phone",))
+
+def build_search_pipeline(query: str, mode: str, scope: dict, fields: dict, skip: int, limit: int) -> Optional[list]:
+    """
+    Aggregation for one page of search results plus the total, or None if the query has no
+    searchable words.
+
+    `prefix` mode matches every query word as a word prefix through the multikey
+    `search_prefixes` index and ranks by lead score; `text` mode uses the weighted text
+    index (whole words, includes notes) and ranks by text score.
+    """
+    if mode == "text":
+        if not words(query):
+            return None
+        match = {"$text": {"$search": query}, **scope}
+        sort = {"relevance": {"$meta": "textScore"}, "lead_score": -1, "id": 1}
+        project = {**fields, "relevance": {"$meta": "textScore"}}
+    else:
+        prefixes = query_prefixes(query)
+        if not prefixes:
+            return None
+        # Most selective (longest) prefix first so the index scan starts narrow
+        prefixes.sort(key=len, reverse=True)
+        match = {"search_prefixes": {"$all": prefixes}, **scope}
+        sort = {"lead_score": -1, "id": 1}
+        project = fields
+
+    # Sort and trim before $facet, where indexes can still serve the sort and only small docs are buffered
+    return [
+        {"$match": match},
+        {"$sort": sort},
+        {"$project": project},
+        {"$facet": {
+            "items": [{"$skip": skip}, {"$limit": limit}],
+            "total": [{"$count": "count"}]
+        }}
+    ]
+
+async def backfill_search_prefixes(leads_collection, batch_size: int = 500) -> int:
+    """Fill `search_prefixes` on leads written before search existed (or by other tools)"""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in PREFIX_FIELDS + ("phone",)}}
+    updated = 0
+    batch = []
+    async for lead in leads_collection.find({"search_prefixes": {"$exists": False}}, projection):
+        batch.append(UpdateOne({"id": lead["id"]}, {"$set": {"search_prefixes": search_prefixes(lead)}}))
+        if len(batch) >= batch_size:
+            await leads_collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await leads_collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,54 @@
+from typing import Iterable
+
+from pymongo import UpdateOne
+
+# notification_counters holds one {"user_id", "unread"} document per user so unread-count
+# reads are point lookups. Writers $inc it; these helpers create and correct it.
+
+async def seed_unread_counters(db, user_ids: Iterable[str]) -> int:
+    """
+    Create missing counters from the user's unread notifications. Call before the first
+    $inc for a user, otherwise the upsert starts the counter at the increment and
+    notifications they already had are never counted. Returns the number seeded.
+    """
+    user_ids = list(user_ids)
+    existing = set(await db.notification_counters.distinct("user_id", {"user_id": {"$in": user_ids}}))
+    seeded = 0
+    for user_id in user_ids:
+        if user_id in existing:
+            continue
+        count = await db.notifications.count_documents({"user_id": user_id, "is_read": False})
+        await db.notification_counters.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {"unread": count}},
+            upsert=True
+        )
+        seeded += 1
+    return seeded
+
+async def reconcile_unread_counters(db) -> int:
+    """
+    Recompute unread counters from the notifications collection and fix any drift.
+
+    A notification inserted while this runs can be counted twice or not at all for
+    one cycle; the next run corrects it.
+    """
+    actual = {
+        row['_id']: row['count']
+        for row in await db.notifications.aggregate([
+            {"$match": {"is_read": False}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+    }
+
+    fixes = []
+    async for counter in db.notification_counters.find({}, {"_id": 0, "user_id": 1, "unread": 1}):
+        expected = actual.pop(counter['user_id'], 0)
+        if counter.get('unread') != expected:
+            fixes.append(UpdateOne({"user_id": counter['user_id']}, {"$set": {"unread": expected}}))
+    for user_id, count in actual.items():
+        fixes.append(UpdateOne({"user_id": user_id}, {"$set": {"unread": count}}, upsert=True))
+
+    if fixes:
+        await db.notification_counters.bulk_write(fixes, ordered=False)
+    return len(fixes)
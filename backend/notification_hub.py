@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[str, dict], Awaitable[None]]
+
+class LocalBroker:
+    """Single-process broker: published events are delivered straight back to the hub"""
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, user_id: str, event: dict):
+        if self._handler:
+            await self._handler(user_id, event)
+
+class MongoChangeStreamBroker:
+    """
+    Multi-worker broker backed by a Mongo change stream.
+
+    Every worker writes published events into a short-lived `events_collection`
+    and tails inserts on it, so a notification created on one worker reaches
+    SSE clients connected to any other worker. Requires a replica set.
+    """
+
+    def __init__(self, events_collection, retention_seconds: int = 300):
+        self.events_collection = events_collection
+        self.retention_seconds = retention_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        await self.events_collection.create_index("created_at", expireAfterSeconds=self.retention_seconds)
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def publish(self, user_id: str, event: dict):
+        await self.events_collection.insert_one({
+            "user_id": user_id,
+            "event": event,
+            "created_at": datetime.now(timezone.utc)
+        })
+
+    async def _listen(self, handler: EventHandler):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self.events_collection.watch(pipeline) as stream:
+                    async for change in stream:
+                        doc = change["fullDocument"]
+                        await handler(doc["user_id"], doc["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification change stream interrupted, retrying: {e}")
+                await asyncio.sleep(5)
+
+class NotificationHub:
+    """
+    In-process pub/sub for per-user notification events (new notifications,
+    unread-count deltas) consumed by the SSE stream endpoint.
+
+    Each connected client gets a bounded queue. A client that falls behind has its
+    queue replaced by a single `resync` event so it can refetch state instead of
+    silently missing deltas.
+    """
+
+    def __init__(self, broker=None, queue_size: int = 100):
+        self.broker = broker or LocalBroker()
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def start(self):
+        await self.broker.start(self._deliver)
+
+    async def stop(self):
+        await self.broker.stop()
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id: Optional[str] = None) -> int:
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def publish(self, user_id: str, event: dict):
+        try:
+            await self.broker.publish(user_id, event)
+        except Exception as e:
+            # Pushing is best-effort; the notification itself is already persisted
+            logger.warning(f"Failed to publish notification event for {user_id}: {e}")
+
+    async def _deliver(self, user_id: str, event: dict):
+        for queue in list(self._subscribers.get(user_id, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
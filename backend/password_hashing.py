@@ -0,0 +1,52 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+def bcrypt_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor encoded in a bcrypt hash ($2b$12$...), or None if not bcrypt"""
+    parts = (hashed_password or "").split("$")
+    if len(parts) >= 4 and parts[1].startswith("2") and parts[2].isdigit():
+        return int(parts[2])
+    return None
+
+class PasswordHasher:
+    """
+    Runs bcrypt hash/verify off the event loop.
+
+    bcrypt releases the GIL, so a small thread pool keeps the loop responsive while
+    hashes run in parallel. `max_concurrent` caps in-flight operations; extra
+    callers wait on a semaphore instead of queueing unbounded work in the pool.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_concurrent: Optional[int] = None):
+        self.rounds = rounds
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._semaphore = asyncio.Semaphore(max_concurrent or max_workers)
+
+    async def _run(self, func, *args):
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True for deprecated schemes or a bcrypt cost different from the configured one"""
+        return self.context.needs_update(hashed_password) or bcrypt_rounds(hashed_password) != self.rounds
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify, and return a replacement hash when the stored one uses an outdated cost"""
+        if not await self.verify(password, hashed_password):
+            return False, None
+        if self.needs_rehash(hashed_password):
+            return True, await self.hash(password)
+        return True, None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
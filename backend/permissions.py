@@ -0,0 +1,147 @@
+import asyncio
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+# Default role permissions
+DEFAULT_ROLE_PERMISSIONS = {
+    "admin": {
+        "leads": {"create": True, "read": True, "update": True, "delete": False},
+        "pricing_plans": {"create": True, "read": True, "update": True, "delete": False},
+        "sow": {"create": True, "read": True, "update": True, "delete": False, "freeze": True},
+        "quotations": {"create": True, "read": True, "update": True, "delete": False},
+        "agreements": {"create": True, "read": True, "update": True, "delete": False, "approve": True},
+        "projects": {"create": True, "read": True, "update": True, "delete": False},
+        "tasks": {"create": True, "read": True, "update": True, "delete": True},
+        "consultants": {"create": True, "read": True, "update": True, "delete": False},
+        "users": {"create": True, "read": True, "update": True, "delete": False, "manage_roles": True},
+        "reports": {"view": True, "export": True}
+    },
+    "manager": {
+        "leads": {"create": False, "read": True, "update": False, "delete": False},
+        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
+        "sow": {"create": False, "read": True, "update": False, "delete": False, "freeze": False},
+        "quotations": {"create": False, "read": True, "update": False, "delete": False},
+        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": True},
+        "projects": {"create": False, "read": True, "update": False, "delete": False},
+        "tasks": {"create": False, "read": True, "update": False, "delete": False},
+        "consultants": {"create": False, "read": True, "update": False, "delete": False},
+        "users": {"create": False, "read": True, "update": False, "delete": False, "manage_roles": False},
+        "reports": {"view": True, "export": True}
+    },
+    "executive": {
+        "leads": {"create": True, "read": True, "update": True, "delete": False},
+        "pricing_plans": {"create": True, "read": True, "update": True, "delete": False},
+        "sow": {"create": True, "read": True, "update": True, "delete": False, "freeze": False},
+        "quotations": {"create": True, "read": True, "update": True, "delete": False},
+        "agreements": {"create": True, "read": True, "update": True, "delete": False, "approve": False},
+        "projects": {"create": False, "read": True, "update": False, "delete": False},
+        "tasks": {"create": False, "read": True, "update": False, "delete": False},
+        "consultants": {"create": False, "read": True, "update": False, "delete": False},
+        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
+        "reports": {"view": False, "export": False}
+    },
+    "consultant": {
+        "leads": {"create": False, "read": False, "update": False, "delete": False},
+        "pricing_plans": {"create": False, "read": False, "update": False, "delete": False},
+        "sow": {"create": False, "read": True, "update": False, "delete": False, "freeze": False},
+        "quotations": {"create": False, "read": False, "update": False, "delete": False},
+        "agreements": {"create": False, "read": False, "update": False, "delete": False, "approve": False},
+        "projects": {"create": False, "read": True, "update": False, "delete": False},
+        "tasks": {"create": True, "read": True, "update": True, "delete": False},
+        "consultants": {"create": False, "read": False, "update": False, "delete": False},
+        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
+        "reports": {"view": False, "export": False}
+    },
+    "principal_consultant": {
+        "leads": {"create": False, "read": True, "update": False, "delete": False},
+        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
+        "sow": {"create": False, "read": True, "update": True, "delete": False, "freeze": True},
+        "quotations": {"create": False, "read": True, "update": False, "delete": False},
+        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": False},
+        "projects": {"create": False, "read": True, "update": True, "delete": False},
+        "tasks": {"create": True, "read": True, "update": True, "delete": False},
+        "consultants": {"create": False, "read": True, "update": False, "delete": False},
+        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
+        "reports": {"view": True, "export": False}
+    },
+    "project_manager": {
+        "leads": {"create": False, "read": True, "update": False, "delete": False},
+        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
+        "sow": {"create": False, "read": True, "update": True, "delete": False, "freeze": False},
+        "quotations": {"create": False, "read": True, "update": False, "delete": False},
+        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": False},
+        "projects": {"create": True, "read": True, "update": True, "delete": False},
+        "tasks": {"create": True, "read": True, "update": True, "delete": True},
+        "consultants": {"create": False, "read": True, "update": False, "delete": False},
+        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
+        "reports": {"view": True, "export": True}
+    }
+}
+
+class CompiledPermissions:
+    """Role permission matrix plus a flattened set of granted (module, action) pairs per role"""
+
+    def __init__(self, permissions: Dict[str, dict]):
+        self.permissions = permissions
+        self.grants: Dict[str, FrozenSet[Tuple[str, str]]] = {
+            role: frozenset(
+                (module, action)
+                for module, actions in (modules or {}).items()
+                for action, allowed in (actions or {}).items()
+                if allowed
+            )
+            for role, modules in permissions.items()
+        }
+
+    def allows(self, role: str, module: str, action: str) -> bool:
+        return (module, action) in self.grants.get(role, frozenset())
+
+def compile_role_permissions(custom_docs: list, defaults: Dict[str, dict] = DEFAULT_ROLE_PERMISSIONS) -> CompiledPermissions:
+    """Overlay custom role_permissions documents (whole role replaced) on the defaults"""
+    permissions = dict(defaults)
+    for doc in custom_docs:
+        if doc.get('role'):
+            permissions[doc['role']] = doc.get('permissions') or {}
+    return CompiledPermissions(permissions)
+
+class RolePermissionCache:
+    """
+    In-process cache of the compiled role_permissions table.
+
+    The table is loaded once and reused until `invalidate()` is called (done by the
+    permission update endpoint). The TTL bounds staleness for other worker processes.
+    """
+
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self._table: Optional[CompiledPermissions] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get_table(self, collection) -> CompiledPermissions:
+        table = self._table
+        if table is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return table
+
+        async with self._lock:
+            if self._table is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return self._table
+
+            generation = self._generation
+            custom_docs = await collection.find({}, {"_id": 0}).to_list(100)
+            table = compile_role_permissions(custom_docs)
+
+            # Don't publish a table that was invalidated while it was being loaded
+            if generation == self._generation:
+                self._table = table
+                self._loaded_at = time.monotonic()
+            return table
+
+    async def has_permission(self, collection, role: str, module: str, action: str) -> bool:
+        table = await self.get_table(collection)
+        return table.allows(role, module, action)
+
+    def invalidate(self):
+        self._generation += 1
+        self._table = None
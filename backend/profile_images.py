@@ -0,0 +1,143 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# Pillow format -> (file extension, content type) for stored originals
+ORIGINAL_FORMATS = {
+    "JPEG": ("jpg", "image/jpeg"),
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+    "GIF": ("gif", "image/gif"),
+}
+
+# Inline values the migration cannot read are moved here untouched instead of being dropped
+LEGACY_IMAGE_FIELD = "profile_image_legacy"
+
+def decode_image_data(value: str) -> bytes:
+    """Bytes of a base64 image, with or without a `data:image/...;base64,` prefix"""
+    if value.startswith("data:"):
+        value = value.split(",", 1)[-1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Image data is not valid base64")
+
+class ProfileImageStore:
+    """
+    Avatars on disk: the uploaded original plus square thumbnails per size, under
+    `<root>/<user_id>/<version>/`. The version is a content hash, so a new upload
+    never overwrites files a client may have cached.
+
+    Users only keep the small reference returned by `save` (version, content type,
+    sizes); the bytes never travel with user reads. Nothing touches the disk until
+    the first `save`, so importing the app does not need a writable root.
+    """
+
+    def __init__(self, root_dir: str, sizes: Dict[str, int], max_bytes: int, max_pixels: int = 40_000_000):
+        self.root_dir = root_dir
+        self.sizes = sizes
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+
+    def _open(self, data: bytes) -> Image.Image:
+        if len(data) > self.max_bytes:
+            raise ValueError(f"Image larger than {self.max_bytes // (1024 * 1024)} MB")
+        try:
+            image = Image.open(io.BytesIO(data))
+            if image.width * image.height > self.max_pixels:
+                raise ValueError("Image dimensions too large")
+            image.verify()
+            # verify() leaves the image unusable; reopen to decode pixels
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except ValueError:
+            raise
+        except Exception:
+            raise ValueError("File is not a supported image")
+        if image.format not in ORIGINAL_FORMATS:
+            raise ValueError(f"Unsupported image format: {image.format}")
+        return image
+
+    def save(self, user_id: str, data: bytes) -> dict:
+        """Validate, write original + thumbnails, and return the reference to store on the user"""
+        image = self._open(data)
+        ext, content_type = ORIGINAL_FORMATS[image.format]
+        version = hashlib.sha256(data).hexdigest()[:16]
+        directory = os.path.join(self.root_dir, user_id, version)
+        os.makedirs(directory, exist_ok=True)
+
+        with open(os.path.join(directory, f"original.{ext}"), "wb") as f:
+            f.write(data)
+
+        upright = ImageOps.exif_transpose(image)
+        has_alpha = upright.mode in ("RGBA", "LA") or "transparency" in upright.info
+        thumb_ext = "png" if has_alpha else "jpg"
+        upright = upright.convert("RGBA" if has_alpha else "RGB")
+        for name, pixels in self.sizes.items():
+            thumb = ImageOps.fit(upright, (pixels, pixels), Image.LANCZOS)
+            if has_alpha:
+                thumb.save(os.path.join(directory, f"{name}.png"), "PNG", optimize=True)
+            else:
+                thumb.save(os.path.join(directory, f"{name}.jpg"), "JPEG", quality=85, optimize=True)
+
+        return {
+            "version": version,
+            "original_ext": ext,
+            "original_content_type": content_type,
+            "thumbnail_ext": thumb_ext,
+            "sizes": list(self.sizes),
+            "width": image.width,
+            "height": image.height,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    def path(self, user_id: str, reference: dict, size: str) -> Optional[tuple]:
+        """(file path, content type) for a stored size, or None if it is missing"""
+        if size == "original":
+            filename = f"original.{reference['original_ext']}"
+            content_type = reference['original_content_type']
+        elif size in reference.get('sizes', []):
+            filename = f"{size}.{reference['thumbnail_ext']}"
+            content_type = "image/png" if reference['thumbnail_ext'] == "png" else "image/jpeg"
+        else:
+            return None
+        file_path = os.path.join(self.root_dir, user_id, reference['version'], filename)
+        return (file_path, content_type) if os.path.exists(file_path) else None
+
+    def delete(self, user_id: str, keep_version: Optional[str] = None):
+        """Remove a user's stored versions, except `keep_version`"""
+        user_dir = os.path.join(self.root_dir, user_id)
+        if not os.path.isdir(user_dir):
+            return
+        for version in os.listdir(user_dir):
+            if version != keep_version:
+                shutil.rmtree(os.path.join(user_dir, version), ignore_errors=True)
+
+async def migrate_inline_images(users, store: ProfileImageStore) -> Tuple[int, List[tuple]]:
+    """
+    Move base64 images still stored on user documents into `store`.
+
+    Values that cannot be stored (URLs, oversized or unsupported images) are renamed to
+    LEGACY_IMAGE_FIELD as they are, so the user's only copy survives and is not retried
+    on every start. Returns the number migrated and (user_id, reason) for those set aside.
+    """
+    migrated, skipped = 0, []
+    async for user in users.find({"profile_image": {"$type": "string"}}, {"_id": 0, "id": 1, "profile_image": 1}):
+        try:
+            data = decode_image_data(user['profile_image'])
+            reference = await asyncio.to_thread(store.save, user['id'], data)
+        except ValueError as e:
+            await users.update_one({"id": user['id']}, {"$rename": {"profile_image": LEGACY_IMAGE_FIELD}})
+            skipped.append((user['id'], str(e)))
+            continue
+        await users.update_one({"id": user['id']}, {"$set": {"profile_image": reference}})
+        migrated += 1
+    return migrated, skipped
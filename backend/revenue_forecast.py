@@ -0,0 +1,201 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Chance that an open deal turns into an approved agreement, by how far it has got
+STAGE_PROBABILITIES = {
+    "draft": 0.1,             # quotation drafted, not sent
+    "sent": 0.3,              # quotation sent / finalized
+    "accepted": 0.6,          # client accepted the quotation
+    "pending_approval": 0.85  # agreement drafted, awaiting manager approval
+}
+
+# Agreements in these states are booked revenue (probability 1)
+COMMITTED_AGREEMENT_STATUSES = ["approved", "sent", "signed"]
+
+SCHEDULES = ["monthly", "quarterly", "upfront", "milestone"]
+
+# Milestone plans have no dates of their own: share paid at start, mid-point and end
+MILESTONE_SPLIT = (0.3, 0.4, 0.3)
+
+# Open quotations are expected to start the month after they were last touched
+QUOTE_START_LAG_MONTHS = 1
+
+QUOTATION_FIELDS = {
+    "_id": 0, "id": 1, "lead_id": 1, "pricing_plan_id": 1, "status": 1, "grand_total": 1,
+    "created_at": 1, "updated_at": 1
+}
+AGREEMENT_FIELDS = {
+    "_id": 0, "id": 1, "quotation_id": 1, "lead_id": 1, "pricing_plan_id": 1, "status": 1,
+    "project_start_date": 1, "start_date": 1, "approved_at": 1, "created_at": 1, "project_duration_months": 1
+}
+PLAN_FIELDS = {"_id": 0, "id": 1, "project_duration_months": 1, "payment_schedule": 1, "total_amount": 1}
+
+def month_index(values: pd.Series) -> pd.Series:
+    """ISO date strings / datetimes -> months since year 0 (NaN where missing)"""
+    stamps = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+    return stamps.dt.year * 12 + stamps.dt.month - 1
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def parse_month(value: str) -> int:
+    """'YYYY-MM' -> month index"""
+    parsed = datetime.strptime(value, "%Y-%m")
+    return parsed.year * 12 + parsed.month - 1
+
+def current_month() -> int:
+    now = datetime.now(timezone.utc)
+    return now.year * 12 + now.month - 1
+
+def schedule_weights(schedule: np.ndarray, duration: np.ndarray) -> np.ndarray:
+    """
+    Share of each deal's value paid in each month of its project, shape (deals, longest
+    duration); every row sums to 1. `schedule` holds indexes into SCHEDULES.
+    """
+    n = len(duration)
+    offsets = np.arange(max(int(duration.max(initial=1)), 1))
+    active = offsets[None, :] < duration[:, None]
+
+    monthly = active / duration[:, None]
+    quarter_starts = active & (offsets[None, :] % 3 == 0)
+    quarterly = quarter_starts / quarter_starts.sum(axis=1, keepdims=True)
+    upfront = np.zeros_like(monthly)
+    upfront[:, 0] = 1.0
+    milestone = np.zeros_like(monthly)
+    rows = np.arange(n)
+    for share, column in zip(MILESTONE_SPLIT, (np.zeros(n, dtype=int), duration // 2, duration - 1)):
+        np.add.at(milestone, (rows, column), share)
+
+    choices = [monthly, quarterly, upfront, milestone]
+    return np.choose(schedule[:, None], choices) if n else monthly
+
+def spread(deals: pd.DataFrame, first_month: int, months: int, value: np.ndarray) -> np.ndarray:
+    """Per-month totals of `value` (one per deal) spread by schedule over [first_month, +months)"""
+    if deals.empty:
+        return np.zeros(months)
+    duration = deals["duration"].to_numpy(dtype=int)
+    weights = schedule_weights(deals["schedule"].to_numpy(dtype=int), duration)
+    slots = deals["start"].to_numpy(dtype=int)[:, None] + np.arange(weights.shape[1])[None, :] - first_month
+    amounts = value[:, None] * weights
+    in_window = (slots >= 0) & (slots < months) & (amounts != 0)
+    return np.bincount(slots[in_window], weights=amounts[in_window], minlength=months)
+
+def build_deals(quotations: List[dict], agreements: List[dict], plans: List[dict], lost_leads: set, today: int) -> pd.DataFrame:
+    """
+    One row per deal: approved agreements (committed) and the latest open quotation of
+    every lead without one, with amount, probability, start month, duration and schedule.
+    """
+    plan_df = pd.DataFrame(plans, columns=list(PLAN_FIELDS)[1:]).rename(columns={"id": "pricing_plan_id"})
+    quote_df = pd.DataFrame(quotations, columns=list(QUOTATION_FIELDS)[1:])
+    agreement_df = pd.DataFrame(agreements, columns=list(AGREEMENT_FIELDS)[1:])
+
+    committed = agreement_df[agreement_df["status"].isin(COMMITTED_AGREEMENT_STATUSES)]
+    committed = committed.merge(
+        quote_df[["id", "grand_total", "pricing_plan_id"]].rename(
+            columns={"id": "quotation_id", "pricing_plan_id": "quotation_plan_id"}
+        ),
+        on="quotation_id", how="left"
+    )
+    committed["pricing_plan_id"] = committed["pricing_plan_id"].fillna(committed["quotation_plan_id"])
+    committed = committed.merge(plan_df, on="pricing_plan_id", how="left", suffixes=("", "_plan"))
+    committed = pd.DataFrame({
+        "lead_id": committed["lead_id"],
+        "stage": "committed",
+        "amount": committed["grand_total"].where(committed["grand_total"] > 0, committed["total_amount"]),
+        "probability": 1.0,
+        "start": month_index(committed["project_start_date"])
+        .fillna(month_index(committed["start_date"]))
+        .fillna(month_index(committed["approved_at"]))
+        .fillna(month_index(committed["created_at"])),
+        "duration": committed["project_duration_months"].fillna(committed["project_duration_months_plan"]),
+        "payment_schedule": committed["payment_schedule"]
+    })
+
+    # Pipeline: leads with no booked agreement and not lost; newest quotation per lead only
+    pending = set(agreement_df.loc[agreement_df["status"] == "pending_approval", "quotation_id"])
+    open_quotes = quote_df[
+        ~quote_df["lead_id"].isin(set(committed["lead_id"]) | lost_leads)
+        & quote_df["status"].isin(["draft", "sent", "accepted"])
+    ].sort_values("updated_at").drop_duplicates("lead_id", keep="last")
+    open_quotes = open_quotes.merge(plan_df, on="pricing_plan_id", how="left")
+    stage = open_quotes["status"].where(~open_quotes["id"].isin(pending), "pending_approval")
+    pipeline = pd.DataFrame({
+        "lead_id": open_quotes["lead_id"],
+        "stage": stage,
+        "amount": open_quotes["grand_total"].where(open_quotes["grand_total"] > 0, open_quotes["total_amount"]),
+        "probability": stage.map(STAGE_PROBABILITIES),
+        # An old open quotation cannot start in the past
+        "start": np.maximum(month_index(open_quotes["updated_at"]) + QUOTE_START_LAG_MONTHS, today),
+        "duration": open_quotes["project_duration_months"],
+        "payment_schedule": open_quotes["payment_schedule"]
+    })
+
+    deals = pd.concat([committed, pipeline], ignore_index=True)
+    deals = deals[(deals["amount"].fillna(0) > 0) & deals["start"].notna()].copy()
+    deals["duration"] = deals["duration"].fillna(1).clip(lower=1).astype(int)
+    deals["schedule"] = (
+        deals["payment_schedule"].map({name: i for i, name in enumerate(SCHEDULES)}).fillna(0).astype(int)
+    )
+    deals["start"] = deals["start"].astype(int)
+    deals["amount"] = deals["amount"].astype(float)
+    return deals
+
+def forecast(deals: pd.DataFrame, first_month: int, months: int) -> dict:
+    committed = deals[deals["stage"] == "committed"]
+    pipeline = deals[deals["stage"] != "committed"]
+    booked = spread(committed, first_month, months, committed["amount"].to_numpy())
+    weighted = spread(pipeline, first_month, months, (pipeline["amount"] * pipeline["probability"]).to_numpy())
+    unweighted = spread(pipeline, first_month, months, pipeline["amount"].to_numpy())
+
+    by_stage = pipeline.groupby("stage").agg(deals=("amount", "size"), value=("amount", "sum"))
+    return {
+        "from_month": month_label(first_month),
+        "to_month": month_label(first_month + months - 1),
+        "stage_probabilities": STAGE_PROBABILITIES,
+        "months": [
+            {
+                "month": month_label(first_month + i),
+                "committed": round(float(booked[i]), 2),
+                "weighted_pipeline": round(float(weighted[i]), 2),
+                "expected": round(float(booked[i] + weighted[i]), 2),
+                "unweighted_pipeline": round(float(unweighted[i]), 2)
+            }
+            for i in range(months)
+        ],
+        "totals": {
+            "committed": round(float(booked.sum()), 2),
+            "weighted_pipeline": round(float(weighted.sum()), 2),
+            "expected": round(float(booked.sum() + weighted.sum()), 2),
+            "unweighted_pipeline": round(float(unweighted.sum()), 2)
+        },
+        "pipeline_by_stage": [
+            {"stage": stage, "deals": int(row["deals"]), "value": round(float(row["value"]), 2)}
+            for stage, row in by_stage.iterrows()
+        ],
+        "committed_deals": len(committed),
+        "pipeline_deals": len(pipeline)
+    }
+
+async def load_revenue_forecast(db, first_month: Optional[int], months: int) -> dict:
+    """Columnar extracts from Mongo, then the forecast computed in a worker thread"""
+    quotations = await db.quotations.find({"is_active": {"$ne": False}}, QUOTATION_FIELDS).to_list(None)
+    agreements = await db.agreements.find(
+        {"is_active": {"$ne": False}, "status": {"$in": COMMITTED_AGREEMENT_STATUSES + ["pending_approval"]}},
+        AGREEMENT_FIELDS
+    ).to_list(None)
+    plans = await db.pricing_plans.find({}, PLAN_FIELDS).to_list(None)
+    lost_leads = set(await db.leads.distinct(
+        "id", {"id": {"$in": list({q["lead_id"] for q in quotations})}, "status": "lost"}
+    ))
+
+    today = current_month()
+    first_month = today if first_month is None else first_month
+
+    def compute():
+        return forecast(build_deals(quotations, agreements, plans, lost_leads, today), first_month, months)
+
+    return await asyncio.to_thread(compute)
@@ -0,0 +1,278 @@
+import bisect
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+# Funnel order; "lost" is an exit from any stage rather than a step
+FUNNEL_STAGES = ["new", "contacted", "qualified", "proposal", "agreement", "closed"]
+LOST = "lost"
+
+# Upper bounds (seconds) of the time-in-stage histogram buckets; the last bucket is open-ended.
+# Histograms can be added across days, owners and sources, which medians cannot.
+DURATION_BUCKETS = [3600, 4 * 3600, 12 * 3600] + [
+    86400 * days for days in (1, 2, 3, 5, 7, 10, 14, 21, 30, 45, 60, 90, 180)
+]
+
+# Events newer than this are left for the next run, so writes that commit slightly out of
+# order (clock skew between workers, slow inserts) are not skipped by the watermark
+ROLLUP_LAG = timedelta(minutes=2)
+
+ROLLUP_STATE_ID = "lead_status_events"
+
+EVENT_ROLLUP_PROJECTION = {
+    "_id": 0, "owner_id": 1, "lead_source": 1, "from_status": 1, "to_status": 1, "duration_seconds": 1
+}
+
+def to_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def lead_owner(lead: dict) -> Optional[str]:
+    return lead.get("assigned_to") or lead.get("created_by")
+
+def status_event(
+    lead: dict,
+    from_status: Optional[str],
+    to_status: str,
+    changed_by: Optional[str],
+    occurred_at: datetime,
+    entered_at=None
+) -> dict:
+    """
+    One lead_status_events document. `entered_at` is when the lead entered `from_status`
+    and gives the time spent in that stage.
+    """
+    entered_at = to_datetime(entered_at)
+    return {
+        "id": str(uuid.uuid4()),
+        "lead_id": lead["id"],
+        "from_status": from_status,
+        "to_status": to_status,
+        "owner_id": lead_owner(lead),
+        "lead_source": lead.get("lead_source"),
+        "changed_by": changed_by,
+        "duration_seconds": (occurred_at - entered_at).total_seconds() if from_status and entered_at else None,
+        "occurred_at": occurred_at.isoformat()
+    }
+
+async def record_status_change(
+    events_collection,
+    lead: dict,
+    from_status: Optional[str],
+    to_status: str,
+    changed_by: Optional[str],
+    occurred_at: Optional[datetime] = None,
+    entered_at=None
+):
+    """Append a transition to the (insert-only) status history; no-op if the status is unchanged"""
+    if from_status == to_status:
+        return
+    await events_collection.insert_one(status_event(
+        lead, from_status, to_status, changed_by, occurred_at or datetime.now(timezone.utc), entered_at
+    ))
+
+def _empty_histogram() -> dict:
+    return {"count": 0, "total_seconds": 0.0, "buckets": [0] * (len(DURATION_BUCKETS) + 1)}
+
+def build_day_rollups(day: str, events: List[dict]) -> List[dict]:
+    """Rollup rows (one per owner and source) for the events of one UTC day"""
+    rows = {}
+    for event in events:
+        key = (event.get("owner_id"), event.get("lead_source"))
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {
+                "id": f"{day}|{key[0] or '-'}|{key[1] or '-'}",
+                "date": day,
+                "owner_id": key[0],
+                "lead_source": key[1],
+                "entered": defaultdict(int),
+                "transitions": defaultdict(lambda: defaultdict(int)),
+                "durations": {},
+                "event_count": 0
+            }
+        row["event_count"] += 1
+        row["entered"][event["to_status"]] += 1
+        if event.get("from_status"):
+            row["transitions"][event["from_status"]][event["to_status"]] += 1
+            if event.get("duration_seconds") is not None:
+                seconds = max(event["duration_seconds"], 0)
+                histogram = row["durations"].setdefault(event["from_status"], _empty_histogram())
+                histogram["count"] += 1
+                histogram["total_seconds"] += seconds
+                histogram["buckets"][bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+
+    return [
+        {
+            **row,
+            "entered": dict(row["entered"]),
+            "transitions": {stage: dict(targets) for stage, targets in row["transitions"].items()}
+        }
+        for row in rows.values()
+    ]
+
+async def rollup_funnel(
+    db,
+    now: Optional[datetime] = None,
+    lag: timedelta = ROLLUP_LAG,
+    include_recent: bool = False
+) -> dict:
+    """
+    Incremental rollup of lead_status_events into funnel_daily_rollups.
+
+    Only days with events past the stored watermark are recomputed, each one from all
+    of its own events, and rows are replaced rather than incremented: a run that dies
+    half-way is simply redone by the next one without double counting.
+
+    With include_recent, days with events inside the lag are rebuilt as well, but the
+    watermark still stops at now - lag so the next run revisits them and picks up any
+    late writes.
+    """
+    now = now or datetime.now(timezone.utc)
+    state = await db.funnel_rollup_state.find_one({"id": ROLLUP_STATE_ID}, {"_id": 0})
+    upper = (now - lag).isoformat()
+    watermark = state.get("watermark") if state else None
+
+    window = {} if include_recent else {"$lte": upper}
+    if watermark:
+        if watermark >= upper and not include_recent:
+            # Nothing has settled since the last run
+            return {"days": 0, "rows": 0, "watermark": watermark}
+        window["$gt"] = watermark
+    touched = await db.lead_status_events.aggregate([
+        {"$match": {"occurred_at": window} if window else {}},
+        {"$group": {"_id": {"$substrBytes": ["$occurred_at", 0, 10]}}},
+        {"$sort": {"_id": 1}}
+    ]).to_list(None)
+
+    rebuilt = 0
+    for day in (row["_id"] for row in touched):
+        next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        events = await db.lead_status_events.find(
+            {"occurred_at": {"$gte": day, "$lt": next_day}}, EVENT_ROLLUP_PROJECTION
+        ).to_list(None)
+        rows = build_day_rollups(day, events)
+        if rows:
+            await db.funnel_daily_rollups.bulk_write(
+                [
+                    UpdateOne({"id": row["id"]}, {"$set": {**row, "rolled_up_at": now.isoformat()}}, upsert=True)
+                    for row in rows
+                ],
+                ordered=False
+            )
+        await db.funnel_daily_rollups.delete_many({"date": day, "id": {"$nin": [row["id"] for row in rows]}})
+        rebuilt += len(rows)
+
+    if not watermark or upper > watermark:
+        await db.funnel_rollup_state.update_one(
+            {"id": ROLLUP_STATE_ID},
+            {"$set": {"watermark": upper, "updated_at": now.isoformat()}},
+            upsert=True
+        )
+        watermark = upper
+    return {"days": len(touched), "rows": rebuilt, "watermark": watermark}
+
+def median_seconds(histogram: dict) -> Optional[float]:
+    """Median estimated from the bucket histogram (linear within the bucket)"""
+    half = histogram["count"] / 2
+    seen = 0
+    for i, in_bucket in enumerate(histogram["buckets"]):
+        if in_bucket and seen + in_bucket >= half:
+            low = DURATION_BUCKETS[i - 1] if i > 0 else 0
+            if i == len(DURATION_BUCKETS):
+                return float(low)
+            return low + (DURATION_BUCKETS[i] - low) * (half - seen) / in_bucket
+        seen += in_bucket
+    return None
+
+def _days(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds / 86400, 2) if seconds is not None else None
+
+def summarize_funnel(rows: List[dict]) -> dict:
+    """Merge rollup rows into stage counts, conversion ratios and time-in-stage"""
+    entered = defaultdict(int)
+    transitions = defaultdict(lambda: defaultdict(int))
+    durations: Dict[str, dict] = {}
+    for row in rows:
+        for stage, n in row.get("entered", {}).items():
+            entered[stage] += n
+        for stage, targets in row.get("transitions", {}).items():
+            for target, n in targets.items():
+                transitions[stage][target] += n
+        for stage, histogram in row.get("durations", {}).items():
+            merged = durations.setdefault(stage, _empty_histogram())
+            merged["count"] += histogram["count"]
+            merged["total_seconds"] += histogram["total_seconds"]
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], histogram["buckets"])]
+
+    stages = []
+    for position, stage in enumerate(FUNNEL_STAGES):
+        exits = transitions.get(stage, {})
+        total_exits = sum(exits.values())
+        advanced = sum(n for target, n in exits.items() if target in FUNNEL_STAGES[position + 1:])
+        lost = exits.get(LOST, 0)
+        histogram = durations.get(stage)
+        stages.append({
+            "stage": stage,
+            "entered": entered.get(stage, 0),
+            "exits": total_exits,
+            "advanced": advanced,
+            "lost": lost,
+            "conversion_rate": round(advanced / total_exits, 3) if total_exits else None,
+            "loss_rate": round(lost / total_exits, 3) if total_exits else None,
+            "median_days_in_stage": _days(median_seconds(histogram)) if histogram else None,
+            "mean_days_in_stage": _days(histogram["total_seconds"] / histogram["count"]) if histogram else None
+        })
+
+    won, lost = entered.get("closed", 0), entered.get(LOST, 0)
+    return {
+        "stages": stages,
+        "won": won,
+        "lost": lost,
+        "win_rate": round(won / (won + lost), 3) if won + lost else None
+    }
+
+async def seed_status_events(db, batch_size: int = 500) -> int:
+    """
+    One event per lead that predates the status history (no `status_changed_at`), so the
+    funnel starts from current statuses instead of empty. Seeded events carry no duration.
+    """
+    seeded = 0
+    events, updates = [], []
+
+    async def flush():
+        await db.lead_status_events.insert_many(events)
+        await db.leads.bulk_write(updates, ordered=False)
+
+    async for lead in db.leads.find(
+        {"status_changed_at": {"$exists": False}},
+        {"_id": 0, "id": 1, "status": 1, "assigned_to": 1, "created_by": 1, "lead_source": 1,
+         "created_at": 1, "updated_at": 1}
+    ):
+        status = lead.get("status") or FUNNEL_STAGES[0]
+        # A lead still in "new" entered it at creation; otherwise its last update is the best guess
+        entered_at = to_datetime(lead.get("created_at") if status == FUNNEL_STAGES[0] else lead.get("updated_at"))
+        event = status_event(lead, None, status, None, entered_at or datetime.now(timezone.utc))
+        events.append({**event, "seeded": True})
+        updates.append(UpdateOne(
+            {"id": lead["id"], "status_changed_at": {"$exists": False}},
+            {"$set": {"status_changed_at": event["occurred_at"]}}
+        ))
+        if len(events) >= batch_size:
+            await flush()
+            seeded += len(events)
+            events, updates = [], []
+    if events:
+        await flush()
+        seeded += len(events)
+
+    if seeded:
+        # Seeded events are back-dated behind the watermark; the next rollup starts over
+        await db.funnel_rollup_state.delete_one({"id": ROLLUP_STATE_ID})
+    return seeded
@@ -1,16 +1,20 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse, FileResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
 import os
+import json
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import uuid
 from email_templates import (
     EmailTemplate, EmailTemplateCreate, FollowUpReminder, FollowUpReminderCreate,
@@ -31,6 +35,28 @@ from agreement_templates import (
     extract_variables_from_template, DEFAULT_AGREEMENT_EMAIL_TEMPLATES
 )
 from email_service import EmailService, create_mock_email_service
+from user_cache import UserDirectoryCache
+from permissions import RolePermissionCache
+from notification_hub import NotificationHub, LocalBroker, MongoChangeStreamBroker
+from notification_counters import seed_unread_counters, reconcile_unread_counters
+from ttl_cache import TTLCache
+from task_scheduler import compute_schedule, collect_downstream, propagate_schedule, ScheduleCycleError
+from consultant_recommender import ConsultantRecommender
+from password_hashing import PasswordHasher
+from token_cache import TokenClaimsCache
+from profile_images import LEGACY_IMAGE_FIELD, ProfileImageStore, decode_image_data, migrate_inline_images
+from lead_search import (
+    TEXT_INDEX_WEIGHTS, SEARCH_FIELDS, search_prefixes, touches_search_fields,
+    build_search_pipeline, backfill_search_prefixes
+)
+from lead_dedup import dedup_keys, find_matches, scan_duplicates, backfill_dedup_keys, DEDUP_PROJECTION
+from sales_funnel import (
+    record_status_change, status_event, rollup_funnel, summarize_funnel, seed_status_events
+)
+from revenue_forecast import current_month, load_revenue_forecast, parse_month
+from consultant_utilization import (
+    rebuild_utilization_rollups, get_consultant_utilization, get_team_utilization, week_start
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -46,9 +72,63 @@ SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 43200
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on a bounded thread pool so hashing never blocks the event loop.
+# Changing BCRYPT_ROUNDS re-hashes each password on its next successful login.
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')),
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '4')),
+    max_concurrent=int(os.environ.get('PASSWORD_HASH_MAX_CONCURRENT', '8'))
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Verified JWT claims (token hash -> claims until exp) plus the logout/role-change revocation set
+token_claims_cache = TokenClaimsCache(
+    max_entries=int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', '10000'))
+)
+
+# User ID -> name/email cache shared by every endpoint that enriches IDs with names
+user_directory = UserDirectoryCache(
+    ttl_seconds=int(os.environ.get('USER_CACHE_TTL_SECONDS', '300'))
+)
+
+# Compiled role_permissions table, invalidated by PATCH /role-permissions/{role}
+role_permissions_cache = RolePermissionCache(
+    ttl_seconds=int(os.environ.get('ROLE_PERMISSIONS_CACHE_TTL_SECONDS', '60'))
+)
+
+# Per-project critical path / progress results, dropped on every task write and start date change
+project_schedule_cache = TTLCache(
+    ttl_seconds=int(os.environ.get('PROJECT_SCHEDULE_CACHE_TTL_SECONDS', '600')),
+    max_entries=1000
+)
+
+# Avatars live on disk (original + thumbnails); users only carry a small `profile_image` reference
+profile_image_store = ProfileImageStore(
+    root_dir=os.environ.get('PROFILE_IMAGE_DIR', '/app/uploads/avatars'),
+    sizes={"small": 64, "medium": 256},
+    max_bytes=int(os.environ.get('PROFILE_IMAGE_MAX_BYTES', str(5 * 1024 * 1024)))
+)
+
+# Lead facet counts per (user scope, filter); short TTL and cleared on every lead write
+lead_facet_cache = TTLCache(
+    ttl_seconds=int(os.environ.get('LEAD_FACET_CACHE_TTL_SECONDS', '30')),
+    max_entries=2000
+)
+
+# Revenue forecast per (current month, first month, horizon); cleared on pricing plan, quotation,
+# agreement and lead status writes
+revenue_forecast_cache = TTLCache(
+    ttl_seconds=int(os.environ.get('REVENUE_FORECAST_CACHE_TTL_SECONDS', '900')),
+    max_entries=64
+)
+
+# Pushes notification events to SSE clients. Use NOTIFICATION_BROKER=mongo to fan out
+# across workers through a change stream (requires a replica set).
+notification_hub = NotificationHub(
+    broker=MongoChangeStreamBroker(db.notification_events)
+    if os.environ.get('NOTIFICATION_BROKER', 'local') == 'mongo' else LocalBroker()
+)
+
 class UserRole(str):
     ADMIN = "admin"
     MANAGER = "manager"
@@ -75,6 +155,12 @@ CONSULTANT_BANDWIDTH_LIMITS = {
     "mixed": 8
 }
 
+# Staffing recommendations; the feature matrix is rebuilt after assignment/profile changes
+consultant_recommender = ConsultantRecommender(
+    CONSULTANT_BANDWIDTH_LIMITS,
+    ttl_seconds=int(os.environ.get('CONSULTANT_RECOMMENDER_TTL_SECONDS', '300'))
+)
+
 class LeadStatus(str):
     NEW = "new"
     CONTACTED = "contacted"
@@ -94,6 +180,12 @@ class User(BaseModel):
     is_active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Only the fields User needs: per-request auth never reads hashed_password, profile fields or images
+USER_MODEL_PROJECTION = {"_id": 0, **{field: 1 for field in User.model_fields}}
+
+# User documents as returned by the API: no password hash or unmigrated inline image
+USER_READ_PROJECTION = {"_id": 0, "hashed_password": 0, LEGACY_IMAGE_FIELD: 0}
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -282,11 +374,8 @@ class MeetingCreate(BaseModel):
     notes: Optional[str] = None
     is_delivered: bool = False
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def calculate_lead_score(lead_data: dict) -> tuple[int, dict]:
     """
@@ -345,36 +434,160 @@ def calculate_lead_score(lead_data: dict) -> tuple[int, dict]:
     breakdown['total'] = score
     return score, breakdown
 
+# Lead fields calculate_lead_score reads; updates touching none of them keep the stored score
+LEAD_SCORE_FIELDS = ('job_title', 'email', 'phone', 'linkedin_url', 'status')
+
+# Lead fields a status-history event needs from the pre-image (owner, source, time in stage)
+LEAD_FUNNEL_FIELDS = ('status', 'status_changed_at', 'created_at', 'assigned_to', 'created_by', 'lead_source')
+
+# Derived lead fields used only for querying; never sent to clients
+LEAD_PROJECTION = {"_id": 0, "search_prefixes": 0, "dedup_keys": 0}
+
+def lead_owner_scope(current_user: User) -> dict:
+    """Managers and executives only see leads assigned to or created by them"""
+    if current_user.role == UserRole.MANAGER or current_user.role == UserRole.EXECUTIVE:
+        return {"$or": [{"assigned_to": current_user.id}, {"created_by": current_user.id}]}
+    return {}
+
+def scope_duplicate_matches(matches: List[dict], current_user: User) -> List[dict]:
+    """Duplicates outside the caller's lead scope only reveal their ID and score"""
+    if not lead_owner_scope(current_user):
+        return matches
+    return [
+        match if current_user.id in (match.get('assigned_to'), match.get('created_by'))
+        else {"id": match['id'], "match_score": match['match_score']}
+        for match in matches
+    ]
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # Sub-second iat so a revocation never catches a token issued right after it
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc).timestamp()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    return await get_user_from_token(token)
+
+async def get_user_from_token(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    payload = token_claims_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        token_claims_cache.put(token, payload)
+    email: str = payload.get("sub")
+    if email is None or token_claims_cache.is_revoked(token, payload):
         raise credentials_exception
-    user_data = await db.users.find_one({"email": email}, {"_id": 0})
+    user_data = await db.users.find_one({"email": email}, USER_MODEL_PROJECTION)
     if user_data is None:
         raise credentials_exception
     if isinstance(user_data.get('created_at'), str):
         user_data['created_at'] = datetime.fromisoformat(user_data['created_at'])
     return User(**user_data)
 
+async def revoke_user_tokens(email: str):
+    """Invalidate every token issued to `email` so far (on all workers after the next sync)"""
+    revoked_at = token_claims_cache.revoke_subject(email)
+    await db.revoked_subjects.update_one(
+        {"sub": email},
+        {
+            "$max": {"revoked_at": revoked_at},
+            # Older tokens have all expired by then, so the entry can go
+            "$set": {"expires_at": datetime.fromtimestamp(revoked_at, timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}
+        },
+        upsert=True
+    )
+
+async def sync_token_revocations():
+    """Pull revocations recorded by other workers into this worker's cache"""
+    now = datetime.now(timezone.utc)
+    tokens = {
+        doc['token_hash']: doc['expires_at'].replace(tzinfo=timezone.utc).timestamp()
+        async for doc in db.revoked_tokens.find({"expires_at": {"$gt": now}}, {"_id": 0})
+    }
+    subjects = {
+        doc['sub']: doc['revoked_at']
+        async for doc in db.revoked_subjects.find({}, {"_id": 0, "sub": 1, "revoked_at": 1})
+    }
+    token_claims_cache.merge_revocations(tokens, subjects)
+
+def require_permission(module: str, action: str):
+    """Dependency that returns the current user if their role grants `action` on `module`"""
+    async def check_permission(current_user: User = Depends(get_current_user)) -> User:
+        if not await role_permissions_cache.has_permission(db.role_permissions, current_user.role, module, action):
+            raise HTTPException(
+                status_code=403,
+                detail=f"Your role does not have '{action}' permission on {module.replace('_', ' ')}"
+            )
+        return current_user
+    return check_permission
+
+def lookup_one(collection: str, local_field: str, fields: dict, as_field: str) -> list:
+    """Pipeline stages joining one document by its `id`, keeping only `fields` (None if missing)"""
+    return [
+        {"$lookup": {
+            "from": collection,
+            "let": {"ref": f"${local_field}"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$ref"]}}},
+                {"$limit": 1},
+                {"$project": fields}
+            ],
+            "as": as_field
+        }},
+        {"$addFields": {as_field: {"$ifNull": [{"$arrayElemAt": [f"${as_field}", 0]}, None]}}}
+    ]
+
+def document_etag(document: dict) -> Optional[str]:
+    """ETag of a document: its `updated_at`, which every write bumps"""
+    updated_at = document.get('updated_at')
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    return f'"{updated_at}"' if updated_at else None
+
+def parse_if_match(if_match: Optional[str]) -> Optional[str]:
+    """The `updated_at` a client's If-Match header expects, or None when absent or `*`"""
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag.strip('"')
+
+async def guarded_update(collection, document_id: str, update: dict, expected_updated_at: Optional[str], label: str,
+                         projection: Optional[dict] = None) -> dict:
+    """
+    find_one_and_update that only applies while the document still has `expected_updated_at`
+    (skipped when None). Returns the updated document; 404 if it is gone, 412 if it changed.
+    """
+    query = {"id": document_id}
+    if expected_updated_at is not None:
+        query['updated_at'] = expected_updated_at
+    updated = await collection.find_one_and_update(
+        query, update,
+        projection=projection or {"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        if expected_updated_at is not None and await collection.count_documents({"id": document_id}, limit=1):
+            raise HTTPException(
+                status_code=412,
+                detail=f"{label} was modified by someone else; reload it and try again"
+            )
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    return updated
+
 @api_router.post("/auth/register", response_model=User)
 async def register(user_create: UserCreate):
     existing_user = await db.users.find_one({"email": user_create.email})
@@ -386,9 +599,10 @@ async def register(user_create: UserCreate):
     
     doc = user.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    doc['hashed_password'] = get_password_hash(user_create.password)
+    doc['hashed_password'] = await get_password_hash(user_create.password)
     
     await db.users.insert_one(doc)
+    user_directory.invalidate(user.id)
     return user
 
 @api_router.post("/auth/login", response_model=Token)
@@ -397,8 +611,12 @@ async def login(user_login: UserLogin):
     if not user_data:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
-    if not verify_password(user_login.password, user_data['hashed_password']):
+    verified, new_hash = await password_hasher.verify_and_update(user_login.password, user_data['hashed_password'])
+    if not verified:
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost; upgrade it transparently
+        await db.users.update_one({"id": user_data['id']}, {"$set": {"hashed_password": new_hash}})
     
     if isinstance(user_data.get('created_at'), str):
         user_data['created_at'] = datetime.fromisoformat(user_data['created_at'])
@@ -413,17 +631,42 @@ async def login(user_login: UserLogin):
     
     return Token(access_token=access_token, token_type="bearer", user=user)
 
+@api_router.post("/auth/logout")
+async def logout(token: str = Depends(oauth2_scheme), current_user: User = Depends(get_current_user)):
+    """Revoke the bearer token used for this request"""
+    claims = token_claims_cache.get(token) or jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_hash = token_claims_cache.revoke_token(token, claims['exp'])
+    await db.revoked_tokens.update_one(
+        {"token_hash": token_hash},
+        {"$set": {"token_hash": token_hash, "expires_at": datetime.fromtimestamp(claims['exp'], timezone.utc)}},
+        upsert=True
+    )
+    return {"message": "Logged out successfully"}
+
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @api_router.post("/leads", response_model=Lead)
-async def create_lead(lead_create: LeadCreate, current_user: User = Depends(get_current_user)):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
+async def create_lead(
+    lead_create: LeadCreate,
+    check_duplicates: bool = False,
+    current_user: User = Depends(require_permission("leads", "create"))
+):
+    """Create a lead. With check_duplicates=true, likely duplicates of an existing lead return 409."""
     lead_dict = lead_create.model_dump()
     
+    if check_duplicates:
+        duplicates = await find_matches(db.leads, lead_dict)
+        if duplicates:
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "Possible duplicate of an existing lead",
+                    "duplicates": scope_duplicate_matches(duplicates, current_user)
+                }
+            )
+    
     # Calculate lead score
     score, breakdown = calculate_lead_score(lead_dict)
     
@@ -434,27 +677,114 @@ async def create_lead(lead_create: LeadCreate, current_user: User = Depends(get_
     doc['updated_at'] = doc['updated_at'].isoformat()
     if doc['enriched_at']:
         doc['enriched_at'] = doc['enriched_at'].isoformat()
+    doc['search_prefixes'] = search_prefixes(doc)
+    doc['dedup_keys'] = dedup_keys(doc)
+    doc['status_changed_at'] = doc['created_at']
     
     await db.leads.insert_one(doc)
+    await record_status_change(db.lead_status_events, doc, None, doc['status'], current_user.id, lead.created_at)
+    lead_facet_cache.clear()
     return lead
 
-@api_router.get("/leads", response_model=List[Lead])
+@api_router.post("/leads/check-duplicates")
+async def check_lead_duplicates(
+    lead_create: LeadCreate,
+    current_user: User = Depends(require_permission("leads", "create"))
+):
+    """Existing leads that look like the same contact, for warning before create"""
+    matches = await find_matches(db.leads, lead_create.model_dump())
+    return {"duplicates": scope_duplicate_matches(matches, current_user)}
+
+# Lead fields counted by GET /leads?include_facets=true ("owner" is assigned_to)
+LEAD_FACET_FIELDS = {
+    "status": "status",
+    "lead_source": "lead_source",
+    "sales_status": "sales_status",
+    "city": "city",
+    "owner": "assigned_to",
+}
+LEAD_FACET_LIMIT = 50
+
+class LeadFacetValue(BaseModel):
+    value: Optional[str] = None
+    count: int
+    label: Optional[str] = None
+
+class LeadListWithFacets(BaseModel):
+    leads: List[Lead]
+    facets: dict  # facet name -> List[LeadFacetValue], most common first
+
+async def get_lead_facets(query: dict) -> dict:
+    """Counts per facet value over `query`, all facets in one $facet aggregation"""
+    cache_key = json.dumps(query, sort_keys=True)
+    facets = lead_facet_cache.get(cache_key)
+    if facets is not None:
+        return facets
+    
+    result = await db.leads.aggregate([
+        {"$match": query},
+        {"$facet": {
+            name: [
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": LEAD_FACET_LIMIT}
+            ]
+            for name, field in LEAD_FACET_FIELDS.items()
+        }}
+    ]).to_list(1)
+    counts = result[0] if result else {name: [] for name in LEAD_FACET_FIELDS}
+    
+    owner_names = await user_directory.get_names(db.users, [row['_id'] for row in counts['owner']])
+    facets = {
+        name: [
+            LeadFacetValue(
+                value=row['_id'],
+                count=row['count'],
+                label=owner_names.get(row['_id']) if name == "owner" and row['_id'] else None
+            ).model_dump()
+            for row in rows
+        ]
+        for name, rows in counts.items()
+    }
+    lead_facet_cache.set(cache_key, facets)
+    return facets
+
+@api_router.get("/leads", response_model=Union[List[Lead], LeadListWithFacets])
 async def get_leads(
     status: Optional[str] = None,
     assigned_to: Optional[str] = None,
+    lead_source: Optional[str] = None,
+    sales_status: Optional[str] = None,
+    city: Optional[str] = None,
+    include_facets: bool = False,
     current_user: User = Depends(get_current_user)
 ):
+    """
+    List leads. With include_facets=true the response is {"leads", "facets"}, where facets
+    count status, lead_source, sales_status, city and owner over the same filter.
+    """
     query = {}
     if status:
         query['status'] = status
     if assigned_to:
         query['assigned_to'] = assigned_to
-    
-    if current_user.role == UserRole.MANAGER or current_user.role == UserRole.EXECUTIVE:
-        if 'assigned_to' not in query:
-            query['$or'] = [{"assigned_to": current_user.id}, {"created_by": current_user.id}]
-    
-    leads = await db.leads.find(query, {"_id": 0}).to_list(1000)
+    if lead_source:
+        query['lead_source'] = lead_source
+    if sales_status:
+        query['sales_status'] = sales_status
+    if city:
+        query['city'] = city
+    
+    if 'assigned_to' not in query:
+        query.update(lead_owner_scope(current_user))
+    
+    if include_facets:
+        leads, facets = await asyncio.gather(
+            db.leads.find(query, LEAD_PROJECTION).to_list(1000),
+            get_lead_facets(query)
+        )
+    else:
+        leads = await db.leads.find(query, LEAD_PROJECTION).to_list(1000)
     
     for lead in leads:
         if isinstance(lead.get('created_at'), str):
@@ -464,14 +794,94 @@ async def get_leads(
         if lead.get('enriched_at') and isinstance(lead['enriched_at'], str):
             lead['enriched_at'] = datetime.fromisoformat(lead['enriched_at'])
     
+    if include_facets:
+        return LeadListWithFacets(leads=leads, facets=facets)
     return leads
 
+# /leads/duplicates must be defined BEFORE /leads/{lead_id} to avoid route conflict
+@api_router.get("/leads/duplicates")
+async def get_lead_duplicates(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
+):
+    """Duplicate groups found by the last scan, most certain first"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can review duplicate leads")
+    
+    result = await db.lead_duplicate_groups.aggregate([
+        {"$sort": {"max_score": -1, "id": 1}},
+        {"$facet": {
+            "items": [
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$lookup": {
+                    "from": "leads",
+                    "let": {"ids": "$lead_ids"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$in": ["$id", "$$ids"]}}},
+                        {"$project": DEDUP_PROJECTION}
+                    ],
+                    "as": "leads"
+                }},
+                {"$project": {"_id": 0}}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
+    
+    page = result[0] if result else {"items": [], "total": []}
+    response.headers["X-Total-Count"] = str(page['total'][0]['count'] if page['total'] else 0)
+    return page['items']
+
+@api_router.post("/leads/duplicates/scan")
+async def scan_lead_duplicates(current_user: User = Depends(get_current_user)):
+    """Re-run the duplicate scan now instead of waiting for the scheduled job"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can scan for duplicate leads")
+    
+    await backfill_lead_index_fields()
+    return await scan_duplicates(db)
+
+LEAD_SEARCH_FIELDS = {
+    "_id": 0, "id": 1, "first_name": 1, "last_name": 1, "company": 1, "email": 1, "phone": 1,
+    "job_title": 1, "city": 1, "status": 1, "lead_score": 1, "assigned_to": 1, "created_by": 1
+}
+
+# /leads/search must be defined BEFORE /leads/{lead_id} to avoid route conflict
+@api_router.get("/leads/search")
+async def search_leads(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    mode: str = Query("prefix", pattern="^(prefix|text)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Search leads by name, company, email, phone, job title and notes.
+    `prefix` (typeahead) matches word prefixes ranked by lead score; `text` ranks whole-word matches by relevance.
+    """
+    pipeline = build_search_pipeline(q, mode, lead_owner_scope(current_user), LEAD_SEARCH_FIELDS, skip, limit)
+    if pipeline is None:
+        response.headers["X-Total-Count"] = "0"
+        return []
+    
+    result = await db.leads.aggregate(pipeline).to_list(1)
+    page = result[0] if result else {"items": [], "total": []}
+    response.headers["X-Total-Count"] = str(page['total'][0]['count'] if page['total'] else 0)
+    return page['items']
+
 @api_router.get("/leads/{lead_id}", response_model=Lead)
-async def get_lead(lead_id: str, current_user: User = Depends(get_current_user)):
-    lead_data = await db.leads.find_one({"id": lead_id}, {"_id": 0})
+async def get_lead(lead_id: str, response: Response, current_user: User = Depends(get_current_user)):
+    lead_data = await db.leads.find_one({"id": lead_id}, LEAD_PROJECTION)
     if not lead_data:
         raise HTTPException(status_code=404, detail="Lead not found")
     
+    etag = document_etag(lead_data)
+    if etag:
+        response.headers["ETag"] = etag
     if isinstance(lead_data.get('created_at'), str):
         lead_data['created_at'] = datetime.fromisoformat(lead_data['created_at'])
     if isinstance(lead_data.get('updated_at'), str):
@@ -485,27 +895,63 @@ async def get_lead(lead_id: str, current_user: User = Depends(get_current_user))
 async def update_lead(
     lead_id: str,
     lead_update: LeadUpdate,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(require_permission("leads", "update"))
 ):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
-    lead_data = await db.leads.find_one({"id": lead_id}, {"_id": 0})
-    if not lead_data:
-        raise HTTPException(status_code=404, detail="Lead not found")
-    
+    """Update a lead. Send the ETag from GET as If-Match to get 412 instead of overwriting a newer edit."""
+    expected = parse_if_match(if_match)
     update_data = lead_update.model_dump(exclude_unset=True)
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
-    
-    # Recalculate lead score with updated data
-    merged_data = {**lead_data, **update_data}
-    score, breakdown = calculate_lead_score(merged_data)
-    update_data['lead_score'] = score
-    update_data['score_breakdown'] = breakdown
     
-    await db.leads.update_one({"id": lead_id}, {"$set": update_data})
-    
-    updated_lead_data = await db.leads.find_one({"id": lead_id}, {"_id": 0})
+    rescore = any(field in update_data for field in LEAD_SCORE_FIELDS)
+    reindex = touches_search_fields(update_data)
+    track_status = 'status' in update_data
+    
+    for attempt in range(3):
+        now = datetime.now(timezone.utc)
+        changes = {**update_data, 'updated_at': now.isoformat()}
+        guard = expected
+        current = None
+        if rescore or reindex or track_status:
+            # Score, search prefixes and the status transition come from the pre-image,
+            # written only if nobody changed the lead in between
+            current = await db.leads.find_one(
+                {"id": lead_id},
+                {"_id": 0, "updated_at": 1, **{f: 1 for f in LEAD_SCORE_FIELDS + SEARCH_FIELDS + LEAD_FUNNEL_FIELDS}}
+            )
+            if not current:
+                raise HTTPException(status_code=404, detail="Lead not found")
+            if expected is not None and current.get('updated_at') != expected:
+                raise HTTPException(status_code=412, detail="Lead was modified by someone else; reload it and try again")
+            merged = {**current, **update_data}
+            if rescore:
+                changes['lead_score'], changes['score_breakdown'] = calculate_lead_score(merged)
+            if reindex:
+                changes['search_prefixes'] = search_prefixes(merged)
+                changes['dedup_keys'] = dedup_keys(merged)
+            if track_status and merged['status'] != current.get('status'):
+                changes['status_changed_at'] = changes['updated_at']
+            guard = current.get('updated_at')
+        
+        try:
+            updated_lead_data = await guarded_update(
+                db.leads, lead_id, {"$set": changes}, guard, "Lead", projection=LEAD_PROJECTION
+            )
+            break
+        except HTTPException as e:
+            # Lost a race on the score pre-image without an If-Match: recompute and retry
+            if e.status_code != 412 or expected is not None or attempt == 2:
+                raise
+    
+    if 'status_changed_at' in changes:
+        await record_status_change(
+            db.lead_status_events, updated_lead_data, current.get('status'), changes['status'],
+            current_user.id, now, current.get('status_changed_at') or current.get('created_at')
+        )
+        # Lost leads drop out of the forecast pipeline
+        revenue_forecast_cache.clear()
+    lead_facet_cache.clear()
+    response.headers["ETag"] = document_etag(updated_lead_data)
     if isinstance(updated_lead_data.get('created_at'), str):
         updated_lead_data['created_at'] = datetime.fromisoformat(updated_lead_data['created_at'])
     if isinstance(updated_lead_data.get('updated_at'), str):
@@ -523,6 +969,7 @@ async def delete_lead(lead_id: str, current_user: User = Depends(get_current_use
     result = await db.leads.delete_one({"id": lead_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Lead not found")
+    lead_facet_cache.clear()
     return {"message": "Lead deleted successfully"}
 
 @api_router.post("/projects", response_model=Project)
@@ -663,7 +1110,10 @@ async def create_meeting(meeting_create: MeetingCreate, current_user: User = Dep
     if meeting.is_delivered:
         await db.projects.update_one(
             {"id": meeting.project_id},
-            {"$inc": {"total_meetings_delivered": 1, "number_of_visits": 1}}
+            {
+                "$inc": {"total_meetings_delivered": 1, "number_of_visits": 1},
+                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+            }
         )
     
     return meeting
@@ -712,6 +1162,110 @@ async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
         "active_projects": active_projects
     }
 
+# Default and maximum reporting window of the sales funnel, in days
+FUNNEL_DEFAULT_DAYS = 90
+FUNNEL_MAX_DAYS = int(os.environ.get('FUNNEL_MAX_DAYS', '730'))
+
+async def refresh_sales_funnel():
+    seeded = await seed_status_events(db)
+    summary = await rollup_funnel(db)
+    if seeded or summary['rows']:
+        logger.info(f"Sales funnel: seeded {seeded} status events, rebuilt {summary['rows']} rollups over {summary['days']} days")
+    return summary
+
+@api_router.get("/reports/sales-funnel")
+async def get_sales_funnel(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    owner_id: Optional[str] = None,
+    lead_source: Optional[str] = None,
+    group_by: Optional[str] = Query(None, pattern="^(owner|lead_source)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stage counts, conversion and loss rates and time-in-stage from the daily funnel rollups
+    (refreshed every few minutes; raw leads and events are not scanned).
+    Non-admins only see leads they own.
+    """
+    try:
+        end = datetime.fromisoformat(date_to).date() if date_to else datetime.now(timezone.utc).date()
+        start = datetime.fromisoformat(date_from).date() if date_from else end - timedelta(days=FUNNEL_DEFAULT_DAYS - 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date_from and date_to must be ISO dates")
+    if start > end:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (end - start).days >= FUNNEL_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {FUNNEL_MAX_DAYS} days")
+    
+    if current_user.role != UserRole.ADMIN:
+        owner_id = current_user.id
+    query = {"date": {"$gte": start.isoformat(), "$lte": end.isoformat()}}
+    if owner_id:
+        query['owner_id'] = owner_id
+    if lead_source:
+        query['lead_source'] = lead_source
+    
+    rows = await db.funnel_daily_rollups.find(
+        query, {"_id": 0, "owner_id": 1, "lead_source": 1, "entered": 1, "transitions": 1, "durations": 1}
+    ).to_list(None)
+    state = await db.funnel_rollup_state.find_one({}, {"_id": 0, "watermark": 1})
+    
+    result = {
+        "date_from": start.isoformat(),
+        "date_to": end.isoformat(),
+        "as_of": state['watermark'] if state else None,
+        **summarize_funnel(rows)
+    }
+    if group_by:
+        field = "owner_id" if group_by == "owner" else "lead_source"
+        groups = {}
+        for row in rows:
+            groups.setdefault(row.get(field), []).append(row)
+        names = await user_directory.get_names(db.users, [v for v in groups if v]) if group_by == "owner" else {}
+        result['groups'] = [
+            {"value": value, "label": names.get(value), **summarize_funnel(group_rows)}
+            for value, group_rows in sorted(groups.items(), key=lambda item: -len(item[1]))
+        ]
+    return result
+
+@api_router.post("/reports/sales-funnel/refresh")
+async def refresh_sales_funnel_rollups(current_user: User = Depends(get_current_user)):
+    """Roll up every status change so far instead of waiting for the periodic job (Admin only)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can refresh funnel rollups")
+    
+    await seed_status_events(db)
+    summary = await rollup_funnel(db, include_recent=True)
+    return {"message": "Funnel rollups refreshed", **summary}
+
+REVENUE_FORECAST_MAX_MONTHS = 36
+
+@api_router.get("/reports/revenue-forecast")
+async def get_revenue_forecast(
+    from_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    months: int = Query(12, ge=1, le=REVENUE_FORECAST_MAX_MONTHS),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Month-by-month expected revenue: approved agreements spread over their duration by
+    payment schedule, plus open quotations weighted by stage probability (Admin/Manager only)
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can view the revenue forecast")
+    today = current_month()
+    try:
+        first_month = parse_month(from_month) if from_month else today
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from_month must be YYYY-MM")
+    
+    # Keyed by resolved months: the default window and the pipeline start clamp both move at month end
+    key = (today, first_month, months)
+    result = revenue_forecast_cache.get(key)
+    if result is None:
+        result = await load_revenue_forecast(db, first_month, months)
+        revenue_forecast_cache.set(key, result)
+    return result
+
 @api_router.post("/email-templates", response_model=EmailTemplate)
 async def create_email_template(template_create: EmailTemplateCreate, current_user: User = Depends(get_current_user)):
     if current_user.role == UserRole.MANAGER:
@@ -858,10 +1412,7 @@ async def get_communication_logs(
     return logs
 
 @api_router.post("/pricing-plans", response_model=PricingPlan)
-async def create_pricing_plan(plan_create: PricingPlanCreate, current_user: User = Depends(get_current_user)):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
+async def create_pricing_plan(plan_create: PricingPlanCreate, current_user: User = Depends(require_permission("pricing_plans", "create"))):
     plan_dict = plan_create.model_dump()
     
     # Convert consultant dicts to ConsultantAllocation objects for calculation
@@ -886,6 +1437,7 @@ async def create_pricing_plan(plan_create: PricingPlanCreate, current_user: User
     doc['updated_at'] = doc['updated_at'].isoformat()
     
     await db.pricing_plans.insert_one(doc)
+    revenue_forecast_cache.clear()
     return plan
 
 @api_router.get("/pricing-plans")
@@ -983,11 +1535,52 @@ async def create_sow(
     # Link SOW to pricing plan
     await db.pricing_plans.update_one(
         {"id": sow_create.pricing_plan_id},
-        {"$set": {"sow_id": sow.id}}
+        {"$set": {"sow_id": sow.id, "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
     
     return {"message": "SOW created successfully", "sow_id": sow.id}
 
+SOW_LEAD_FIELDS = {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "company": 1, "email": 1, "phone": 1, "status": 1}
+SOW_PLAN_FIELDS = {
+    "_id": 0, "id": 1, "project_duration_type": 1, "project_duration_months": 1, "payment_schedule": 1,
+    "base_amount": 1, "discount_percentage": 1, "gst_percentage": 1, "total_amount": 1
+}
+
+# Pending approval must be defined BEFORE /sow/{sow_id} to avoid route conflict
+@api_router.get("/sow/pending-approval")
+async def get_sow_pending_approval(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
+):
+    """Get SOWs pending manager approval, oldest submission first"""
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Only Manager/Admin can view pending approvals")
+    
+    result = await db.sow.aggregate([
+        {"$match": {"overall_status": SOWOverallStatus.PENDING_APPROVAL}},
+        {"$sort": {"submitted_at": 1, "id": 1}},
+        {"$facet": {
+            "items": [
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "version_history": 0}},
+                {"$addFields": {"pending_items_count": {"$size": {"$filter": {
+                    "input": {"$ifNull": ["$items", []]},
+                    "cond": {"$eq": ["$$this.status", SOWItemStatus.PENDING_REVIEW]}
+                }}}}},
+                *lookup_one("leads", "lead_id", SOW_LEAD_FIELDS, "lead"),
+                *lookup_one("pricing_plans", "pricing_plan_id", SOW_PLAN_FIELDS, "pricing_plan")
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
+    
+    page = result[0] if result else {"items": [], "total": []}
+    response.headers["X-Total-Count"] = str(page['total'][0]['count'] if page['total'] else 0)
+    return page['items']
+
 @api_router.get("/sow/{sow_id}")
 async def get_sow(
     sow_id: str,
@@ -1144,9 +1737,9 @@ async def get_sow_versions(
     
     # Enrich version history with user names
     versions = sow.get('version_history', [])
+    names = await user_directory.get_names(db.users, [v.get('changed_by') for v in versions])
     for version in versions:
-        user = await db.users.find_one({"id": version.get('changed_by')}, {"_id": 0, "full_name": 1})
-        version['changed_by_name'] = user.get('full_name', 'Unknown') if user else 'Unknown'
+        version['changed_by_name'] = names.get(version.get('changed_by'), 'Unknown')
     
     return {
         "current_version": sow.get('current_version', 1),
@@ -1611,39 +2204,8 @@ async def download_sow_document(
     
     raise HTTPException(status_code=404, detail="Document not found")
 
-@api_router.get("/sow/pending-approval")
-async def get_sow_pending_approval(current_user: User = Depends(get_current_user)):
-    """Get all SOWs pending manager approval"""
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Only Manager/Admin can view pending approvals")
-    
-    sows = await db.sow.find(
-        {"overall_status": SOWOverallStatus.PENDING_APPROVAL},
-        {"_id": 0}
-    ).to_list(100)
-    
-    # Enrich with lead and pricing plan info
-    result = []
-    for sow in sows:
-        lead = await db.leads.find_one({"id": sow.get('lead_id')}, {"_id": 0})
-        plan = await db.pricing_plans.find_one({"id": sow.get('pricing_plan_id')}, {"_id": 0})
-        
-        pending_items = len([i for i in sow.get('items', []) if i.get('status') == SOWItemStatus.PENDING_REVIEW])
-        
-        result.append({
-            **sow,
-            "lead": lead,
-            "pricing_plan": plan,
-            "pending_items_count": pending_items
-        })
-    
-    return result
-
 @api_router.post("/quotations", response_model=Quotation)
-async def create_quotation(quotation_create: QuotationCreate, current_user: User = Depends(get_current_user)):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
+async def create_quotation(quotation_create: QuotationCreate, current_user: User = Depends(require_permission("quotations", "create"))):
     # Get pricing plan
     plan_data = await db.pricing_plans.find_one({"id": quotation_create.pricing_plan_id}, {"_id": 0})
     if not plan_data:
@@ -1676,6 +2238,7 @@ async def create_quotation(quotation_create: QuotationCreate, current_user: User
     doc['updated_at'] = doc['updated_at'].isoformat()
     
     await db.quotations.insert_one(doc)
+    revenue_forecast_cache.clear()
     return quotation
 
 @api_router.get("/quotations")
@@ -1707,13 +2270,11 @@ async def finalize_quotation(quotation_id: str, current_user: User = Depends(get
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Quotation not found")
     
+    revenue_forecast_cache.clear()
     return {"message": "Quotation finalized"}
 
 @api_router.post("/agreements", response_model=Agreement)
-async def create_agreement(agreement_create: AgreementCreate, current_user: User = Depends(get_current_user)):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
+async def create_agreement(agreement_create: AgreementCreate, current_user: User = Depends(require_permission("agreements", "create"))):
     # Generate agreement number
     count = await db.agreements.count_documents({})
     agreement_number = f"AGR-{datetime.now().year}-{count + 1:04d}"
@@ -1776,6 +2337,7 @@ async def create_agreement(agreement_create: AgreementCreate, current_user: User
         doc['project_start_date'] = doc['project_start_date'].isoformat()
     
     await db.agreements.insert_one(doc)
+    revenue_forecast_cache.clear()
     
     # Don't update lead status yet - wait for manager approval
     # Status will be updated to 'closed' only after approval
@@ -1949,36 +2511,48 @@ async def get_agreements(
 @api_router.patch("/agreements/{agreement_id}/approve")
 async def approve_agreement(
     agreement_id: str,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(require_permission("agreements", "approve"))
 ):
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Only managers and admins can approve agreements")
-    
-    agreement_data = await db.agreements.find_one({"id": agreement_id}, {"_id": 0})
-    if not agreement_data:
-        raise HTTPException(status_code=404, detail="Agreement not found")
-    
-    # Update agreement status to approved
-    await db.agreements.update_one(
-        {"id": agreement_id},
+    """Approve an agreement. With If-Match (its updated_at as ETag), approving a since-edited version returns 412."""
+    now = datetime.now(timezone.utc).isoformat()
+    agreement_data = await guarded_update(
+        db.agreements,
+        agreement_id,
         {"$set": {
             "status": "approved",
             "approved_by": current_user.id,
-            "approved_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "approved_at": now,
+            "updated_at": now
+        }},
+        parse_if_match(if_match),
+        "Agreement",
+        projection={"_id": 0, "lead_id": 1, "updated_at": 1}
     )
+    response.headers["ETag"] = document_etag(agreement_data)
+    revenue_forecast_cache.clear()
     
     # Update lead status to 'closed' when agreement is approved
     lead_id = agreement_data.get('lead_id')
     if lead_id:
-        await db.leads.update_one(
-            {"id": lead_id},
+        closed_at = datetime.now(timezone.utc)
+        previous = await db.leads.find_one_and_update(
+            {"id": lead_id, "status": {"$ne": LeadStatus.CLOSED}},
             {"$set": {
-                "status": "closed",
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
+                "status": LeadStatus.CLOSED,
+                "status_changed_at": closed_at.isoformat(),
+                "updated_at": closed_at.isoformat()
+            }},
+            projection={"_id": 0, "id": 1, **{f: 1 for f in LEAD_FUNNEL_FIELDS}},
+            return_document=ReturnDocument.BEFORE
         )
+        if previous:
+            await record_status_change(
+                db.lead_status_events, previous, previous.get('status'), LeadStatus.CLOSED, current_user.id,
+                closed_at, previous.get('status_changed_at') or previous.get('created_at')
+            )
+        lead_facet_cache.clear()
     
     return {"message": "Agreement approved and lead marked as closed"}
 
@@ -1989,11 +2563,8 @@ class RejectionRequest(BaseModel):
 async def reject_agreement(
     agreement_id: str,
     rejection_data: RejectionRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_permission("agreements", "approve"))
 ):
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Only managers and admins can reject agreements")
-    
     result = await db.agreements.update_one(
         {"id": agreement_id},
         {"$set": {
@@ -2008,78 +2579,70 @@ async def reject_agreement(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Agreement not found")
     
+    revenue_forecast_cache.clear()
     return {"message": "Agreement rejected"}
 
+APPROVAL_QUOTATION_FIELDS = {
+    "_id": 0, "id": 1, "quotation_number": 1, "status": 1, "total_meetings": 1,
+    "subtotal": 1, "discount_amount": 1, "gst_amount": 1, "grand_total": 1, "created_at": 1
+}
+
 @api_router.get("/agreements/pending-approval")
-async def get_pending_approvals(current_user: User = Depends(get_current_user)):
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Only managers and admins can view pending approvals")
-    
-    agreements = await db.agreements.find(
-        {"status": "pending_approval"},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    result = []
-    for agreement in agreements:
-        if isinstance(agreement.get('created_at'), str):
-            agreement['created_at'] = datetime.fromisoformat(agreement['created_at'])
-        if isinstance(agreement.get('updated_at'), str):
-            agreement['updated_at'] = datetime.fromisoformat(agreement['updated_at'])
-        if agreement.get('start_date') and isinstance(agreement['start_date'], str):
-            agreement['start_date'] = datetime.fromisoformat(agreement['start_date'])
-        if agreement.get('end_date') and isinstance(agreement['end_date'], str):
-            agreement['end_date'] = datetime.fromisoformat(agreement['end_date'])
-        
-        # Get associated quotation
-        quotation = None
-        if agreement.get('quotation_id'):
-            quotation = await db.quotations.find_one(
-                {"id": agreement['quotation_id']},
-                {"_id": 0}
-            )
-        
-        result.append({
-            "agreement": agreement,
-            "quotation": quotation
-        })
+async def get_pending_approvals(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(require_permission("agreements", "approve"))
+):
+    """Agreements awaiting approval, oldest first, each with its quotation summary"""
+    result = await db.agreements.aggregate([
+        {"$match": {"status": "pending_approval"}},
+        {"$sort": {"created_at": 1, "id": 1}},
+        {"$facet": {
+            "items": [
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"_id": 0}},
+                {"$replaceRoot": {"newRoot": {"agreement": "$$ROOT"}}},
+                *lookup_one("quotations", "agreement.quotation_id", APPROVAL_QUOTATION_FIELDS, "quotation")
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
     
-    return result
+    page = result[0] if result else {"items": [], "total": []}
+    response.headers["X-Total-Count"] = str(page['total'][0]['count'] if page['total'] else 0)
+    return page['items']
 
 @api_router.post("/leads/bulk-upload")
 async def bulk_upload_leads(
     leads_data: List[LeadCreate],
     skip_duplicates: bool = True,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_permission("leads", "create"))
 ):
-    if current_user.role == UserRole.MANAGER:
-        raise HTTPException(status_code=403, detail="Managers can only view and download")
-    
     created_leads = []
     skipped_duplicates = []
     errors = []
+    status_events = []
     
     for lead_data in leads_data:
         try:
-            # Check for duplicates based on email or phone
+            lead_dict = lead_data.model_dump()
+            
+            # Fuzzy match on normalized contact details; rows inserted earlier in this upload count too
             if skip_duplicates:
-                existing = await db.leads.find_one({
-                    "$or": [
-                        {"email": lead_data.email} if lead_data.email else {},
-                        {"phone": lead_data.phone} if lead_data.phone else {}
-                    ]
-                }, {"_id": 0})
-                
-                if existing:
+                matches = await find_matches(db.leads, lead_dict, limit=1)
+                if matches:
                     skipped_duplicates.append({
                         "email": lead_data.email,
                         "phone": lead_data.phone,
+                        "duplicate_of": matches[0]['id'],
+                        "match_score": matches[0]['match_score'],
                         "reason": "Duplicate found"
                     })
                     continue
             
             # Create lead
-            lead_dict = lead_data.model_dump()
             score, breakdown = calculate_lead_score(lead_dict)
             
             lead = Lead(**lead_dict, created_by=current_user.id, lead_score=score, score_breakdown=breakdown)
@@ -2089,8 +2652,12 @@ async def bulk_upload_leads(
             doc['updated_at'] = doc['updated_at'].isoformat()
             if doc['enriched_at']:
                 doc['enriched_at'] = doc['enriched_at'].isoformat()
+            doc['search_prefixes'] = search_prefixes(doc)
+            doc['dedup_keys'] = dedup_keys(doc)
+            doc['status_changed_at'] = doc['created_at']
             
             await db.leads.insert_one(doc)
+            status_events.append(status_event(doc, None, doc['status'], current_user.id, lead.created_at))
             created_leads.append(lead.id)
             
         except Exception as e:
@@ -2099,6 +2666,12 @@ async def bulk_upload_leads(
                 "error": str(e)
             })
     
+    if created_leads:
+        await db.lead_status_events.insert_many(status_events)
+        # Leads uploaded as lost drop out of the forecast pipeline
+        revenue_forecast_cache.clear()
+        lead_facet_cache.clear()
+    
     return {
         "created_count": len(created_leads),
         "skipped_count": len(skipped_duplicates),
@@ -2280,17 +2853,14 @@ async def send_agreement_email(
 # ==================== CONSULTANT MANAGEMENT APIs ====================
 
 @api_router.post("/consultants", response_model=User)
-async def create_consultant(user_create: UserCreate, current_user: User = Depends(get_current_user)):
+async def create_consultant(user_create: UserCreate, current_user: User = Depends(require_permission("consultants", "create"))):
     """Create a new consultant (Admin only)"""
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=403, detail="Only admins can create consultant accounts")
-    
     # Force role to consultant
     existing_user = await db.users.find_one({"email": user_create.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user_create.password)
+    hashed_password = await get_password_hash(user_create.password)
     user = User(
         email=user_create.email,
         full_name=user_create.full_name,
@@ -2303,6 +2873,7 @@ async def create_consultant(user_create: UserCreate, current_user: User = Depend
     user_dict['created_at'] = user_dict['created_at'].isoformat()
     
     await db.users.insert_one(user_dict)
+    user_directory.invalidate(user.id)
     
     # Create consultant profile with bandwidth settings
     preferred_mode = "mixed"
@@ -2319,7 +2890,8 @@ async def create_consultant(user_create: UserCreate, current_user: User = Depend
         "created_at": datetime.now(timezone.utc).isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.consultant_profiles.insert_one(profile)
+    await db.consultant_profiles.update_one({"user_id": user.id}, {"$setOnInsert": profile}, upsert=True)
+    consultant_recommender.mark_dirty()
     
     return user
 
@@ -2332,7 +2904,7 @@ async def get_consultants(current_user: User = Depends(get_current_user)):
     # Get all consultant users
     consultants = await db.users.find(
         {"role": UserRole.CONSULTANT, "is_active": True},
-        {"_id": 0, "hashed_password": 0}
+        USER_READ_PROJECTION
     ).to_list(1000)
     
     result = []
@@ -2382,6 +2954,93 @@ async def get_consultants(current_user: User = Depends(get_current_user)):
     
     return result
 
+# Recommendations must be defined BEFORE /consultants/{consultant_id} to avoid route conflict
+@api_router.get("/consultants/recommendations")
+async def get_consultant_recommendations(
+    project_id: Optional[str] = None,
+    project_type: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    start_date: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    include_unavailable: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rank consultants for staffing a project by free bandwidth, specialization match,
+    meeting load and preferred mode. Missing criteria are filled in from `project_id`
+    (project type, start date and the SOW item categories of its lead).
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can view consultant recommendations")
+    
+    if project_id:
+        project = await db.projects.find_one(
+            {"id": project_id},
+            {"_id": 0, "project_type": 1, "start_date": 1, "lead_id": 1}
+        )
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        project_type = project_type or project.get('project_type')
+        start_date = start_date or project.get('start_date')
+        if categories is None and project.get('lead_id'):
+            sow = await db.sow.find_one({"lead_id": project['lead_id']}, {"_id": 0, "items.category": 1})
+            categories = [item['category'] for item in (sow or {}).get('items', []) if item.get('category')]
+    
+    await consultant_recommender.ensure_fresh(db)
+    return consultant_recommender.recommend(
+        project_type=project_type,
+        categories=categories,
+        start_date=start_date,
+        limit=limit,
+        include_unavailable=include_unavailable
+    )
+
+# Weekly utilization rollups cover this many weeks either side of the current week
+UTILIZATION_WEEKS_BACK = int(os.environ.get('CONSULTANT_UTILIZATION_WEEKS_BACK', '26'))
+UTILIZATION_WEEKS_AHEAD = int(os.environ.get('CONSULTANT_UTILIZATION_WEEKS_AHEAD', '26'))
+
+async def refresh_consultant_utilization():
+    rows = await rebuild_utilization_rollups(
+        db,
+        CONSULTANT_BANDWIDTH_LIMITS,
+        weeks_back=UTILIZATION_WEEKS_BACK,
+        weeks_ahead=UTILIZATION_WEEKS_AHEAD
+    )
+    logger.info(f"Rebuilt {rows} consultant utilization rollups")
+    return rows
+
+def utilization_window(weeks_back: int, weeks_ahead: int) -> tuple:
+    current = week_start(datetime.now(timezone.utc))
+    return (
+        current - timedelta(weeks=min(weeks_back, UTILIZATION_WEEKS_BACK)),
+        current + timedelta(weeks=min(weeks_ahead, UTILIZATION_WEEKS_AHEAD))
+    )
+
+@api_router.get("/consultants/utilization")
+async def get_team_consultant_utilization(
+    weeks_back: int = Query(12, ge=0),
+    weeks_ahead: int = Query(12, ge=0),
+    current_user: User = Depends(get_current_user)
+):
+    """Team-wide weekly committed vs delivered meetings and projected load"""
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Only admins and managers can view team utilization")
+    
+    first, last = utilization_window(weeks_back, weeks_ahead)
+    return {
+        "from_week": first.isoformat(),
+        "to_week": last.isoformat(),
+        "weeks": await get_team_utilization(db, first, last, CONSULTANT_BANDWIDTH_LIMITS)
+    }
+
+@api_router.post("/consultants/utilization/refresh")
+async def refresh_consultant_utilization_rollups(current_user: User = Depends(get_current_user)):
+    """Rebuild utilization rollups now instead of waiting for the periodic job (Admin only)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can refresh utilization rollups")
+    
+    return {"message": "Utilization rollups rebuilt", "rows": await refresh_consultant_utilization()}
+
 @api_router.get("/consultants/{consultant_id}")
 async def get_consultant(consultant_id: str, current_user: User = Depends(get_current_user)):
     """Get consultant details with projects"""
@@ -2391,7 +3050,7 @@ async def get_consultant(consultant_id: str, current_user: User = Depends(get_cu
     
     consultant = await db.users.find_one(
         {"id": consultant_id, "role": UserRole.CONSULTANT},
-        {"_id": 0, "hashed_password": 0}
+        USER_READ_PROJECTION
     )
     if not consultant:
         raise HTTPException(status_code=404, detail="Consultant not found")
@@ -2426,11 +3085,30 @@ async def get_consultant(consultant_id: str, current_user: User = Depends(get_cu
         "projects": projects_with_details
     }
 
-@api_router.patch("/consultants/{consultant_id}/profile")
-async def update_consultant_profile(
+@api_router.get("/consultants/{consultant_id}/utilization")
+async def get_single_consultant_utilization(
     consultant_id: str,
-    preferred_mode: Optional[str] = None,
-    specializations: Optional[List[str]] = None,
+    weeks_back: int = Query(12, ge=0),
+    weeks_ahead: int = Query(12, ge=0),
+    current_user: User = Depends(get_current_user)
+):
+    """Weekly committed vs delivered meetings and projected load for one consultant"""
+    if current_user.role == UserRole.CONSULTANT and current_user.id != consultant_id:
+        raise HTTPException(status_code=403, detail="You can only view your own utilization")
+    
+    first, last = utilization_window(weeks_back, weeks_ahead)
+    return {
+        "consultant_id": consultant_id,
+        "from_week": first.isoformat(),
+        "to_week": last.isoformat(),
+        "weeks": await get_consultant_utilization(db, consultant_id, first, last)
+    }
+
+@api_router.patch("/consultants/{consultant_id}/profile")
+async def update_consultant_profile(
+    consultant_id: str,
+    preferred_mode: Optional[str] = None,
+    specializations: Optional[List[str]] = None,
     bio: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
@@ -2454,11 +3132,101 @@ async def update_consultant_profile(
         {"user_id": consultant_id},
         {"$set": update_data}
     )
+    consultant_recommender.mark_dirty()
     
     return {"message": "Profile updated successfully"}
 
 # ==================== PROJECT ASSIGNMENT APIs ====================
 
+# consultant_profiles.current_project_count mirrors the number of active assignments so a
+# slot can be reserved with one conditional update instead of find_one + count_documents.
+# Reserve/release stamp slot_changed_at; the drift sync leaves recently changed profiles alone
+# because their assignment insert or deactivation may not be visible yet.
+SLOT_SYNC_GRACE = timedelta(seconds=int(os.environ.get('CONSULTANT_SLOT_SYNC_GRACE_SECONDS', '60')))
+
+async def reserve_consultant_slot(consultant_id: str) -> bool:
+    """Atomically take one project slot; False if the consultant is at max_projects"""
+    has_capacity = {"$expr": {"$lt": [
+        {"$ifNull": ["$current_project_count", 0]},
+        {"$ifNull": ["$max_projects", 8]}
+    ]}}
+    profile = await db.consultant_profiles.find_one_and_update(
+        {"user_id": consultant_id, **has_capacity},
+        {"$inc": {"current_project_count": 1}, "$set": {"slot_changed_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "user_id": 1}
+    )
+    if profile:
+        consultant_recommender.mark_dirty()
+        return True
+    
+    if await db.consultant_profiles.count_documents({"user_id": consultant_id}, limit=1):
+        return False
+    
+    # No profile yet: create the default one seeded with the real count, then retry once
+    active_count = await db.consultant_assignments.count_documents({"consultant_id": consultant_id, "is_active": True})
+    now = datetime.now(timezone.utc).isoformat()
+    await db.consultant_profiles.update_one(
+        {"user_id": consultant_id},
+        {"$setOnInsert": {
+            "user_id": consultant_id,
+            "specializations": [],
+            "preferred_mode": "mixed",
+            "max_projects": CONSULTANT_BANDWIDTH_LIMITS.get("mixed", 8),
+            "current_project_count": active_count,
+            "total_project_value": 0,
+            "bio": None,
+            "created_at": now,
+            "updated_at": now
+        }},
+        upsert=True
+    )
+    profile = await db.consultant_profiles.find_one_and_update(
+        {"user_id": consultant_id, **has_capacity},
+        {"$inc": {"current_project_count": 1}, "$set": {"slot_changed_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "user_id": 1}
+    )
+    consultant_recommender.mark_dirty()
+    return profile is not None
+
+async def release_consultant_slot(consultant_id: str):
+    """Give back a slot taken by reserve_consultant_slot"""
+    await db.consultant_profiles.update_one(
+        {"user_id": consultant_id, "current_project_count": {"$gt": 0}},
+        {"$inc": {"current_project_count": -1}, "$set": {"slot_changed_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    consultant_recommender.mark_dirty()
+
+async def sync_consultant_project_counts():
+    """Recompute current_project_count from active assignments and fix any drift"""
+    # Profiles whose slot changed after this point may have an assignment write still in flight
+    settled = {"$or": [
+        {"slot_changed_at": {"$exists": False}},
+        {"slot_changed_at": {"$lt": (datetime.now(timezone.utc) - SLOT_SYNC_GRACE).isoformat()}}
+    ]}
+    actual = {
+        row['_id']: row['count']
+        for row in await db.consultant_assignments.aggregate([
+            {"$match": {"is_active": True}},
+            {"$group": {"_id": "$consultant_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+    }
+    
+    fixes = []
+    async for profile in db.consultant_profiles.find(settled, {"_id": 0, "user_id": 1, "current_project_count": 1}):
+        expected = actual.get(profile['user_id'], 0)
+        if profile.get('current_project_count') != expected:
+            # Only if nothing reserved or released a slot since it was read
+            fixes.append(UpdateOne(
+                {"user_id": profile['user_id'], "current_project_count": profile.get('current_project_count'), **settled},
+                {"$set": {"current_project_count": expected}}
+            ))
+    
+    if fixes:
+        await db.consultant_profiles.bulk_write(fixes, ordered=False)
+        consultant_recommender.mark_dirty()
+        logger.info(f"Synced project counts for {len(fixes)} consultant profiles")
+    return len(fixes)
+
 @api_router.post("/projects/{project_id}/assign-consultant")
 async def assign_consultant_to_project(
     project_id: str,
@@ -2482,20 +3250,6 @@ async def assign_consultant_to_project(
     if not consultant:
         raise HTTPException(status_code=404, detail="Consultant not found or inactive")
     
-    # Check consultant bandwidth
-    profile = await db.consultant_profiles.find_one({"user_id": assignment.consultant_id}, {"_id": 0})
-    active_assignments = await db.consultant_assignments.count_documents({
-        "consultant_id": assignment.consultant_id,
-        "is_active": True
-    })
-    
-    max_projects = profile.get('max_projects', 8) if profile else 8
-    if active_assignments >= max_projects:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Consultant has reached maximum project capacity ({max_projects})"
-        )
-    
     # Check if already assigned
     existing = await db.consultant_assignments.find_one({
         "consultant_id": assignment.consultant_id,
@@ -2505,6 +3259,15 @@ async def assign_consultant_to_project(
     if existing:
         raise HTTPException(status_code=400, detail="Consultant already assigned to this project")
     
+    # Check consultant bandwidth (reserves the slot atomically)
+    if not await reserve_consultant_slot(assignment.consultant_id):
+        profile = await db.consultant_profiles.find_one({"user_id": assignment.consultant_id}, {"_id": 0, "max_projects": 1})
+        max_projects = profile.get('max_projects', 8) if profile else 8
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Consultant has reached maximum project capacity ({max_projects})"
+        )
+    
     # Create assignment
     new_assignment = ConsultantAssignment(
         consultant_id=assignment.consultant_id,
@@ -2520,7 +3283,11 @@ async def assign_consultant_to_project(
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
     
-    await db.consultant_assignments.insert_one(doc)
+    try:
+        await db.consultant_assignments.insert_one(doc)
+    except Exception:
+        await release_consultant_slot(assignment.consultant_id)
+        raise
     
     # Update project's assigned_consultants list
     await db.projects.update_one(
@@ -2568,23 +3335,10 @@ async def change_consultant(
     if not new_consultant:
         raise HTTPException(status_code=404, detail="New consultant not found")
     
-    # Check new consultant's bandwidth
-    profile = await db.consultant_profiles.find_one({"user_id": new_consultant_id}, {"_id": 0})
-    active_count = await db.consultant_assignments.count_documents({
-        "consultant_id": new_consultant_id,
-        "is_active": True
-    })
-    max_projects = profile.get('max_projects', 8) if profile else 8
-    
-    if active_count >= max_projects:
+    # Check new consultant's bandwidth (reserves the slot atomically)
+    if not await reserve_consultant_slot(new_consultant_id):
         raise HTTPException(status_code=400, detail="New consultant has reached maximum capacity")
     
-    # Deactivate old assignment
-    await db.consultant_assignments.update_one(
-        {"consultant_id": old_consultant_id, "project_id": project_id, "is_active": True},
-        {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    
     # Create new assignment
     new_assignment = ConsultantAssignment(
         consultant_id=new_consultant_id,
@@ -2598,7 +3352,19 @@ async def change_consultant(
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
     
-    await db.consultant_assignments.insert_one(doc)
+    try:
+        await db.consultant_assignments.insert_one(doc)
+    except Exception:
+        await release_consultant_slot(new_consultant_id)
+        raise
+    
+    # Deactivate old assignment (only after the replacement exists)
+    result = await db.consultant_assignments.update_one(
+        {"consultant_id": old_consultant_id, "project_id": project_id, "is_active": True},
+        {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    if result.modified_count:
+        await release_consultant_slot(old_consultant_id)
     
     # Update project
     await db.projects.update_one(
@@ -2632,6 +3398,7 @@ async def update_project_start_date(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Project not found")
+    project_schedule_cache.pop(project_id)
     
     return {"message": "Start date updated successfully"}
 
@@ -2652,6 +3419,7 @@ async def unassign_consultant(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Assignment not found")
+    await release_consultant_slot(consultant_id)
     
     # Update project
     await db.projects.update_one(
@@ -2782,7 +3550,7 @@ class Task(BaseModel):
     estimated_hours: Optional[float] = None
     actual_hours: Optional[float] = None
     dependencies: List[str] = []  # task ids this depends on
-    order: int = 0  # for gantt chart ordering
+    order: float = 0  # for gantt chart ordering (fractional so a move only rewrites the moved task)
     created_by: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -2799,7 +3567,7 @@ class TaskCreate(BaseModel):
     due_date: Optional[datetime] = None
     estimated_hours: Optional[float] = None
     dependencies: Optional[List[str]] = []
-    order: Optional[int] = 0
+    order: Optional[float] = 0
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
@@ -2814,7 +3582,13 @@ class TaskUpdate(BaseModel):
     completed_date: Optional[datetime] = None
     estimated_hours: Optional[float] = None
     actual_hours: Optional[float] = None
-    order: Optional[int] = None
+    dependencies: Optional[List[str]] = None
+    order: Optional[float] = None
+
+class TaskMove(BaseModel):
+    """Drop position for a dragged task: between after_task_id and before_task_id"""
+    after_task_id: Optional[str] = None
+    before_task_id: Optional[str] = None
 
 @api_router.post("/tasks", response_model=Task)
 async def create_task(task_create: TaskCreate, current_user: User = Depends(get_current_user)):
@@ -2838,6 +3612,7 @@ async def create_task(task_create: TaskCreate, current_user: User = Depends(get_
         doc['completed_date'] = doc['completed_date'].isoformat()
     
     await db.tasks.insert_one(doc)
+    project_schedule_cache.pop(task.project_id)
     return task
 
 @api_router.get("/tasks")
@@ -2870,15 +3645,125 @@ async def get_tasks(
         if task.get('completed_date') and isinstance(task['completed_date'], str):
             task['completed_date'] = datetime.fromisoformat(task['completed_date'])
     
+    # Enrich with assignee names
+    names = await user_directory.get_names(db.users, [t.get('assigned_to') for t in tasks])
+    for task in tasks:
+        task['assigned_to_name'] = names.get(task.get('assigned_to')) if task.get('assigned_to') else None
+    
     return tasks
 
+# Reorder/move must be defined BEFORE /tasks/{task_id} to avoid route conflict
+@api_router.patch("/tasks/reorder")
+async def reorder_tasks(
+    task_orders: List[dict],  # [{"id": "task_id", "order": 1}, ...]
+    project_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Reorder tasks (for drag-and-drop in Gantt chart) in a single bulk write"""
+    if not task_orders:
+        return {"message": "Tasks reordered successfully", "updated_count": 0}
+    
+    try:
+        orders = {item['id']: float(item['order']) for item in task_orders}
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Each entry needs an 'id' and a numeric 'order'")
+    
+    # All tasks must exist and belong to one project
+    tasks = await db.tasks.find(
+        {"id": {"$in": list(orders)}},
+        {"_id": 0, "id": 1, "project_id": 1}
+    ).to_list(len(orders))
+    missing = set(orders) - {t['id'] for t in tasks}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tasks not found: {sorted(missing)}")
+    project_ids = {t['project_id'] for t in tasks}
+    if len(project_ids) > 1 or (project_id and project_ids != {project_id}):
+        raise HTTPException(status_code=400, detail="All reordered tasks must belong to the same project")
+    
+    now = datetime.now(timezone.utc).isoformat()
+    result = await db.tasks.bulk_write([
+        UpdateOne({"id": task_id}, {"$set": {"order": order, "updated_at": now}})
+        for task_id, order in orders.items()
+    ], ordered=False)
+    
+    return {"message": "Tasks reordered successfully", "updated_count": result.modified_count}
+
+@api_router.patch("/tasks/{task_id}/move")
+async def move_task(
+    task_id: str,
+    move: TaskMove,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Move one task between two neighbours by giving it a fractional order key.
+    
+    Only the moved task is written. If the neighbours' keys are too close to split,
+    the project's tasks are renumbered once in a single bulk write.
+    """
+    if not move.after_task_id and not move.before_task_id:
+        raise HTTPException(status_code=400, detail="Provide after_task_id and/or before_task_id")
+    if task_id in (move.after_task_id, move.before_task_id):
+        raise HTTPException(status_code=400, detail="A task cannot be moved next to itself")
+    if move.after_task_id and move.after_task_id == move.before_task_id:
+        raise HTTPException(status_code=400, detail="after_task_id and before_task_id must differ")
+    
+    ids = [i for i in [task_id, move.after_task_id, move.before_task_id] if i]
+    tasks = {
+        t['id']: t for t in await db.tasks.find(
+            {"id": {"$in": ids}},
+            {"_id": 0, "id": 1, "project_id": 1, "order": 1}
+        ).to_list(len(ids))
+    }
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    project_id = tasks[task_id]['project_id']
+    for neighbour_id in ids[1:]:
+        if neighbour_id not in tasks:
+            raise HTTPException(status_code=404, detail=f"Task {neighbour_id} not found")
+        if tasks[neighbour_id]['project_id'] != project_id:
+            raise HTTPException(status_code=400, detail="Neighbour tasks must belong to the same project")
+    
+    lower = tasks[move.after_task_id].get('order', 0) if move.after_task_id else None
+    upper = tasks[move.before_task_id].get('order', 0) if move.before_task_id else None
+    
+    if lower is not None and upper is not None:
+        new_order = (lower + upper) / 2
+        needs_renumber = not (lower < new_order < upper)
+    else:
+        new_order = lower + 1 if lower is not None else upper - 1
+        needs_renumber = False
+    
+    now = datetime.now(timezone.utc).isoformat()
+    if needs_renumber:
+        project_tasks = await db.tasks.find(
+            {"project_id": project_id, "id": {"$ne": task_id}},
+            {"_id": 0, "id": 1}
+        ).sort([("order", 1), ("created_at", 1)]).to_list(None)
+        ordered_ids = [t['id'] for t in project_tasks]
+        ordered_ids.insert(ordered_ids.index(move.after_task_id) + 1, task_id)
+        await db.tasks.bulk_write([
+            UpdateOne({"id": tid}, {"$set": {"order": float(idx), "updated_at": now}})
+            for idx, tid in enumerate(ordered_ids)
+        ], ordered=False)
+        new_order = float(ordered_ids.index(task_id))
+    else:
+        await db.tasks.update_one(
+            {"id": task_id},
+            {"$set": {"order": new_order, "updated_at": now}}
+        )
+    
+    return {"message": "Task moved successfully", "order": new_order, "renumbered": needs_renumber}
+
 @api_router.get("/tasks/{task_id}")
-async def get_task(task_id: str, current_user: User = Depends(get_current_user)):
+async def get_task(task_id: str, response: Response, current_user: User = Depends(get_current_user)):
     """Get a single task"""
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    etag = document_etag(task)
+    if etag:
+        response.headers["ETag"] = etag
     if isinstance(task.get('created_at'), str):
         task['created_at'] = datetime.fromisoformat(task['created_at'])
     if isinstance(task.get('updated_at'), str):
@@ -2894,12 +3779,17 @@ async def get_task(task_id: str, current_user: User = Depends(get_current_user))
 async def update_task(
     task_id: str,
     task_update: TaskUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
-    """Update a task"""
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    """Update a task. Send the ETag from GET as If-Match to get 412 instead of overwriting a newer edit."""
+    expected = parse_if_match(if_match)
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0, "id": 1, "project_id": 1, "updated_at": 1})
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    if expected is not None and task.get('updated_at') != expected:
+        raise HTTPException(status_code=412, detail="Task was modified by someone else; reload it and try again")
     
     update_data = task_update.model_dump(exclude_unset=True)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
@@ -2917,16 +3807,80 @@ async def update_task(
     if 'completed_date' in update_data and update_data['completed_date']:
         update_data['completed_date'] = update_data['completed_date'].isoformat()
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
+    if update_data.get('dependencies'):
+        await validate_task_dependencies(task, update_data['dependencies'])
+    
+    updated = await guarded_update(
+        db.tasks, task_id, {"$set": update_data}, expected, "Task",
+        projection={"_id": 0, "updated_at": 1}
+    )
+    response.headers["ETag"] = document_etag(updated)
+    project_schedule_cache.pop(task['project_id'])
+    
+    # Date or dependency changes push dependents later so they never start before this task ends;
+    # new dependencies also move this task after its new predecessors
+    shifted = []
+    if {'start_date', 'due_date', 'dependencies'} & update_data.keys():
+        shifted = await apply_schedule_propagation(task_id, align_root='dependencies' in update_data)
+    
+    return {"message": "Task updated successfully", "shifted_tasks": len(shifted)}
+
+async def validate_task_dependencies(task: dict, dependencies: List[str]):
+    """Dependencies must be existing tasks of the same project and must not form a cycle"""
+    if task['id'] in dependencies:
+        raise HTTPException(status_code=400, detail="A task cannot depend on itself")
+    
+    found = await db.tasks.find(
+        {"id": {"$in": dependencies}},
+        {"_id": 0, "id": 1, "project_id": 1}
+    ).to_list(len(dependencies))
+    found_ids = {t['id'] for t in found}
+    missing = [d for d in dependencies if d not in found_ids]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Dependency tasks not found: {', '.join(missing)}")
+    if any(t['project_id'] != task['project_id'] for t in found):
+        raise HTTPException(status_code=400, detail="Dependencies must belong to the same project")
+    
+    # A new edge closes a cycle only if the prerequisite is already downstream of this task
+    downstream = await collect_downstream(db.tasks, [task['id']])
+    cyclic = [d for d in dependencies if d in downstream]
+    if cyclic:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dependency cycle detected: {', '.join(cyclic)} already depends on this task"
+        )
+
+async def apply_schedule_propagation(task_id: str, dry_run: bool = False, align_root: bool = False) -> List[dict]:
+    try:
+        changes = await propagate_schedule(db.tasks, task_id, dry_run=dry_run, align_root=align_root)
+    except ScheduleCycleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not dry_run:
+        for project_id in {c['project_id'] for c in changes}:
+            project_schedule_cache.pop(project_id)
+    return changes
+
+@api_router.post("/tasks/{task_id}/propagate")
+async def propagate_task_schedule(
+    task_id: str,
+    dry_run: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Shift dependents of a task after its dates moved; dry_run returns the diff without writing"""
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0, "id": 1})
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    return {"message": "Task updated successfully"}
+    changes = await apply_schedule_propagation(task_id, dry_run=dry_run)
+    return {"dry_run": dry_run, "shifted_count": len(changes), "changes": changes}
 
 @api_router.delete("/tasks/{task_id}")
 async def delete_task(task_id: str, current_user: User = Depends(get_current_user)):
     """Delete a task"""
-    result = await db.tasks.delete_one({"id": task_id})
-    if result.deleted_count == 0:
+    task = await db.tasks.find_one_and_delete({"id": task_id}, {"_id": 0, "project_id": 1})
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    project_schedule_cache.pop(task['project_id'])
     
     return {"message": "Task deleted successfully"}
 
@@ -2954,22 +3908,50 @@ async def delegate_task(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    project_schedule_cache.pop(task['project_id'])
     
     return {"message": "Task delegated successfully"}
 
-@api_router.patch("/tasks/reorder")
-async def reorder_tasks(
-    task_orders: List[dict],  # [{"id": "task_id", "order": 1}, ...]
+SCHEDULE_TASK_FIELDS = {
+    "_id": 0, "id": 1, "status": 1, "start_date": 1, "due_date": 1,
+    "estimated_hours": 1, "actual_hours": 1, "dependencies": 1
+}
+
+async def get_project_schedule(project_id: str) -> dict:
+    """Critical path and progress for a project, cached until the next task or start date write"""
+    schedule = project_schedule_cache.get(project_id)
+    if schedule is not None:
+        return schedule
+    
+    # Always the full task set: callers share the cached result, so it can't come from a page of tasks
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0, "start_date": 1})
+    tasks = await db.tasks.find({"project_id": project_id}, SCHEDULE_TASK_FIELDS).to_list(5000)
+    
+    schedule = compute_schedule(tasks, project_start=(project or {}).get('start_date'))
+    project_schedule_cache.set(project_id, schedule)
+    return schedule
+
+@api_router.get("/projects/{project_id}/schedule")
+async def get_project_schedule_summary(
+    project_id: str,
+    critical_only: bool = False,
     current_user: User = Depends(get_current_user)
 ):
-    """Reorder tasks (for drag-and-drop in Gantt chart)"""
-    for item in task_orders:
-        await db.tasks.update_one(
-            {"id": item['id']},
-            {"$set": {"order": item['order'], "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
+    """Critical path, per-task slack and rolled-up progress for a project"""
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0, "id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    try:
+        schedule = await get_project_schedule(project_id)
+    except ScheduleCycleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    tasks = schedule['tasks']
+    if critical_only:
+        tasks = {tid: tasks[tid] for tid in schedule['critical_path']}
     
-    return {"message": "Tasks reordered successfully"}
+    return {**schedule, "project_id": project_id, "tasks": tasks}
 
 @api_router.get("/projects/{project_id}/tasks-gantt")
 async def get_project_tasks_for_gantt(
@@ -2978,6 +3960,14 @@ async def get_project_tasks_for_gantt(
 ):
     """Get tasks formatted for Gantt chart"""
     tasks = await db.tasks.find({"project_id": project_id}, {"_id": 0}).sort("order", 1).to_list(1000)
+    assignee_names = await user_directory.get_names(db.users, [t.get('assigned_to') for t in tasks])
+    
+    try:
+        schedule_tasks = (await get_project_schedule(project_id))['tasks']
+    except ScheduleCycleError as e:
+        # Still render the chart; critical path highlighting is unavailable until the cycle is fixed
+        logger.warning(f"Project {project_id} has a dependency cycle: {e}")
+        schedule_tasks = {}
     
     gantt_data = []
     for task in tasks:
@@ -2998,9 +3988,11 @@ async def get_project_tasks_for_gantt(
             "category": task.get('category', 'general'),
             "priority": task.get('priority', 'medium'),
             "assigned_to": task.get('assigned_to'),
+            "assigned_to_name": assignee_names.get(task.get('assigned_to')) if task.get('assigned_to') else None,
             "dependencies": task.get('dependencies', []),
-            "progress": 100 if task.get('status') == TaskStatus.COMPLETED else 
-                       50 if task.get('status') == TaskStatus.IN_PROGRESS else 0
+            "progress": schedule_tasks.get(task['id'], {}).get('progress', 0),
+            "is_critical": schedule_tasks.get(task['id'], {}).get('is_critical', False),
+            "slack_days": schedule_tasks.get(task['id'], {}).get('slack_days')
         })
     
     return gantt_data
@@ -3296,39 +4288,39 @@ async def schedule_kickoff_meeting(
     current_user: User = Depends(get_current_user)
 ):
     """Schedule a kick-off meeting (freezes SOW)"""
-    # Verify project exists
-    project = await db.projects.find_one({"id": meeting_create.project_id}, {"_id": 0})
+    # Project, agreement and duplicate-meeting checks are independent; run them together
+    project, agreement, existing = await asyncio.gather(
+        db.projects.find_one({"id": meeting_create.project_id}, {"_id": 0, "id": 1, "name": 1}),
+        db.agreements.find_one({"id": meeting_create.agreement_id}, {"_id": 0, "id": 1, "created_by": 1, "lead_id": 1}),
+        db.kickoff_meetings.find_one({"project_id": meeting_create.project_id}, {"_id": 0, "id": 1})
+    )
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Verify agreement exists
-    agreement = await db.agreements.find_one({"id": meeting_create.agreement_id}, {"_id": 0})
     if not agreement:
         raise HTTPException(status_code=404, detail="Agreement not found")
-    
-    # Check if kickoff meeting already exists for this project
-    existing = await db.kickoff_meetings.find_one({"project_id": meeting_create.project_id})
     if existing:
         raise HTTPException(status_code=400, detail="Kick-off meeting already scheduled for this project")
     
-    # Get principal consultant info
-    principal = await db.users.find_one(
-        {"id": meeting_create.principal_consultant_id},
-        {"_id": 0, "hashed_password": 0}
+    # Resolve principal consultant, sales executive (agreement creator) and
+    # additional attendees in one batch
+    attendee_users = await user_directory.get_many(
+        db.users,
+        [meeting_create.principal_consultant_id, agreement.get('created_by'), *(meeting_create.attendee_ids or [])]
     )
+    
+    principal = attendee_users.get(meeting_create.principal_consultant_id)
     if not principal:
         raise HTTPException(status_code=404, detail="Principal consultant not found")
     
-    # Get sales executive (created_by from agreement)
-    sales_exec = await db.users.find_one(
-        {"id": agreement.get('created_by')},
-        {"_id": 0, "hashed_password": 0}
-    )
+    sales_exec = attendee_users.get(agreement.get('created_by'))
     
     # Get lead (client contact)
     lead = None
     if agreement.get('lead_id'):
-        lead = await db.leads.find_one({"id": agreement['lead_id']}, {"_id": 0})
+        lead = await db.leads.find_one(
+            {"id": agreement['lead_id']},
+            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1}
+        )
     
     # Build attendees list
     attendees = [
@@ -3361,10 +4353,7 @@ async def schedule_kickoff_meeting(
     
     # Add additional consultants
     for consultant_id in meeting_create.attendee_ids or []:
-        consultant = await db.users.find_one(
-            {"id": consultant_id},
-            {"_id": 0, "hashed_password": 0}
-        )
+        consultant = attendee_users.get(consultant_id)
         if consultant:
             attendees.append(KickoffMeetingAttendee(
                 user_id=consultant['id'],
@@ -3407,48 +4396,72 @@ async def schedule_kickoff_meeting(
         }}
     )
     
-    # Create notification for sales executive
-    if sales_exec:
-        notification = Notification(
-            user_id=sales_exec['id'],
+    # Notify every internal attendee (the client contact is not a user) in one insert_many
+    notified_ids = dict.fromkeys(a['user_id'] for a in attendees if a['role'] != "client_contact")
+    message = f"Kick-off meeting scheduled for project '{project.get('name')}' on {meeting_create.meeting_date.strftime('%Y-%m-%d')}"
+    await create_notifications([
+        Notification(
+            user_id=user_id,
             title="Kick-off Meeting Scheduled",
-            message=f"Kick-off meeting scheduled for project '{project.get('name')}' on {meeting_create.meeting_date.strftime('%Y-%m-%d')}",
+            message=message,
             notification_type="kickoff_scheduled",
             related_entity_type="project",
             related_entity_id=meeting_create.project_id
         )
-        
-        notif_doc = notification.model_dump()
-        notif_doc['created_at'] = notif_doc['created_at'].isoformat()
-        await db.notifications.insert_one(notif_doc)
+        for user_id in notified_ids
+    ])
     
     return {"message": "Kick-off meeting scheduled and SOW frozen", "meeting_id": meeting.id}
 
+KICKOFF_PROJECT_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "client_name": 1, "project_type": 1,
+    "status": 1, "start_date": 1, "end_date": 1
+}
+KICKOFF_AGREEMENT_FIELDS = {
+    "_id": 0, "id": 1, "agreement_number": 1, "status": 1, "lead_id": 1, "quotation_id": 1,
+    "party_name": 1, "project_start_date": 1, "project_duration_months": 1
+}
+
 @api_router.get("/kickoff-meetings")
 async def get_kickoff_meetings(
+    response: Response,
     project_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_user)
 ):
-    """Get kick-off meetings"""
+    """Get kick-off meetings (ordered by meeting date) with project and agreement summaries"""
     query = {}
     if project_id:
         query['project_id'] = project_id
+    if date_from or date_to:
+        query['meeting_date'] = {}
+        if date_from:
+            query['meeting_date']['$gte'] = date_from.isoformat()
+        if date_to:
+            query['meeting_date']['$lte'] = date_to.isoformat()
+    
+    # Joins run only for the requested page; the total comes from the same round trip
+    result = await db.kickoff_meetings.aggregate([
+        {"$match": query},
+        {"$sort": {"meeting_date": 1, "id": 1}},
+        {"$facet": {
+            "items": [
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"_id": 0}},
+                *lookup_one("projects", "project_id", KICKOFF_PROJECT_FIELDS, "project"),
+                *lookup_one("agreements", "agreement_id", KICKOFF_AGREEMENT_FIELDS, "agreement")
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]).to_list(1)
     
-    meetings = await db.kickoff_meetings.find(query, {"_id": 0}).to_list(100)
-    
-    # Enrich with project and agreement details
-    result = []
-    for meeting in meetings:
-        project = await db.projects.find_one({"id": meeting['project_id']}, {"_id": 0})
-        agreement = await db.agreements.find_one({"id": meeting['agreement_id']}, {"_id": 0})
-        
-        result.append({
-            **meeting,
-            "project": project,
-            "agreement": agreement
-        })
-    
-    return result
+    page = result[0] if result else {"items": [], "total": []}
+    response.headers["X-Total-Count"] = str(page['total'][0]['count'] if page['total'] else 0)
+    return page['items']
 
 @api_router.get("/kickoff-meetings/{meeting_id}")
 async def get_kickoff_meeting_detail(
@@ -3520,40 +4533,243 @@ async def complete_kickoff_meeting(
 
 # Notification APIs
 
+async def create_notifications(notifications: List[Notification]):
+    """Persist notifications and push them to the recipients' open notification streams"""
+    docs = []
+    for notification in notifications:
+        doc = notification.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        docs.append(doc)
+    
+    if not docs:
+        return
+    
+    # Maintain per-user unread counters so unread-count reads are point lookups
+    per_user = {}
+    for doc in docs:
+        per_user[doc['user_id']] = per_user.get(doc['user_id'], 0) + 1
+    # Seeded before the insert so the new notifications are only counted by the $inc below
+    await seed_unread_counters(db, per_user)
+    
+    if len(docs) == 1:
+        await db.notifications.insert_one(docs[0])
+    else:
+        await db.notifications.insert_many(docs)
+    
+    await db.notification_counters.bulk_write([
+        UpdateOne({"user_id": user_id}, {"$inc": {"unread": n}}, upsert=True)
+        for user_id, n in per_user.items()
+    ], ordered=False)
+    
+    for doc in docs:
+        doc.pop('_id', None)
+        await notification_hub.publish(doc['user_id'], {
+            "type": "notification",
+            "notification": doc,
+            "unread_delta": 1
+        })
+
+async def reconcile_notification_counters():
+    fixed = await reconcile_unread_counters(db)
+    if fixed:
+        logger.info(f"Reconciled {fixed} notification counters")
+    return fixed
+
+def format_sse_event(event: dict) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+def encode_notification_cursor(notification: dict) -> str:
+    raw = json.dumps([notification['created_at'], notification['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_notification_cursor(cursor: str) -> tuple:
+    try:
+        created_at, notification_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return created_at, notification_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @api_router.get("/notifications")
 async def get_user_notifications(
+    response: Response,
+    limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Get notifications for current user"""
+    """
+    Get notifications for current user, newest first.
+    
+    Keyset-paginated on (created_at, id): pass the X-Next-Cursor response header
+    back as ?cursor= to fetch the next page. The header is absent on the last page.
+    """
+    limit = max(1, min(limit, 200))
+    query = {"user_id": current_user.id}
+    if cursor:
+        created_at, notification_id = decode_notification_cursor(cursor)
+        query['$or'] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": notification_id}}
+        ]
+    
     notifications = await db.notifications.find(
-        {"user_id": current_user.id},
+        query,
         {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
+    ).sort([("created_at", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        response.headers["X-Next-Cursor"] = encode_notification_cursor(notifications[-1])
     
     return notifications
 
+async def archive_read_notifications():
+    """
+    Move read notifications older than NOTIFICATION_ARCHIVE_AFTER_DAYS into
+    notifications_archive in batches, keeping the hot collection small.
+    
+    Each batch is copied before it is deleted; a batch interrupted in between is
+    picked up again on the next run and the duplicate archive inserts are ignored.
+    """
+    days = int(os.environ.get('NOTIFICATION_ARCHIVE_AFTER_DAYS', '30'))
+    batch_size = int(os.environ.get('NOTIFICATION_ARCHIVE_BATCH_SIZE', '1000'))
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    
+    archived = 0
+    while True:
+        batch = await db.notifications.find(
+            {"is_read": True, "created_at": {"$lt": cutoff}},
+            {"_id": 0}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        
+        archived_at = datetime.now(timezone.utc).isoformat()
+        for doc in batch:
+            doc['archived_at'] = archived_at
+        try:
+            await db.notifications_archive.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])):
+                raise
+        
+        await db.notifications.delete_many({"id": {"$in": [doc['id'] for doc in batch]}})
+        archived += len(batch)
+    
+    if archived:
+        logger.info(f"Archived {archived} read notifications older than {days} days")
+    return archived
+
 @api_router.patch("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """Mark notification as read"""
-    await db.notifications.update_one(
-        {"id": notification_id, "user_id": current_user.id},
+    result = await db.notifications.update_one(
+        {"id": notification_id, "user_id": current_user.id, "is_read": False},
         {"$set": {"is_read": True}}
     )
+    if result.modified_count:
+        await db.notification_counters.update_one(
+            {"user_id": current_user.id},
+            {"$inc": {"unread": -1}}
+        )
+        await notification_hub.publish(current_user.id, {
+            "type": "unread_count",
+            "unread_delta": -1,
+            "notification_id": notification_id
+        })
     return {"message": "Notification marked as read"}
 
+@api_router.patch("/notifications/read-all")
+async def mark_all_notifications_read(
+    current_user: User = Depends(get_current_user)
+):
+    """Mark all of the current user's notifications as read"""
+    result = await db.notifications.update_many(
+        {"user_id": current_user.id, "is_read": False},
+        {"$set": {"is_read": True}}
+    )
+    
+    # Decrement by what was actually flipped rather than setting 0, so a
+    # notification inserted concurrently is not lost from the count
+    if result.modified_count:
+        await db.notification_counters.update_one(
+            {"user_id": current_user.id},
+            {"$inc": {"unread": -result.modified_count}}
+        )
+        await notification_hub.publish(current_user.id, {
+            "type": "unread_count",
+            "unread_delta": -result.modified_count
+        })
+    
+    return {"message": "All notifications marked as read", "updated_count": result.modified_count}
+
 @api_router.get("/notifications/unread-count")
 async def get_unread_notification_count(
     current_user: User = Depends(get_current_user)
 ):
     """Get count of unread notifications"""
-    count = await db.notifications.count_documents({
-        "user_id": current_user.id,
-        "is_read": False
-    })
-    return {"count": count}
+    counter = await db.notification_counters.find_one({"user_id": current_user.id}, {"_id": 0, "unread": 1})
+    if counter is None:
+        # First read for this user: seed the counter from the notifications
+        count = await db.notifications.count_documents({
+            "user_id": current_user.id,
+            "is_read": False
+        })
+        await db.notification_counters.update_one(
+            {"user_id": current_user.id},
+            {"$setOnInsert": {"unread": count}},
+            upsert=True
+        )
+        return {"count": count}
+    
+    return {"count": max(0, counter.get('unread', 0))}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None
+):
+    """
+    Server-Sent Events stream of notification events for the current user.
+    
+    Sends the current unread count first, then `notification` events (with
+    unread_delta +1), `unread_count` deltas when notifications are read, and
+    `resync` if the client fell behind and should refetch the count.
+    EventSource cannot set headers, so the token may be passed as ?token=.
+    """
+    if not token:
+        auth_header = request.headers.get("Authorization", "")
+        if auth_header.lower().startswith("bearer "):
+            token = auth_header[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user = await get_user_from_token(token)
+    
+    # Subscribe before reading the count so no event falls in between
+    queue = notification_hub.subscribe(user.id)
+    
+    async def event_stream():
+        try:
+            unread = await get_unread_notification_count(current_user=user)
+            yield format_sse_event({"type": "unread_count", "count": unread['count']})
+            
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse_event(event)
+        finally:
+            notification_hub.unsubscribe(user.id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ==================== ENHANCED CONSULTANT PROFILE ====================
 
@@ -3590,29 +4806,27 @@ async def update_full_consultant_profile(
     if 'preferred_mode' in update_data and current_user.role in [UserRole.ADMIN, UserRole.MANAGER]:
         update_data['max_projects'] = CONSULTANT_BANDWIDTH_LIMITS.get(update_data['preferred_mode'], 8)
     
-    # Ensure profile exists
-    existing_profile = await db.consultant_profiles.find_one({"user_id": consultant_id})
-    if not existing_profile:
-        # Create profile if it doesn't exist
-        profile_doc = {
-            "user_id": consultant_id,
-            "specializations": [],
-            "preferred_mode": "mixed",
-            "max_projects": 8,
-            "current_project_count": 0,
-            "total_project_value": 0,
-            "bio": None,
-            "hourly_rate": None,
-            "availability_notes": None,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            **update_data
-        }
-        await db.consultant_profiles.insert_one(profile_doc)
-    else:
-        await db.consultant_profiles.update_one(
-            {"user_id": consultant_id},
-            {"$set": update_data}
-        )
+    # Create the profile with defaults if it doesn't exist (one upsert, so no duplicates)
+    defaults = {
+        "specializations": [],
+        "preferred_mode": "mixed",
+        "max_projects": 8,
+        "current_project_count": 0,
+        "total_project_value": 0,
+        "bio": None,
+        "hourly_rate": None,
+        "availability_notes": None,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.consultant_profiles.update_one(
+        {"user_id": consultant_id},
+        {
+            "$set": update_data,
+            "$setOnInsert": {k: v for k, v in defaults.items() if k not in update_data}
+        },
+        upsert=True
+    )
+    consultant_recommender.mark_dirty()
     
     return {"message": "Profile updated successfully"}
 
@@ -3622,12 +4836,9 @@ async def update_full_consultant_profile(
 async def update_user_role(
     user_id: str,
     new_role: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_permission("users", "manage_roles"))
 ):
     """Update user role (Admin only)"""
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=403, detail="Only admins can change user roles")
-    
     valid_roles = [UserRole.ADMIN, UserRole.MANAGER, UserRole.EXECUTIVE, UserRole.CONSULTANT, 
                    UserRole.PROJECT_MANAGER, UserRole.PRINCIPAL_CONSULTANT]
     if new_role not in valid_roles:
@@ -3641,12 +4852,16 @@ async def update_user_role(
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Tokens issued under the old role stop working; the user signs in again
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "email": 1})
+    if user:
+        await revoke_user_tokens(user['email'])
+    
     # If promoting to consultant-type role, ensure profile exists
     if new_role in [UserRole.CONSULTANT, UserRole.PRINCIPAL_CONSULTANT, UserRole.PROJECT_MANAGER]:
-        existing_profile = await db.consultant_profiles.find_one({"user_id": user_id})
-        if not existing_profile:
-            profile = {
-                "user_id": user_id,
+        await db.consultant_profiles.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {
                 "specializations": [],
                 "preferred_mode": "mixed",
                 "max_projects": CONSULTANT_BANDWIDTH_LIMITS.get("mixed", 8),
@@ -3655,25 +4870,24 @@ async def update_user_role(
                 "bio": None,
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "updated_at": datetime.now(timezone.utc).isoformat()
-            }
-            await db.consultant_profiles.insert_one(profile)
+            }},
+            upsert=True
+        )
+    consultant_recommender.mark_dirty()
     
     return {"message": f"User role updated to {new_role}"}
 
 @api_router.get("/users")
 async def get_all_users(
     role: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_permission("users", "read"))
 ):
     """Get all users (Admin/Manager only)"""
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
     query = {"is_active": True}
     if role:
         query['role'] = role
     
-    users = await db.users.find(query, {"_id": 0, "hashed_password": 0}).to_list(1000)
+    users = await db.users.find(query, USER_READ_PROJECTION).to_list(1000)
     
     for user in users:
         if isinstance(user.get('created_at'), str):
@@ -3690,7 +4904,47 @@ class UserProfileUpdate(BaseModel):
     department: Optional[str] = None
     designation: Optional[str] = None
     bio: Optional[str] = None
-    profile_image: Optional[str] = None
+    profile_image: Optional[str] = None  # Base64 image; stored via profile_image_store, not inline
+
+class ProfileImageUpload(BaseModel):
+    file_data: str  # Base64 encoded, optionally as a data: URL
+
+def profile_image_url(user_id: str, reference: dict, size: str = "medium") -> str:
+    # The version makes the URL change whenever the image does, so clients can cache it forever
+    return f"/api/users/{user_id}/profile-image?size={size}&v={reference['version']}"
+
+async def store_profile_image(user_id: str, file_data: str) -> dict:
+    """Write the image + thumbnails to the store and point the user at them; returns the reference"""
+    try:
+        data = decode_image_data(file_data)
+        reference = await asyncio.to_thread(profile_image_store.save, user_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.users.update_one({"id": user_id}, {"$set": {"profile_image": reference}})
+    await asyncio.to_thread(profile_image_store.delete, user_id, reference['version'])
+    return reference
+
+async def remove_profile_image(user_id: str):
+    await db.users.update_one({"id": user_id}, {"$unset": {"profile_image": ""}})
+    await asyncio.to_thread(profile_image_store.delete, user_id)
+
+async def apply_profile_image_update(user_id: str, update_data: dict):
+    """Route a `profile_image` field from a profile PATCH to the image store"""
+    if 'profile_image' not in update_data:
+        return
+    file_data = update_data.pop('profile_image')
+    if file_data:
+        await store_profile_image(user_id, file_data)
+    else:
+        await remove_profile_image(user_id)
+
+async def migrate_inline_profile_images():
+    """Move base64 images still stored on user documents into the image store"""
+    migrated, skipped = await migrate_inline_images(db.users, profile_image_store)
+    for user_id, reason in skipped:
+        logger.warning(f"Kept unreadable profile image of user {user_id} as {LEGACY_IMAGE_FIELD}: {reason}")
+    if migrated:
+        logger.info(f"Moved {migrated} inline profile images into the image store")
 
 class UserRightsConfig(BaseModel):
     """User rights configuration for role-based access"""
@@ -3701,86 +4955,10 @@ class UserRightsConfig(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-# Default role permissions
-DEFAULT_ROLE_PERMISSIONS = {
-    "admin": {
-        "leads": {"create": True, "read": True, "update": True, "delete": False},
-        "pricing_plans": {"create": True, "read": True, "update": True, "delete": False},
-        "sow": {"create": True, "read": True, "update": True, "delete": False, "freeze": True},
-        "quotations": {"create": True, "read": True, "update": True, "delete": False},
-        "agreements": {"create": True, "read": True, "update": True, "delete": False, "approve": True},
-        "projects": {"create": True, "read": True, "update": True, "delete": False},
-        "tasks": {"create": True, "read": True, "update": True, "delete": True},
-        "consultants": {"create": True, "read": True, "update": True, "delete": False},
-        "users": {"create": True, "read": True, "update": True, "delete": False, "manage_roles": True},
-        "reports": {"view": True, "export": True}
-    },
-    "manager": {
-        "leads": {"create": False, "read": True, "update": False, "delete": False},
-        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
-        "sow": {"create": False, "read": True, "update": False, "delete": False, "freeze": False},
-        "quotations": {"create": False, "read": True, "update": False, "delete": False},
-        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": True},
-        "projects": {"create": False, "read": True, "update": False, "delete": False},
-        "tasks": {"create": False, "read": True, "update": False, "delete": False},
-        "consultants": {"create": False, "read": True, "update": False, "delete": False},
-        "users": {"create": False, "read": True, "update": False, "delete": False, "manage_roles": False},
-        "reports": {"view": True, "export": True}
-    },
-    "executive": {
-        "leads": {"create": True, "read": True, "update": True, "delete": False},
-        "pricing_plans": {"create": True, "read": True, "update": True, "delete": False},
-        "sow": {"create": True, "read": True, "update": True, "delete": False, "freeze": False},
-        "quotations": {"create": True, "read": True, "update": True, "delete": False},
-        "agreements": {"create": True, "read": True, "update": True, "delete": False, "approve": False},
-        "projects": {"create": False, "read": True, "update": False, "delete": False},
-        "tasks": {"create": False, "read": True, "update": False, "delete": False},
-        "consultants": {"create": False, "read": True, "update": False, "delete": False},
-        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
-        "reports": {"view": False, "export": False}
-    },
-    "consultant": {
-        "leads": {"create": False, "read": False, "update": False, "delete": False},
-        "pricing_plans": {"create": False, "read": False, "update": False, "delete": False},
-        "sow": {"create": False, "read": True, "update": False, "delete": False, "freeze": False},
-        "quotations": {"create": False, "read": False, "update": False, "delete": False},
-        "agreements": {"create": False, "read": False, "update": False, "delete": False, "approve": False},
-        "projects": {"create": False, "read": True, "update": False, "delete": False},
-        "tasks": {"create": True, "read": True, "update": True, "delete": False},
-        "consultants": {"create": False, "read": False, "update": False, "delete": False},
-        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
-        "reports": {"view": False, "export": False}
-    },
-    "principal_consultant": {
-        "leads": {"create": False, "read": True, "update": False, "delete": False},
-        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
-        "sow": {"create": False, "read": True, "update": True, "delete": False, "freeze": True},
-        "quotations": {"create": False, "read": True, "update": False, "delete": False},
-        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": False},
-        "projects": {"create": False, "read": True, "update": True, "delete": False},
-        "tasks": {"create": True, "read": True, "update": True, "delete": False},
-        "consultants": {"create": False, "read": True, "update": False, "delete": False},
-        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
-        "reports": {"view": True, "export": False}
-    },
-    "project_manager": {
-        "leads": {"create": False, "read": True, "update": False, "delete": False},
-        "pricing_plans": {"create": False, "read": True, "update": False, "delete": False},
-        "sow": {"create": False, "read": True, "update": True, "delete": False, "freeze": False},
-        "quotations": {"create": False, "read": True, "update": False, "delete": False},
-        "agreements": {"create": False, "read": True, "update": False, "delete": False, "approve": False},
-        "projects": {"create": True, "read": True, "update": True, "delete": False},
-        "tasks": {"create": True, "read": True, "update": True, "delete": True},
-        "consultants": {"create": False, "read": True, "update": False, "delete": False},
-        "users": {"create": False, "read": False, "update": False, "delete": False, "manage_roles": False},
-        "reports": {"view": True, "export": True}
-    }
-}
-
 @api_router.get("/users/me")
 async def get_current_user_profile(current_user: User = Depends(get_current_user)):
     """Get current user's profile"""
-    user = await db.users.find_one({"id": current_user.id}, {"_id": 0, "hashed_password": 0})
+    user = await db.users.find_one({"id": current_user.id}, USER_READ_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -3800,13 +4978,55 @@ async def update_current_user_profile(
         if existing:
             raise HTTPException(status_code=400, detail="Email already in use")
     
+    await apply_profile_image_update(current_user.id, update_data)
     await db.users.update_one(
         {"id": current_user.id},
         {"$set": update_data}
     )
+    user_directory.invalidate(current_user.id)
     
     return {"message": "Profile updated successfully"}
 
+@api_router.post("/users/me/profile-image")
+async def upload_profile_image(
+    upload: ProfileImageUpload,
+    current_user: User = Depends(get_current_user)
+):
+    """Upload a profile image; the original and thumbnails are stored outside the user document"""
+    reference = await store_profile_image(current_user.id, upload.file_data)
+    return {
+        "message": "Profile image updated",
+        "profile_image": reference,
+        "urls": {size: profile_image_url(current_user.id, reference, size) for size in reference['sizes'] + ["original"]}
+    }
+
+@api_router.delete("/users/me/profile-image")
+async def delete_profile_image(current_user: User = Depends(get_current_user)):
+    """Remove the current user's profile image"""
+    await remove_profile_image(current_user.id)
+    return {"message": "Profile image removed"}
+
+@api_router.get("/users/{user_id}/profile-image")
+async def get_profile_image(
+    user_id: str,
+    size: str = "medium",
+    current_user: User = Depends(get_current_user)
+):
+    """Serve a user's profile image at `size` (small, medium or original)"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "id": 1, "profile_image": 1})
+    if not user or not isinstance(user.get('profile_image'), dict):
+        raise HTTPException(status_code=404, detail="Profile image not found")
+    
+    stored = profile_image_store.path(user['id'], user['profile_image'], size)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Profile image not found")
+    file_path, content_type = stored
+    return FileResponse(
+        file_path,
+        media_type=content_type,
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
+    )
+
 @api_router.get("/users/{user_id}/profile")
 async def get_user_profile(
     user_id: str,
@@ -3816,7 +5036,7 @@ async def get_user_profile(
     if current_user.id != user_id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
+    user = await db.users.find_one({"id": user_id}, USER_READ_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -3834,10 +5054,15 @@ async def update_user_profile(
     update_data = profile_update.model_dump(exclude_unset=True)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
+    if not await db.users.find_one({"id": user_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    await apply_profile_image_update(user_id, update_data)
     result = await db.users.update_one(
         {"id": user_id},
         {"$set": update_data}
     )
+    user_directory.invalidate(user_id)
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -3845,18 +5070,10 @@ async def update_user_profile(
     return {"message": "Profile updated successfully"}
 
 @api_router.get("/role-permissions")
-async def get_role_permissions(current_user: User = Depends(get_current_user)):
+async def get_role_permissions(current_user: User = Depends(require_permission("users", "read"))):
     """Get all role permissions configuration"""
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Check if custom permissions exist in database
-    custom_permissions = await db.role_permissions.find({}, {"_id": 0}).to_list(100)
-    
-    if custom_permissions:
-        return {perm['role']: perm['permissions'] for perm in custom_permissions}
-    
-    return DEFAULT_ROLE_PERMISSIONS
+    table = await role_permissions_cache.get_table(db.role_permissions)
+    return table.permissions
 
 @api_router.get("/role-permissions/{role}")
 async def get_role_permission(
@@ -3864,26 +5081,22 @@ async def get_role_permission(
     current_user: User = Depends(get_current_user)
 ):
     """Get permissions for a specific role"""
-    # Check database first
-    custom = await db.role_permissions.find_one({"role": role}, {"_id": 0})
-    if custom:
-        return custom['permissions']
-    
-    # Return default
-    if role in DEFAULT_ROLE_PERMISSIONS:
-        return DEFAULT_ROLE_PERMISSIONS[role]
+    table = await role_permissions_cache.get_table(db.role_permissions)
+    if role in table.permissions:
+        return table.permissions[role]
     
     raise HTTPException(status_code=404, detail="Role not found")
 
 @api_router.patch("/role-permissions/{role}")
 async def update_role_permissions(
     role: str,
-    permissions: dict,
-    current_user: User = Depends(get_current_user)
+    permissions: Dict[str, Dict[str, bool]],
+    current_user: User = Depends(require_permission("users", "manage_roles"))
 ):
-    """Update permissions for a role (Admin only)"""
-    if current_user.role != UserRole.ADMIN:
-        raise HTTPException(status_code=403, detail="Only admins can modify role permissions")
+    """Update permissions for a role (Admin only). Body is {module: {action: bool}}; anything else is 422."""
+    # Keep admins from locking everyone out of the permissions screen
+    if role == UserRole.ADMIN and not permissions.get('users', {}).get('manage_roles'):
+        raise HTTPException(status_code=400, detail="Admin role must keep users.manage_roles permission")
     
     # Upsert into database
     await db.role_permissions.update_one(
@@ -3895,22 +5108,15 @@ async def update_role_permissions(
         }},
         upsert=True
     )
+    role_permissions_cache.invalidate()
     
     return {"message": f"Permissions updated for role: {role}"}
 
 @api_router.get("/users/me/permissions")
 async def get_current_user_permissions(current_user: User = Depends(get_current_user)):
     """Get current user's permissions"""
-    # Check database first
-    custom = await db.role_permissions.find_one({"role": current_user.role}, {"_id": 0})
-    if custom:
-        return custom['permissions']
-    
-    # Return default
-    if current_user.role in DEFAULT_ROLE_PERMISSIONS:
-        return DEFAULT_ROLE_PERMISSIONS[current_user.role]
-    
-    return {}
+    table = await role_permissions_cache.get_table(db.role_permissions)
+    return table.permissions.get(current_user.role, {})
 
 app.include_router(api_router)
 
@@ -3920,6 +5126,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
 
 logging.basicConfig(
@@ -3928,6 +5135,143 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: List[asyncio.Task] = []
+
+async def run_periodically(name: str, interval_seconds: int, job, run_immediately: bool = False):
+    """Run `job` every `interval_seconds`, logging (not raising) failures"""
+    while True:
+        if not run_immediately:
+            await asyncio.sleep(interval_seconds)
+        run_immediately = False
+        try:
+            await job()
+        except Exception as e:
+            logger.exception(f"Background job '{name}' failed: {e}")
+
+async def backfill_lead_index_fields():
+    """Fill search prefixes and dedup keys on leads that do not have them yet"""
+    prefixed = await backfill_search_prefixes(db.leads)
+    keyed = await backfill_dedup_keys(db.leads)
+    if prefixed or keyed:
+        logger.info(f"Backfilled search prefixes on {prefixed} and dedup keys on {keyed} leads")
+
+async def scan_lead_duplicates_job():
+    summary = await scan_duplicates(db)
+    logger.info(f"Lead duplicate scan: {summary['duplicate_pairs']} pairs in {summary['groups']} groups")
+
+async def remove_duplicate_consultant_profiles():
+    """Keep the most recently updated profile per consultant so user_id can be indexed unique"""
+    groups = await db.consultant_profiles.aggregate([
+        {"$sort": {"updated_at": -1, "_id": -1}},
+        {"$group": {"_id": "$user_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True).to_list(None)
+    extra = [profile_id for group in groups for profile_id in group['ids'][1:]]
+    if extra:
+        await db.consultant_profiles.delete_many({"_id": {"$in": extra}})
+        logger.warning(f"Removed {len(extra)} duplicate profiles of {len(groups)} consultants")
+
+async def ensure_indexes():
+    await db.notifications.create_index([("user_id", 1), ("is_read", 1)])
+    await db.notifications.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+    await db.notifications.create_index([("is_read", 1), ("created_at", 1)])
+    await db.notifications_archive.create_index("id", unique=True)
+    await db.notifications_archive.create_index([("user_id", 1), ("created_at", -1)])
+    await db.notification_counters.create_index("user_id", unique=True)
+    await db.tasks.create_index([("project_id", 1), ("order", 1)])
+    await db.tasks.create_index("dependencies")
+    await remove_duplicate_consultant_profiles()
+    try:
+        await db.consultant_profiles.create_index("user_id", unique=True)
+    except OperationFailure as e:
+        # Don't keep the app from starting; the next start retries after another clean-up
+        logger.error(f"Could not build the unique consultant_profiles.user_id index: {e}")
+    await db.consultant_assignments.create_index([("consultant_id", 1), ("is_active", 1)])
+    await db.consultant_utilization_weekly.create_index([("consultant_id", 1), ("week_start", 1)], unique=True)
+    await db.consultant_utilization_weekly.create_index("week_start")
+    await db.kickoff_meetings.create_index([("meeting_date", 1), ("id", 1)])
+    await db.kickoff_meetings.create_index("project_id")
+    await db.sow.create_index([("overall_status", 1), ("submitted_at", 1)])
+    await db.agreements.create_index([("status", 1), ("created_at", 1)])
+    await db.revoked_tokens.create_index("token_hash", unique=True)
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.revoked_subjects.create_index("sub", unique=True)
+    await db.revoked_subjects.create_index("expires_at", expireAfterSeconds=0)
+    await db.leads.create_index(
+        [(field, "text") for field in TEXT_INDEX_WEIGHTS],
+        weights=TEXT_INDEX_WEIGHTS,
+        default_language="none",
+        name="lead_search_text"
+    )
+    await db.leads.create_index([("search_prefixes", 1), ("lead_score", -1)])
+    await db.leads.create_index([("assigned_to", 1), ("lead_score", -1)])
+    await db.leads.create_index([("created_by", 1), ("lead_score", -1)])
+    await db.leads.create_index("dedup_keys")
+    await db.leads.create_index("status")
+    await db.leads.create_index("city")
+    await db.lead_duplicate_groups.create_index([("max_score", -1), ("id", 1)])
+    await db.lead_duplicate_groups.create_index("scan_id")
+    await db.lead_status_events.create_index("occurred_at")
+    await db.lead_status_events.create_index([("lead_id", 1), ("occurred_at", 1)])
+    await db.funnel_daily_rollups.create_index("id", unique=True)
+    await db.funnel_daily_rollups.create_index([("date", 1), ("owner_id", 1), ("lead_source", 1)])
+
+@app.on_event("startup")
+async def start_background_services():
+    await ensure_indexes()
+    await migrate_inline_profile_images()
+    await sync_consultant_project_counts()
+    await notification_hub.start()
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "sync_token_revocations",
+        int(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', '30')),
+        sync_token_revocations,
+        run_immediately=True
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "backfill_lead_index_fields",
+        int(os.environ.get('LEAD_INDEX_BACKFILL_SECONDS', '3600')),
+        backfill_lead_index_fields,
+        run_immediately=True
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "scan_lead_duplicates",
+        int(os.environ.get('LEAD_DEDUP_SCAN_SECONDS', '86400')),
+        scan_lead_duplicates_job
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "refresh_sales_funnel",
+        int(os.environ.get('FUNNEL_ROLLUP_SECONDS', '300')),
+        refresh_sales_funnel,
+        run_immediately=True
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "reconcile_notification_counters",
+        int(os.environ.get('NOTIFICATION_COUNTER_RECONCILE_SECONDS', '3600')),
+        reconcile_notification_counters,
+        run_immediately=True
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "archive_read_notifications",
+        int(os.environ.get('NOTIFICATION_ARCHIVE_INTERVAL_SECONDS', '86400')),
+        archive_read_notifications
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "sync_consultant_project_counts",
+        int(os.environ.get('CONSULTANT_COUNT_SYNC_SECONDS', '3600')),
+        sync_consultant_project_counts
+    )))
+    background_tasks.append(asyncio.create_task(run_periodically(
+        "refresh_consultant_utilization",
+        int(os.environ.get('CONSULTANT_UTILIZATION_REFRESH_SECONDS', '3600')),
+        refresh_consultant_utilization,
+        run_immediately=True
+    )))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await notification_hub.stop()
+    password_hasher.shutdown()
     client.close()
\ No newline at end of file
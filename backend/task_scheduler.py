@@ -0,0 +1,339 @@
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+
+HOURS_PER_DAY = 8
+DEFAULT_DURATION_DAYS = 1.0
+SLACK_EPSILON = 1e-6
+
+class ScheduleCycleError(ValueError):
+    """Raised when task dependencies form a cycle"""
+
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__(f"Dependency cycle detected: {' -> '.join(cycle)}")
+
+def to_datetime(value) -> Optional[datetime]:
+    """Parse stored ISO strings; naive values are treated as UTC"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def task_duration_days(task: dict) -> float:
+    """Planned duration: start->due span, else estimated hours, else one day"""
+    start = to_datetime(task.get('start_date'))
+    due = to_datetime(task.get('due_date'))
+    if start and due and due >= start:
+        return max((due - start).total_seconds() / 86400, 0.0)
+    if task.get('estimated_hours'):
+        return task['estimated_hours'] / HOURS_PER_DAY
+    return DEFAULT_DURATION_DAYS
+
+def task_progress(task: dict) -> Optional[float]:
+    """Completion ratio 0..1, or None for cancelled tasks (excluded from roll-ups)"""
+    status = task.get('status')
+    if status == "cancelled":
+        return None
+    if status == "completed":
+        return 1.0
+    if status in ("in_progress", "delegated", "own_task"):
+        estimated = task.get('estimated_hours')
+        actual = task.get('actual_hours')
+        if estimated and actual:
+            return min(actual / estimated, 0.95)
+        return 0.5
+    return 0.0
+
+def build_graph(tasks: List[dict]) -> tuple:
+    """Return (predecessors, successors) keyed by task id, ignoring unknown dependency ids"""
+    ids = {t['id'] for t in tasks}
+    predecessors = {t['id']: [d for d in dict.fromkeys(t.get('dependencies') or []) if d in ids and d != t['id']] for t in tasks}
+    successors = {tid: [] for tid in ids}
+    for tid, preds in predecessors.items():
+        for pred in preds:
+            successors[pred].append(tid)
+    return predecessors, successors
+
+def find_cycle(predecessors: Dict[str, List[str]], candidates) -> List[str]:
+    """Return one dependency cycle among `candidates` as [a, b, ..., a]"""
+    candidates = set(candidates)
+    state = {}  # 1 = on current path, 2 = done
+    for root in candidates:
+        if root in state:
+            continue
+        path = []
+        stack = [(root, iter(predecessors.get(root, [])))]
+        state[root] = 1
+        path.append(root)
+        while stack:
+            node, children = stack[-1]
+            child = next((c for c in children if c in candidates and state.get(c) != 2), None)
+            if child is None:
+                state[node] = 2
+                stack.pop()
+                path.pop()
+            elif state.get(child) == 1:
+                cycle = path[path.index(child):] + [child]
+                # Report in dependency order (prerequisite first)
+                return list(reversed(cycle))
+            else:
+                state[child] = 1
+                path.append(child)
+                stack.append((child, iter(predecessors.get(child, []))))
+    return []
+
+def topological_order(predecessors: Dict[str, List[str]], successors: Dict[str, List[str]]) -> List[str]:
+    """Kahn's algorithm; raises ScheduleCycleError if the graph is not a DAG"""
+    indegree = {tid: len(preds) for tid, preds in predecessors.items()}
+    queue = deque(sorted(tid for tid, deg in indegree.items() if deg == 0))
+    order = []
+    while queue:
+        tid = queue.popleft()
+        order.append(tid)
+        for succ in successors[tid]:
+            indegree[succ] -= 1
+            if indegree[succ] == 0:
+                queue.append(succ)
+
+    if len(order) < len(predecessors):
+        remaining = [tid for tid, deg in indegree.items() if deg > 0]
+        raise ScheduleCycleError(find_cycle(predecessors, remaining))
+    return order
+
+def compute_schedule(tasks: List[dict], project_start=None) -> dict:
+    """
+    Critical path analysis over the task dependency DAG in O(V + E).
+
+    Dependencies are finish-to-start. A task with a planned start_date never
+    starts earlier than it. Offsets are in days from the schedule anchor
+    (project start, else the earliest task start, else now).
+    """
+    predecessors, successors = build_graph(tasks)
+    order = topological_order(predecessors, successors)
+    by_id = {t['id']: t for t in tasks}
+
+    starts = [to_datetime(t.get('start_date')) for t in tasks]
+    anchor = to_datetime(project_start) or min((s for s in starts if s), default=None) \
+        or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    duration = {tid: task_duration_days(by_id[tid]) for tid in order}
+
+    earliest_start, earliest_finish = {}, {}
+    for tid in order:
+        planned = to_datetime(by_id[tid].get('start_date'))
+        es = max((planned - anchor).total_seconds() / 86400, 0.0) if planned else 0.0
+        for pred in predecessors[tid]:
+            es = max(es, earliest_finish[pred])
+        earliest_start[tid] = es
+        earliest_finish[tid] = es + duration[tid]
+
+    project_finish = max(earliest_finish.values(), default=0.0)
+
+    latest_start, latest_finish = {}, {}
+    for tid in reversed(order):
+        lf = min((latest_start[succ] for succ in successors[tid]), default=project_finish)
+        latest_finish[tid] = lf
+        latest_start[tid] = lf - duration[tid]
+
+    def at(offset_days: float) -> str:
+        return (anchor + timedelta(days=offset_days)).isoformat()
+
+    task_results = {}
+    for tid in order:
+        slack = latest_start[tid] - earliest_start[tid]
+        task_results[tid] = {
+            "earliest_start": at(earliest_start[tid]),
+            "earliest_finish": at(earliest_finish[tid]),
+            "latest_start": at(latest_start[tid]),
+            "latest_finish": at(latest_finish[tid]),
+            "duration_days": round(duration[tid], 2),
+            "slack_days": round(max(slack, 0.0), 2),
+            "is_critical": slack <= SLACK_EPSILON,
+            "progress": round((task_progress(by_id[tid]) or 0.0) * 100)
+        }
+
+    # Walk back from the last-finishing critical task through critical predecessors
+    critical_path = []
+    tail = max(
+        (tid for tid in order if task_results[tid]["is_critical"]),
+        key=lambda tid: earliest_finish[tid],
+        default=None
+    )
+    while tail is not None:
+        critical_path.append(tail)
+        tail = next(
+            (p for p in predecessors[tail]
+             if task_results[p]["is_critical"] and abs(earliest_finish[p] - earliest_start[tail]) <= SLACK_EPSILON),
+            None
+        )
+    critical_path.reverse()
+
+    return {
+        "project_start": anchor.isoformat(),
+        "project_finish": at(project_finish),
+        "duration_days": round(project_finish, 2),
+        "critical_path": critical_path,
+        "progress": rollup_progress(tasks),
+        "tasks": task_results
+    }
+
+def rollup_progress(tasks: List[dict]) -> float:
+    """Project progress in percent, weighted by estimated (else actual) hours"""
+    weighted = 0.0
+    total_weight = 0.0
+    for task in tasks:
+        progress = task_progress(task)
+        if progress is None:
+            continue
+        weight = task.get('estimated_hours') or task.get('actual_hours') or task_duration_days(task) * HOURS_PER_DAY
+        weighted += weight * progress
+        total_weight += weight
+    return round(weighted / total_weight * 100, 1) if total_weight else 0.0
+
+PROPAGATION_FIELDS = {
+    "_id": 0, "id": 1, "project_id": 1, "title": 1, "start_date": 1, "due_date": 1,
+    "estimated_hours": 1, "dependencies": 1
+}
+
+async def collect_downstream(tasks_collection, task_ids: Iterable[str]) -> Dict[str, dict]:
+    """
+    Breadth-first walk over dependents of `task_ids`, one `$in` query per level.
+
+    Only the affected subgraph is read (served by the multikey index on
+    `dependencies`), so the cost grows with the number of dependents rather than
+    the size of the project.
+    """
+    roots = set(task_ids)
+    found: Dict[str, dict] = {}
+    frontier = list(roots)
+    while frontier:
+        docs = await tasks_collection.find(
+            {"dependencies": {"$in": frontier}},
+            PROPAGATION_FIELDS
+        ).to_list(None)
+        frontier = []
+        for doc in docs:
+            if doc['id'] not in found and doc['id'] not in roots:
+                found[doc['id']] = doc
+                frontier.append(doc['id'])
+    return found
+
+def shifted_dates(task: dict, required: Optional[datetime]) -> tuple:
+    """(start, due) for `task` so it starts no earlier than `required`, keeping its duration"""
+    start = to_datetime(task.get('start_date'))
+    due = to_datetime(task.get('due_date'))
+    if required and start and start < required:
+        return required, (due + (required - start) if due else None)
+    if required and not start and due and due < required:
+        return required, required + timedelta(days=task_duration_days(task))
+    return start, due
+
+def date_change(task: dict, new_start: Optional[datetime], new_due: Optional[datetime]) -> Optional[dict]:
+    """Change record for a shifted task, or None if its dates are unchanged"""
+    start = to_datetime(task.get('start_date'))
+    due = to_datetime(task.get('due_date'))
+    if new_start == start and new_due == due:
+        return None
+    return {
+        "task_id": task['id'],
+        "title": task.get('title'),
+        "project_id": task.get('project_id'),
+        "old_start_date": start.isoformat() if start else None,
+        "new_start_date": new_start.isoformat() if new_start else None,
+        "old_due_date": due.isoformat() if due else None,
+        "new_due_date": new_due.isoformat() if new_due else None
+    }
+
+def plan_propagation(root: dict, downstream: Dict[str, dict], external_due: Dict[str, Optional[str]]) -> List[dict]:
+    """
+    Shift dependents so each starts no earlier than all of its predecessors finish.
+
+    Tasks are only pushed later, keeping their planned duration; dependents that
+    already start after their predecessors are left alone. `external_due` holds
+    due dates of predecessors outside the affected subgraph.
+    """
+    nodes = {root['id']: root, **downstream}
+    predecessors = {tid: [d for d in (t.get('dependencies') or []) if d in nodes] for tid, t in nodes.items()}
+    predecessors[root['id']] = []
+    successors = {tid: [] for tid in nodes}
+    for tid, preds in predecessors.items():
+        for pred in preds:
+            successors[pred].append(tid)
+    order = topological_order(predecessors, successors)
+
+    finish = {root['id']: to_datetime(root.get('due_date'))}
+    changes = []
+    for tid in order:
+        if tid == root['id']:
+            continue
+        task = nodes[tid]
+        pred_finishes = [finish.get(d) for d in predecessors[tid]]
+        pred_finishes += [to_datetime(external_due.get(d)) for d in (task.get('dependencies') or []) if d in external_due]
+        pred_finishes = [f for f in pred_finishes if f]
+        required = max(pred_finishes, default=None)
+
+        new_start, new_due = shifted_dates(task, required)
+        change = date_change(task, new_start, new_due)
+        if change:
+            changes.append(change)
+        finish[tid] = new_due
+    return changes
+
+async def due_dates(tasks_collection, task_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    docs = await tasks_collection.find(
+        {"id": {"$in": task_ids}},
+        {"_id": 0, "id": 1, "due_date": 1}
+    ).to_list(len(task_ids))
+    return {doc['id']: doc.get('due_date') for doc in docs}
+
+async def propagate_schedule(
+    tasks_collection, task_id: str, dry_run: bool = False, align_root: bool = False
+) -> List[dict]:
+    """
+    Shift every dependent of `task_id` after a date/dependency change; writes once unless dry_run.
+
+    With align_root, `task_id` itself is first moved to start after its own
+    predecessors finish (for when its dependencies changed), and its dependents
+    are planned from the moved dates.
+    """
+    root = await tasks_collection.find_one({"id": task_id}, PROPAGATION_FIELDS)
+    if not root:
+        return []
+
+    changes = []
+    if align_root and root.get('dependencies'):
+        finishes = [to_datetime(due) for due in (await due_dates(tasks_collection, root['dependencies'])).values()]
+        new_start, new_due = shifted_dates(root, max((f for f in finishes if f), default=None))
+        change = date_change(root, new_start, new_due)
+        if change:
+            changes.append(change)
+            root = {**root, "start_date": change['new_start_date'], "due_date": change['new_due_date']}
+
+    downstream = await collect_downstream(tasks_collection, [task_id])
+    if downstream:
+        known = set(downstream) | {task_id}
+        external_due = await due_dates(
+            tasks_collection,
+            {d for t in downstream.values() for d in (t.get('dependencies') or []) if d not in known}
+        )
+        changes += plan_propagation(root, downstream, external_due)
+
+    if changes and not dry_run:
+        now = datetime.now(timezone.utc).isoformat()
+        await tasks_collection.bulk_write([
+            UpdateOne({"id": change['task_id']}, {"$set": {
+                "start_date": change['new_start_date'],
+                "due_date": change['new_due_date'],
+                "updated_at": now
+            }})
+            for change in changes
+        ], ordered=False)
+    return changes
@@ -0,0 +1,51 @@
+"""
+Auth Session Tests
+Tests for:
+- Logout revokes the token it was called with
+- Other tokens of the same user keep working
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+EXECUTIVE_CREDS = {"email": "executive@company.com", "password": "executive123"}
+
+
+def login():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json=EXECUTIVE_CREDS)
+    if response.status_code != 200:
+        pytest.skip("Executive authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestLogout:
+    """POST /api/auth/logout"""
+
+    def test_logout_revokes_token(self):
+        """A logged-out token is rejected, even though it was cached as valid"""
+        headers = login()
+        assert requests.get(f"{BASE_URL}/api/auth/me", headers=headers).status_code == 200
+
+        response = requests.post(f"{BASE_URL}/api/auth/logout", headers=headers)
+        assert response.status_code == 200
+
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=headers)
+        assert response.status_code == 401
+        print("✓ Token rejected after logout")
+
+    def test_logout_keeps_other_sessions(self):
+        """Logging out one session leaves the user's other tokens valid"""
+        first, second = login(), login()
+        assert requests.post(f"{BASE_URL}/api/auth/logout", headers=first).status_code == 200
+
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=second)
+        assert response.status_code == 200
+        print("✓ Other session still valid")
+
+    def test_logout_requires_token(self):
+        """Logout without a token is unauthorized"""
+        response = requests.post(f"{BASE_URL}/api/auth/logout")
+        assert response.status_code == 401
+        print("✓ Anonymous logout rejected")
@@ -0,0 +1,227 @@
+"""
+Consultant Capacity Tests
+Tests for:
+- Atomic slot reservation when assigning consultants (no over-allocation)
+- Slots released on unassign
+- Staffing recommendations ranked by bandwidth and specialization
+- Weekly utilization rollups (team and per consultant)
+"""
+import pytest
+import requests
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+OFFLINE_CAPACITY = 6
+
+
+@pytest.fixture(scope="module")
+def auth_header():
+    """Get admin auth header"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@company.com",
+        "password": "admin123"
+    })
+    if response.status_code != 200:
+        pytest.skip("Admin authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def consultant(auth_header):
+    """Fresh offline consultant (capacity 6)"""
+    response = requests.post(f"{BASE_URL}/api/consultants", json={
+        "email": f"test_capacity_{uuid.uuid4().hex[:8]}@company.com",
+        "password": "consultant123",
+        "full_name": "TEST Capacity Consultant",
+        "role": "consultant"
+    }, headers=auth_header)
+    assert response.status_code == 200, f"Failed to create consultant: {response.text}"
+    consultant = response.json()
+
+    response = requests.patch(
+        f"{BASE_URL}/api/consultants/{consultant['id']}/profile",
+        params={"preferred_mode": "offline"},
+        headers=auth_header
+    )
+    assert response.status_code == 200
+    return consultant
+
+
+@pytest.fixture(scope="module")
+def projects(auth_header):
+    """One more project than the consultant can take"""
+    created = []
+    for i in range(OFFLINE_CAPACITY + 1):
+        response = requests.post(f"{BASE_URL}/api/projects", json={
+            "name": f"TEST_Capacity Project {i}",
+            "client_name": "TEST Client",
+            "start_date": (datetime.now() + timedelta(days=30)).isoformat()
+        }, headers=auth_header)
+        assert response.status_code == 200, f"Failed to create project: {response.text}"
+        created.append(response.json())
+    return created
+
+
+def assign(auth_header, consultant, project):
+    return requests.post(
+        f"{BASE_URL}/api/projects/{project['id']}/assign-consultant",
+        json={"consultant_id": consultant["id"], "project_id": project["id"]},
+        headers=auth_header
+    )
+
+
+class TestConsultantCapacity:
+    """Bandwidth enforcement under concurrent assignment"""
+
+    def test_concurrent_assignments_respect_capacity(self, auth_header, consultant, projects):
+        """Only max_projects of the parallel assignments succeed"""
+        with ThreadPoolExecutor(max_workers=len(projects)) as pool:
+            responses = list(pool.map(lambda p: assign(auth_header, consultant, p), projects))
+
+        accepted = [r for r in responses if r.status_code == 200]
+        rejected = [r for r in responses if r.status_code == 400]
+        assert len(accepted) == OFFLINE_CAPACITY
+        assert len(rejected) == 1
+        assert "capacity" in rejected[0].json()["detail"]
+
+        profile = requests.get(f"{BASE_URL}/api/consultants/{consultant['id']}", headers=auth_header).json()["profile"]
+        assert profile["current_project_count"] == OFFLINE_CAPACITY
+        print(f"✓ {len(accepted)} assignments accepted, 1 rejected")
+
+    def test_unassign_frees_slot(self, auth_header, consultant, projects):
+        """Unassigning releases a slot for the next assignment"""
+        assigned = requests.get(f"{BASE_URL}/api/consultants/{consultant['id']}", headers=auth_header).json()
+        assigned_ids = {p["project"]["id"] for p in assigned["projects"] if p["assignment"]["is_active"]}
+        free = next(p for p in projects if p["id"] not in assigned_ids)
+        taken = next(p for p in projects if p["id"] in assigned_ids)
+
+        response = requests.delete(
+            f"{BASE_URL}/api/projects/{taken['id']}/unassign-consultant/{consultant['id']}",
+            headers=auth_header
+        )
+        assert response.status_code == 200
+
+        response = assign(auth_header, consultant, free)
+        assert response.status_code == 200, f"Assignment after unassign failed: {response.text}"
+        print("✓ Released slot reused")
+
+
+class TestConsultantRecommendations:
+    """GET /api/consultants/recommendations"""
+
+    def test_recommendations_route_not_shadowed(self, auth_header):
+        """The static path is not captured by /consultants/{consultant_id}"""
+        response = requests.get(
+            f"{BASE_URL}/api/consultants/recommendations",
+            params={"project_type": "online", "categories": ["sales"], "limit": 5},
+            headers=auth_header
+        )
+        assert response.status_code == 200, f"Recommendations failed: {response.text}"
+        results = response.json()
+        assert isinstance(results, list)
+        assert len(results) <= 5
+        scores = [r["score"] for r in results]
+        assert scores == sorted(scores, reverse=True)
+        assert all(r["remaining_slots"] > 0 for r in results)
+        print(f"✓ {len(results)} consultants recommended")
+
+    def test_full_consultant_excluded(self, auth_header, consultant, projects):
+        """A consultant at capacity is only listed with include_unavailable"""
+        # Fill the slot freed by the previous test class, if any
+        for project in projects:
+            assign(auth_header, consultant, project)
+
+        available = requests.get(
+            f"{BASE_URL}/api/consultants/recommendations",
+            params={"limit": 100},
+            headers=auth_header
+        ).json()
+        assert consultant["id"] not in [r["consultant_id"] for r in available]
+
+        everyone = requests.get(
+            f"{BASE_URL}/api/consultants/recommendations",
+            params={"limit": 100, "include_unavailable": True},
+            headers=auth_header
+        ).json()
+        assert consultant["id"] in [r["consultant_id"] for r in everyone]
+        print("✓ Consultant at capacity filtered out")
+
+    def test_unknown_project(self, auth_header):
+        """Unknown project_id returns 404"""
+        response = requests.get(
+            f"{BASE_URL}/api/consultants/recommendations",
+            params={"project_id": "does-not-exist"},
+            headers=auth_header
+        )
+        assert response.status_code == 404
+        print("✓ Unknown project rejected")
+
+
+class TestConsultantUtilization:
+    """Weekly utilization served from rollups"""
+
+    def test_refresh_and_projected_load(self, auth_header, consultant, projects):
+        """Assigned projects starting next month show up as projected weekly load"""
+        response = requests.post(f"{BASE_URL}/api/consultants/utilization/refresh", headers=auth_header)
+        assert response.status_code == 200, f"Refresh failed: {response.text}"
+
+        response = requests.get(
+            f"{BASE_URL}/api/consultants/{consultant['id']}/utilization",
+            params={"weeks_back": 0, "weeks_ahead": 8},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        weeks = response.json()["weeks"]
+        projected = [w for w in weeks if w["is_projection"] and w["projects"] > 0]
+        assert projected, "Expected projected weeks for upcoming projects"
+        assert all(0 < w["load"] <= 1 for w in projected)
+        print(f"✓ {len(projected)} projected weeks for consultant")
+
+    def test_team_utilization(self, auth_header):
+        """GET /api/consultants/utilization returns weeks in order"""
+        response = requests.get(
+            f"{BASE_URL}/api/consultants/utilization",
+            params={"weeks_back": 4, "weeks_ahead": 8},
+            headers=auth_header
+        )
+        assert response.status_code == 200, f"Team utilization failed: {response.text}"
+        data = response.json()
+        week_starts = [w["week_start"] for w in data["weeks"]]
+        assert week_starts == sorted(week_starts)
+        assert all(data["from_week"] <= w <= data["to_week"] for w in week_starts)
+        print(f"✓ Team utilization over {len(week_starts)} weeks")
+
+    def test_unassigned_consultant_keeps_history(self, auth_header):
+        """Weeks a consultant covered still count after they are unassigned"""
+        consultant = requests.post(f"{BASE_URL}/api/consultants", json={
+            "email": f"test_history_{uuid.uuid4().hex[:8]}@company.com",
+            "password": "consultant123",
+            "full_name": "TEST History Consultant",
+            "role": "consultant"
+        }, headers=auth_header).json()
+        project = requests.post(f"{BASE_URL}/api/projects", json={
+            "name": "TEST_Utilization History Project",
+            "client_name": "TEST Client",
+            "start_date": (datetime.now() - timedelta(days=28)).isoformat()
+        }, headers=auth_header).json()
+        assert assign(auth_header, consultant, project).status_code == 200
+        response = requests.delete(
+            f"{BASE_URL}/api/projects/{project['id']}/unassign-consultant/{consultant['id']}",
+            headers=auth_header
+        )
+        assert response.status_code == 200
+
+        requests.post(f"{BASE_URL}/api/consultants/utilization/refresh", headers=auth_header)
+        weeks = requests.get(
+            f"{BASE_URL}/api/consultants/{consultant['id']}/utilization",
+            params={"weeks_back": 8, "weeks_ahead": 8},
+            headers=auth_header
+        ).json()["weeks"]
+        covered = [w for w in weeks if w["projects"] > 0]
+        assert covered, "The week the assignment covered should survive the unassign"
+        assert all(not w["is_projection"] for w in covered), "Nothing projected after it ended"
+        print(f"✓ {len(covered)} covered weeks kept after unassign")
@@ -0,0 +1,163 @@
+"""
+Lead Duplicate Detection Tests
+Tests for:
+- On-create duplicate check (normalized phone / company)
+- Bulk upload duplicate skipping
+- Batch duplicate scan and review (admin only)
+"""
+import uuid
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def login(email, password):
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password})
+    if response.status_code != 200:
+        pytest.skip(f"Authentication failed for {email}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return login("admin@company.com", "admin123")
+
+
+@pytest.fixture(scope="module")
+def original(admin_headers):
+    """A lead with a formatted phone and a legal-form company name"""
+    suffix = uuid.uuid4().hex[:6]
+    phone = f"+91-98{uuid.uuid4().int % 10**3:03d}-{uuid.uuid4().int % 10**5:05d}"
+    response = requests.post(f"{BASE_URL}/api/leads", headers=admin_headers, json={
+        "first_name": "Dedup",
+        "last_name": f"Test{suffix}",
+        "company": f"Dedup{suffix} Solutions Pvt Ltd",
+        "phone": phone
+    })
+    assert response.status_code == 200, f"Failed to create lead: {response.text}"
+    return response.json()
+
+
+def digits(phone):
+    return "".join(ch for ch in phone if ch.isdigit())[-10:]
+
+
+class TestDuplicateCheck:
+    """Duplicate detection when creating leads"""
+
+    def test_create_with_check_returns_409(self, admin_headers, original):
+        response = requests.post(
+            f"{BASE_URL}/api/leads",
+            params={"check_duplicates": True},
+            headers=admin_headers,
+            json={
+                "first_name": "dedup",
+                "last_name": original["last_name"].lower(),
+                "company": original["company"].replace(" Pvt Ltd", ""),
+                "phone": digits(original["phone"])
+            }
+        )
+        assert response.status_code == 409
+        duplicates = response.json()["detail"]["duplicates"]
+        assert duplicates[0]["id"] == original["id"]
+        assert "phone" in duplicates[0]["match_reasons"]
+        print(f"✓ Duplicate detected with score {duplicates[0]['match_score']}")
+
+    def test_check_endpoint_finds_company_variant(self, admin_headers, original):
+        response = requests.post(f"{BASE_URL}/api/leads/check-duplicates", headers=admin_headers, json={
+            "first_name": "Dedup",
+            "last_name": original["last_name"],
+            "company": original["company"].upper().replace(" PVT LTD", " LIMITED")
+        })
+        assert response.status_code == 200
+        assert original["id"] in [d["id"] for d in response.json()["duplicates"]]
+        print("✓ Company spelling variant matched")
+
+    def test_distinct_lead_not_flagged(self, admin_headers, original):
+        response = requests.post(f"{BASE_URL}/api/leads/check-duplicates", headers=admin_headers, json={
+            "first_name": "Completely",
+            "last_name": f"Different{uuid.uuid4().hex[:6]}",
+            "company": f"Other{uuid.uuid4().hex[:6]} Industries"
+        })
+        assert response.status_code == 200
+        assert response.json()["duplicates"] == []
+        print("✓ Unrelated lead not flagged")
+
+    def test_colleagues_at_same_company_not_flagged(self, admin_headers):
+        """Similar names at one company with different emails are different people"""
+        suffix = uuid.uuid4().hex[:6]
+        company = f"Colleague{suffix} Infosys Ltd"
+        rows = [
+            {"first_name": "Amit", "last_name": "Kumar", "company": company, "email": f"amit.{suffix}@example.com"},
+            {"first_name": "Sumit", "last_name": "Kumar", "company": company, "email": f"sumit.{suffix}@example.com"},
+            {"first_name": "Rahul", "last_name": "Sharma", "company": company},
+            {"first_name": "Rahul", "last_name": "Verma", "company": company}
+        ]
+        response = requests.post(f"{BASE_URL}/api/leads/bulk-upload", headers=admin_headers, json=rows)
+        assert response.status_code == 200
+        assert response.json()["created_count"] == 4, response.json()["skipped_duplicates"]
+
+        response = requests.post(f"{BASE_URL}/api/leads/check-duplicates", headers=admin_headers, json={
+            "first_name": "Sumit", "last_name": "Kumar", "company": company, "email": f"s.kumar.{suffix}@example.com"
+        })
+        assert response.json()["duplicates"] == [], "A different email outweighs a matching name"
+        print("✓ Colleagues at the same company kept as separate leads")
+
+    def test_out_of_scope_duplicates_redacted(self, original):
+        """Executives learn a duplicate exists but not another owner's contact details"""
+        headers = login("executive@company.com", "executive123")
+        response = requests.post(f"{BASE_URL}/api/leads/check-duplicates", headers=headers, json={
+            "first_name": original["first_name"],
+            "last_name": original["last_name"],
+            "company": original["company"],
+            "phone": original["phone"]
+        })
+        assert response.status_code == 200
+        match = next(d for d in response.json()["duplicates"] if d["id"] == original["id"])
+        assert set(match) == {"id", "match_score"}
+        print("✓ Duplicate owned by another user redacted to ID and score")
+
+    def test_bulk_upload_without_phone_not_skipped(self, admin_headers):
+        """A row with only an email must not match every lead (missing fields are not wildcards)"""
+        suffix = uuid.uuid4().hex[:8]
+        response = requests.post(f"{BASE_URL}/api/leads/bulk-upload", headers=admin_headers, json=[
+            {"first_name": "Bulk", "last_name": f"One{suffix}", "company": f"Bulk{suffix} A",
+             "email": f"bulk.{suffix}@example.com"},
+            {"first_name": "Bulk", "last_name": f"One{suffix}", "company": f"Bulk{suffix} A",
+             "email": f"Bulk.{suffix}+crm@Example.com"}
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created_count"] == 1
+        assert data["skipped_count"] == 1, "Second row repeats the first with a reformatted email"
+        print("✓ Bulk upload skipped only the real duplicate")
+
+
+class TestDuplicateScan:
+    """POST /api/leads/duplicates/scan and GET /api/leads/duplicates"""
+
+    def test_scan_groups_duplicates(self, admin_headers, original):
+        requests.post(f"{BASE_URL}/api/leads", headers=admin_headers, json={
+            "first_name": "Dedup",
+            "last_name": original["last_name"],
+            "company": original["company"].replace(" Pvt Ltd", ""),
+            "phone": digits(original["phone"])
+        })
+        response = requests.post(f"{BASE_URL}/api/leads/duplicates/scan", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["groups"] >= 1
+
+        response = requests.get(f"{BASE_URL}/api/leads/duplicates", params={"limit": 200}, headers=admin_headers)
+        assert response.status_code == 200
+        groups = [g for g in response.json() if original["id"] in g["lead_ids"]]
+        assert groups, "Original lead should be in a duplicate group"
+        assert len(groups[0]["leads"]) == len(groups[0]["lead_ids"])
+        print(f"✓ Scan found {response.headers['X-Total-Count']} groups")
+
+    def test_duplicates_admin_only(self):
+        headers = login("executive@company.com", "executive123")
+        response = requests.get(f"{BASE_URL}/api/leads/duplicates", headers=headers)
+        assert response.status_code == 403
+        print("✓ Duplicate review restricted to admins")
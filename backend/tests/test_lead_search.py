@@ -0,0 +1,144 @@
+"""
+Lead Search Tests
+Tests for:
+- Typeahead prefix search over names, company, email and phone
+- Ranked full-text search
+- Ownership scoping and pagination
+- Facet counts on the leads list
+"""
+import uuid
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+def login(email, password):
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password})
+    if response.status_code != 200:
+        pytest.skip(f"Authentication failed for {email}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return login("admin@company.com", "admin123")
+
+
+@pytest.fixture(scope="module")
+def tag():
+    """Unique word so results only contain leads created by this module"""
+    return f"zq{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(scope="module")
+def leads(admin_headers, tag):
+    created = []
+    for first, company, title, phone in [
+        ("Ananya", f"{tag} Analytics", "CEO", "+91-98765-43210"),
+        ("Rahul", f"{tag} Retail", "Intern", "9123456780"),
+    ]:
+        response = requests.post(f"{BASE_URL}/api/leads", headers=admin_headers, json={
+            "first_name": first,
+            "last_name": "TEST_Search",
+            "company": company,
+            "job_title": title,
+            "phone": phone,
+            "notes": f"Met at the {tag} conference"
+        })
+        assert response.status_code == 200, f"Failed to create lead: {response.text}"
+        created.append(response.json())
+    return created
+
+
+class TestLeadSearch:
+    """GET /api/leads/search"""
+
+    def test_search_route_not_shadowed(self, admin_headers, leads, tag):
+        """/leads/search reaches the search handler, not /leads/{lead_id}"""
+        response = requests.get(f"{BASE_URL}/api/leads/search", params={"q": tag}, headers=admin_headers)
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+        print("✓ Search route resolved")
+
+    def test_prefix_search_ranks_by_score(self, admin_headers, leads, tag):
+        response = requests.get(f"{BASE_URL}/api/leads/search", params={"q": tag[:6]}, headers=admin_headers)
+        assert response.status_code == 200
+        ids = [lead["id"] for lead in response.json()]
+        assert ids[:2] == [leads[0]["id"], leads[1]["id"]], "CEO lead should outrank intern lead"
+        assert response.headers["X-Total-Count"] == "2"
+        assert "search_prefixes" not in response.json()[0]
+        print(f"✓ Prefix search '{tag[:6]}' returned {ids}")
+
+    def test_multi_word_prefix(self, admin_headers, leads, tag):
+        response = requests.get(f"{BASE_URL}/api/leads/search", params={"q": f"rah {tag}"}, headers=admin_headers)
+        assert [lead["id"] for lead in response.json()] == [leads[1]["id"]]
+        print("✓ Every word must match a prefix")
+
+    def test_phone_prefix_ignores_formatting(self, admin_headers, leads):
+        response = requests.get(f"{BASE_URL}/api/leads/search", params={"q": "+91 98765 432"}, headers=admin_headers)
+        assert leads[0]["id"] in [lead["id"] for lead in response.json()]
+        print("✓ Phone prefix matched")
+
+    def test_text_search_includes_notes(self, admin_headers, leads, tag):
+        response = requests.get(
+            f"{BASE_URL}/api/leads/search",
+            params={"q": f"{tag} conference", "mode": "text"},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        results = response.json()
+        assert {lead["id"] for lead in results} >= {lead["id"] for lead in leads}
+        assert all("relevance" in lead for lead in results)
+        print(f"✓ Text search returned {len(results)} ranked leads")
+
+    def test_pagination(self, admin_headers, leads, tag):
+        response = requests.get(
+            f"{BASE_URL}/api/leads/search",
+            params={"q": tag, "skip": 1, "limit": 1},
+            headers=admin_headers
+        )
+        assert [lead["id"] for lead in response.json()] == [leads[1]["id"]]
+        assert response.headers["X-Total-Count"] == "2"
+        print("✓ Search results paginated")
+
+    def test_executive_only_sees_own_leads(self, leads, tag):
+        headers = login("executive@company.com", "executive123")
+        response = requests.get(f"{BASE_URL}/api/leads/search", params={"q": tag}, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == [], "Executive should not see admin-created leads"
+        print("✓ Ownership scope applied to search")
+
+
+class TestLeadFacets:
+    """GET /api/leads?include_facets=true"""
+
+    def test_list_without_facets_unchanged(self, admin_headers, leads):
+        response = requests.get(f"{BASE_URL}/api/leads", headers=admin_headers)
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+        print("✓ Plain list returned by default")
+
+    def test_facets_match_filter(self, admin_headers, leads):
+        response = requests.get(
+            f"{BASE_URL}/api/leads",
+            params={"include_facets": True, "status": "new"},
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["facets"]) == {"status", "lead_source", "sales_status", "city", "owner"}
+        assert data["facets"]["status"] == [{"value": "new", "count": len(data["leads"]), "label": None}]
+        print(f"✓ Facets for {len(data['leads'])} new leads")
+
+    def test_facets_refresh_after_write(self, admin_headers, leads, tag):
+        params = {"include_facets": True, "city": f"City{tag}"}
+        before = requests.get(f"{BASE_URL}/api/leads", params=params, headers=admin_headers).json()
+        assert before["leads"] == [] and before["facets"]["status"] == []
+
+        requests.put(f"{BASE_URL}/api/leads/{leads[0]['id']}", headers=admin_headers, json={"city": f"City{tag}"})
+        after = requests.get(f"{BASE_URL}/api/leads", params=params, headers=admin_headers).json()
+        assert [lead["id"] for lead in after["leads"]] == [leads[0]["id"]]
+        assert sum(row["count"] for row in after["facets"]["status"]) == 1
+        print("✓ Facet cache cleared on lead update")
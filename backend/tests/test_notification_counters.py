@@ -0,0 +1,62 @@
+"""
+Notification Counter Tests
+Tests for:
+- Missing unread counters seeded from notifications users already have
+- Existing counters left alone
+Runs against an in-memory stand-in for the collections; no server needed.
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from notification_counters import seed_unread_counters  # noqa: E402
+
+
+class FakeNotifications:
+    def __init__(self, notifications):
+        self.notifications = notifications
+
+    async def count_documents(self, query):
+        return sum(
+            1 for n in self.notifications
+            if n["user_id"] == query["user_id"] and n["is_read"] == query["is_read"]
+        )
+
+
+class FakeCounters:
+    def __init__(self, counters):
+        self.counters = counters
+
+    async def distinct(self, field, query):
+        return [user_id for user_id in self.counters if user_id in query["user_id"]["$in"]]
+
+    async def update_one(self, query, update, upsert=False):
+        if query["user_id"] not in self.counters and upsert:
+            self.counters[query["user_id"]] = update["$setOnInsert"]["unread"]
+
+
+def fake_db(notifications, counters):
+    return SimpleNamespace(notifications=FakeNotifications(notifications), notification_counters=FakeCounters(counters))
+
+
+class TestSeedUnreadCounters:
+    """seed_unread_counters"""
+
+    def test_existing_unread_notifications_counted(self):
+        """A user with unread notifications from before the counters starts at that count"""
+        db = fake_db(
+            [
+                {"user_id": "u1", "is_read": False},
+                {"user_id": "u1", "is_read": False},
+                {"user_id": "u1", "is_read": True},
+                {"user_id": "u2", "is_read": False},
+            ],
+            {"u2": 5}
+        )
+        seeded = asyncio.run(seed_unread_counters(db, ["u1", "u2", "u3"]))
+        assert seeded == 2
+        assert db.notification_counters.counters == {"u1": 2, "u2": 5, "u3": 0}
+        print("✓ Missing counters seeded from pre-existing unread notifications")
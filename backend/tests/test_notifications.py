@@ -0,0 +1,125 @@
+"""
+Test Notification APIs
+Features tested:
+- Unread count served from per-user counter
+- Mark single notification / all notifications as read
+- Notification stream authentication
+- Keyset pagination of the notifications feed
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+EXECUTIVE_CREDS = {"email": "executive@company.com", "password": "executive123"}
+
+
+@pytest.fixture(scope="module")
+def executive_client():
+    """Session with executive auth header"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json=EXECUTIVE_CREDS)
+    if response.status_code != 200:
+        pytest.skip("Executive authentication failed")
+    session = requests.Session()
+    session.headers.update({
+        "Authorization": f"Bearer {response.json()['access_token']}",
+        "Content-Type": "application/json"
+    })
+    return session
+
+
+class TestUnreadCounter:
+    """Unread counter endpoints"""
+
+    def test_unread_count_shape(self, executive_client):
+        """GET /api/notifications/unread-count returns a non-negative count"""
+        response = executive_client.get(f"{BASE_URL}/api/notifications/unread-count")
+        assert response.status_code == 200
+        data = response.json()
+        assert "count" in data
+        assert data["count"] >= 0
+        print(f"✓ Unread count: {data['count']}")
+
+    def test_mark_single_read_decrements_count(self, executive_client):
+        """PATCH /api/notifications/{id}/read decrements the counter only once"""
+        notifications = executive_client.get(f"{BASE_URL}/api/notifications").json()
+        unread = [n for n in notifications if not n.get("is_read")]
+        if not unread:
+            pytest.skip("No unread notifications to test")
+
+        before = executive_client.get(f"{BASE_URL}/api/notifications/unread-count").json()["count"]
+
+        notification_id = unread[0]["id"]
+        response = executive_client.patch(f"{BASE_URL}/api/notifications/{notification_id}/read")
+        assert response.status_code == 200
+        # Marking it again must not decrement a second time
+        executive_client.patch(f"{BASE_URL}/api/notifications/{notification_id}/read")
+
+        after = executive_client.get(f"{BASE_URL}/api/notifications/unread-count").json()["count"]
+        assert after == before - 1
+        print(f"✓ Unread count {before} -> {after}")
+
+    def test_mark_all_read_resets_count(self, executive_client):
+        """PATCH /api/notifications/read-all leaves zero unread"""
+        response = executive_client.patch(f"{BASE_URL}/api/notifications/read-all")
+        assert response.status_code == 200
+        assert "updated_count" in response.json()
+
+        count = executive_client.get(f"{BASE_URL}/api/notifications/unread-count").json()["count"]
+        assert count == 0
+        print(f"✓ Marked {response.json()['updated_count']} notifications read")
+
+
+class TestNotificationFeed:
+    """Paginated notifications feed"""
+
+    def test_feed_pages_do_not_overlap(self, executive_client):
+        """GET /api/notifications?limit=1 follows X-Next-Cursor without repeats"""
+        first = executive_client.get(f"{BASE_URL}/api/notifications", params={"limit": 1})
+        assert first.status_code == 200
+        assert isinstance(first.json(), list)
+        assert len(first.json()) <= 1
+
+        cursor = first.headers.get("X-Next-Cursor")
+        if not cursor:
+            pytest.skip("Not enough notifications to paginate")
+
+        second = executive_client.get(f"{BASE_URL}/api/notifications", params={"limit": 1, "cursor": cursor})
+        assert second.status_code == 200
+        assert second.json()
+        assert second.json()[0]["id"] != first.json()[0]["id"]
+        assert second.json()[0]["created_at"] <= first.json()[0]["created_at"]
+        print("✓ Second page continues after the first")
+
+    def test_invalid_cursor_rejected(self, executive_client):
+        """A malformed cursor returns 400"""
+        response = executive_client.get(f"{BASE_URL}/api/notifications", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+        print("✓ Invalid cursor rejected")
+
+
+class TestNotificationStream:
+    """SSE stream endpoint"""
+
+    def test_stream_requires_token(self):
+        """GET /api/notifications/stream without a token is rejected"""
+        response = requests.get(f"{BASE_URL}/api/notifications/stream", timeout=10)
+        assert response.status_code == 401
+        print("✓ Stream rejects unauthenticated clients")
+
+    def test_stream_sends_initial_unread_count(self, executive_client):
+        """First SSE event is the current unread count"""
+        token = executive_client.headers["Authorization"].split(" ", 1)[1]
+        with requests.get(
+            f"{BASE_URL}/api/notifications/stream",
+            params={"token": token},
+            stream=True,
+            timeout=10
+        ) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            first_line = next(response.iter_lines(decode_unicode=True))
+            assert first_line == "event: unread_count"
+        print("✓ Stream opened with unread_count event")
@@ -0,0 +1,70 @@
+"""
+Profile Image Migration Tests
+Tests for:
+- Inline base64 avatars moved into the image store at startup
+- Values the store cannot take (URLs, unsupported formats) kept, not deleted
+Runs against an in-memory stand-in for the users collection; no server needed.
+"""
+import asyncio
+import base64
+import io
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from profile_images import LEGACY_IMAGE_FIELD, ProfileImageStore, migrate_inline_images  # noqa: E402
+
+
+def encoded(fmt):
+    buffer = io.BytesIO()
+    Image.new("RGB", (48, 48), "teal").save(buffer, fmt)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeUsers:
+    """find() over users with a string profile_image, and the $set / $rename updates"""
+
+    def __init__(self, users):
+        self.users = {user["id"]: user for user in users}
+
+    async def find(self, query, projection):
+        for user in list(self.users.values()):
+            if isinstance(user.get("profile_image"), str):
+                yield {"id": user["id"], "profile_image": user["profile_image"]}
+
+    async def update_one(self, query, update):
+        user = self.users[query["id"]]
+        user.update(update.get("$set", {}))
+        for old, new in update.get("$rename", {}).items():
+            user[new] = user.pop(old)
+
+
+class TestInlineImageMigration:
+    """migrate_inline_images"""
+
+    def test_unreadable_images_kept(self, tmp_path):
+        png = f"data:image/png;base64,{encoded('PNG')}"
+        bmp = encoded("BMP")
+        users = FakeUsers([
+            {"id": "u1", "profile_image": png},
+            {"id": "u2", "profile_image": "https://example.com/avatar.jpg"},
+            {"id": "u3", "profile_image": bmp},
+        ])
+        store = ProfileImageStore(str(tmp_path / "avatars"), {"small": 32}, max_bytes=5 * 1024 * 1024)
+
+        migrated, skipped = asyncio.run(migrate_inline_images(users, store))
+        assert migrated == 1
+        assert sorted(user_id for user_id, _ in skipped) == ["u2", "u3"]
+
+        assert users.users["u1"]["profile_image"]["sizes"] == ["small"]
+        assert store.path("u1", users.users["u1"]["profile_image"], "small")
+        assert "profile_image" not in users.users["u2"]
+        assert users.users["u2"][LEGACY_IMAGE_FIELD] == "https://example.com/avatar.jpg"
+        assert users.users["u3"][LEGACY_IMAGE_FIELD] == bmp, "Original bytes must survive"
+
+        # A second start has nothing left to retry
+        assert asyncio.run(migrate_inline_images(users, store)) == (0, [])
+        print("✓ Unreadable inline images kept under the legacy field")
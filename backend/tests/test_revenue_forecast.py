@@ -0,0 +1,80 @@
+"""
+Revenue Forecast Spreading Tests
+Tests for:
+- Payment schedule weights (monthly, quarterly, upfront, milestone 30/40/30)
+- Spreading deal values into the forecast window, including deals running past it
+Pure numpy/pandas; no server needed.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from revenue_forecast import SCHEDULES, schedule_weights, spread  # noqa: E402
+
+MONTHLY, QUARTERLY, UPFRONT, MILESTONE = (SCHEDULES.index(name) for name in
+                                          ("monthly", "quarterly", "upfront", "milestone"))
+
+
+def weights(schedule, duration):
+    return schedule_weights(np.array([schedule]), np.array([duration]))[0]
+
+
+class TestScheduleWeights:
+    """schedule_weights"""
+
+    def test_quarterly_pays_at_quarter_starts(self):
+        np.testing.assert_allclose(weights(QUARTERLY, 7), [1 / 3, 0, 0, 1 / 3, 0, 0, 1 / 3])
+        np.testing.assert_allclose(weights(QUARTERLY, 2), [1, 0])
+        print("✓ Quarterly plans split evenly across quarter starts")
+
+    def test_milestone_split(self):
+        np.testing.assert_allclose(weights(MILESTONE, 5), [0.3, 0, 0.4, 0, 0.3])
+        np.testing.assert_allclose(weights(MILESTONE, 2), [0.3, 0.7])
+        np.testing.assert_allclose(weights(MILESTONE, 1), [1.0])
+        print("✓ Milestone plans pay 30/40/30 at start, mid-point and end")
+
+    def test_mixed_rows_padded_to_longest_duration(self):
+        result = schedule_weights(np.array([MONTHLY, UPFRONT, QUARTERLY]), np.array([4, 3, 6]))
+        assert result.shape == (3, 6)
+        np.testing.assert_allclose(result.sum(axis=1), 1.0)
+        np.testing.assert_allclose(result[0], [0.25] * 4 + [0, 0])
+        np.testing.assert_allclose(result[1], [1, 0, 0, 0, 0, 0])
+        print("✓ Every row sums to 1 and stops at its own duration")
+
+
+class TestSpread:
+    """spread"""
+
+    FIRST = 2026 * 12  # 2026-01
+
+    def deals(self, *rows):
+        return pd.DataFrame(rows, columns=["start", "duration", "schedule"])
+
+    def test_deal_extending_past_window_is_cut_off(self):
+        deals = self.deals((self.FIRST + 10, 6, MONTHLY))
+        result = spread(deals, self.FIRST, 12, np.array([600.0]))
+        assert len(result) == 12
+        np.testing.assert_allclose(result[10:], [100, 100])
+        assert result[:10].sum() == 0
+        print("✓ Only the months inside the window are counted")
+
+    def test_deal_started_before_window(self):
+        deals = self.deals((self.FIRST - 3, 6, QUARTERLY))
+        result = spread(deals, self.FIRST, 12, np.array([900.0]))
+        np.testing.assert_allclose(result[0], 450)
+        assert result.sum() == 450, "The first quarter was paid before the window"
+        print("✓ Payments before the window are dropped")
+
+    def test_deals_summed_per_month(self):
+        deals = self.deals((self.FIRST, 5, MILESTONE), (self.FIRST + 2, 1, UPFRONT))
+        result = spread(deals, self.FIRST, 6, np.array([1000.0, 50.0]))
+        np.testing.assert_allclose(result, [300, 0, 450, 0, 300, 0])
+        print("✓ Deals landing in the same month add up")
+
+    def test_no_deals(self):
+        np.testing.assert_array_equal(spread(self.deals(), self.FIRST, 3, np.array([])), np.zeros(3))
+        print("✓ Empty pipeline spreads to zeros")
@@ -0,0 +1,118 @@
+"""
+Role Permission Tests
+Tests for:
+- require_permission denying roles without the grant (403)
+- Permission changes applied as soon as PATCH /api/role-permissions/{role} returns
+"""
+import uuid
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+# Sales endpoints delivery roles may not write to
+SALES_CREATE_ENDPOINTS = ["/api/leads", "/api/pricing-plans", "/api/quotations", "/api/agreements"]
+
+
+def login(email, password):
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": password})
+    if response.status_code != 200:
+        pytest.skip(f"Authentication failed for {email}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def register(role):
+    email = f"test_perm_{role}_{uuid.uuid4().hex[:8]}@company.com"
+    response = requests.post(f"{BASE_URL}/api/auth/register", json={
+        "email": email,
+        "password": "password123",
+        "full_name": f"TEST Permission {role}",
+        "role": role
+    })
+    assert response.status_code == 200, f"Failed to register {role}: {response.text}"
+    return login(email, "password123")
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    return login("admin@company.com", "admin123")
+
+
+@pytest.fixture(scope="module")
+def consultant_headers():
+    return register("consultant")
+
+
+@pytest.fixture(scope="module")
+def delivery_headers(consultant_headers):
+    """Consultant, project manager and principal consultant"""
+    return {
+        "consultant": consultant_headers,
+        "project_manager": register("project_manager"),
+        "principal_consultant": register("principal_consultant")
+    }
+
+
+@pytest.fixture
+def restore_consultant_permissions(admin_headers):
+    """Put the consultant role's permissions back after a test changes them"""
+    original = requests.get(f"{BASE_URL}/api/role-permissions/consultant", headers=admin_headers).json()
+    yield original
+    requests.patch(f"{BASE_URL}/api/role-permissions/consultant", json=original, headers=admin_headers)
+
+
+class TestPermissionDenied:
+    """Roles without a create grant get 403 before the request is processed"""
+
+    @pytest.mark.parametrize("endpoint", SALES_CREATE_ENDPOINTS)
+    def test_delivery_roles_cannot_create_sales_records(self, delivery_headers, endpoint):
+        for role, headers in delivery_headers.items():
+            response = requests.post(f"{BASE_URL}{endpoint}", json={}, headers=headers)
+            assert response.status_code == 403, f"{role} should not POST {endpoint}"
+            assert "permission" in response.json()["detail"]
+        print(f"✓ POST {endpoint} denied for {', '.join(delivery_headers)}")
+
+
+class TestPermissionUpdates:
+    """PATCH /api/role-permissions/{role} invalidates the cached table"""
+
+    def test_grant_and_revoke_take_effect_immediately(
+        self, admin_headers, consultant_headers, restore_consultant_permissions
+    ):
+        lead = {"first_name": "Perm", "last_name": f"TEST{uuid.uuid4().hex[:6]}", "company": "Permission Test Co"}
+        response = requests.post(f"{BASE_URL}/api/leads", json=lead, headers=consultant_headers)
+        assert response.status_code == 403
+
+        granted = {
+            **restore_consultant_permissions,
+            "leads": {**restore_consultant_permissions["leads"], "create": True}
+        }
+        response = requests.patch(f"{BASE_URL}/api/role-permissions/consultant", json=granted, headers=admin_headers)
+        assert response.status_code == 200
+        response = requests.post(f"{BASE_URL}/api/leads", json=lead, headers=consultant_headers)
+        assert response.status_code == 200, f"Grant not applied: {response.text}"
+
+        response = requests.patch(
+            f"{BASE_URL}/api/role-permissions/consultant", json=restore_consultant_permissions, headers=admin_headers
+        )
+        assert response.status_code == 200
+        response = requests.post(f"{BASE_URL}/api/leads", json=lead, headers=consultant_headers)
+        assert response.status_code == 403, "Revoked permission still cached"
+        print("✓ Permission grant and revoke applied without waiting for the cache TTL")
+
+    @pytest.mark.parametrize("body", [
+        {"users": "all"},
+        {"users": ["manage_roles"]},
+        {"leads": {"create": "sometimes"}},
+        ["leads"]
+    ])
+    def test_malformed_permissions_rejected(self, admin_headers, restore_consultant_permissions, body):
+        """Module entries must map actions to booleans; the stored table is left untouched"""
+        for role in ("admin", "consultant"):
+            response = requests.patch(f"{BASE_URL}/api/role-permissions/{role}", json=body, headers=admin_headers)
+            assert response.status_code == 422, f"{role} accepted {body}: {response.text}"
+
+        current = requests.get(f"{BASE_URL}/api/role-permissions/consultant", headers=admin_headers).json()
+        assert current == restore_consultant_permissions
+        print(f"✓ Malformed permissions {body} rejected with 422")
@@ -4,9 +4,11 @@ Backend tests for Sales Funnel functionality:
 - Authentication with Manager role
 - Currency in INR (₹)
 """
+import uuid
 import pytest
 import requests
 import os
+from datetime import datetime, timedelta, timezone
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://consult-pro-129.preview.emergentagent.com').rstrip('/')
 
@@ -210,6 +212,21 @@ class TestManagerApprovals:
             assert item["agreement"]["status"] == "pending_approval"
             print(f"✓ Pending approval: {item['agreement']['agreement_number']}")
 
+    def test_pending_approvals_paginated_oldest_first(self, manager_token):
+        """Pending approvals honour limit, report X-Total-Count and come oldest first"""
+        response = requests.get(
+            f"{BASE_URL}/api/agreements/pending-approval",
+            params={"limit": 2},
+            headers={"Authorization": f"Bearer {manager_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) <= 2
+        assert int(response.headers["X-Total-Count"]) >= len(data)
+        created = [item["agreement"]["created_at"] for item in data]
+        assert created == sorted(created)
+        print(f"✓ {response.headers['X-Total-Count']} agreements pending approval")
+
     def test_pending_approvals_denied_for_executive(self, executive_token):
         """Test executive cannot access pending approvals"""
         response = requests.get(
@@ -290,6 +307,29 @@ class TestLeads:
         assert isinstance(data, list)
         print(f"✓ Retrieved {len(data)} leads")
 
+    def test_update_lead_with_stale_etag_rejected(self, admin_token):
+        """PUT /api/leads/{id} with an outdated If-Match returns 412"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        lead = requests.post(f"{BASE_URL}/api/leads", headers=headers, json={
+            "first_name": "TEST_ETag",
+            "last_name": "Lead",
+            "company": "ETag Test Company"
+        }).json()
+
+        response = requests.get(f"{BASE_URL}/api/leads/{lead['id']}", headers=headers)
+        etag = response.headers["ETag"]
+
+        response = requests.put(f"{BASE_URL}/api/leads/{lead['id']}", headers={**headers, "If-Match": etag},
+                                json={"job_title": "CEO"})
+        assert response.status_code == 200
+        assert response.json()["lead_score"] > lead["lead_score"], "Score should be recomputed"
+        assert response.headers["ETag"] != etag
+
+        response = requests.put(f"{BASE_URL}/api/leads/{lead['id']}", headers={**headers, "If-Match": etag},
+                                json={"job_title": "Intern"})
+        assert response.status_code == 412
+        print("✓ Stale lead write rejected with 412")
+
 
 class TestDashboardStats:
     """Dashboard stats endpoint tests"""
@@ -307,5 +347,114 @@ class TestDashboardStats:
         print(f"✓ Dashboard stats: {data['total_leads']} leads, {data['active_projects']} projects")
 
 
+class TestFunnelReport:
+    """Status history and funnel rollups"""
+
+    def test_status_changes_reach_funnel(self, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        source = f"TEST_funnel_{uuid.uuid4().hex[:8]}"
+        response = requests.post(f"{BASE_URL}/api/leads", headers=headers, json={
+            "first_name": "Funnel",
+            "last_name": "TEST_Report",
+            "company": "Funnel Test Co",
+            "lead_source": source
+        })
+        assert response.status_code == 200
+        lead_id = response.json()["id"]
+        for status in ("contacted", "qualified", "qualified", "lost"):
+            response = requests.put(f"{BASE_URL}/api/leads/{lead_id}", headers=headers, json={"status": status})
+            assert response.status_code == 200
+
+        response = requests.post(f"{BASE_URL}/api/reports/sales-funnel/refresh", headers=headers)
+        assert response.status_code == 200
+        # Recent days are rebuilt, but the watermark stays behind the lag for late writes
+        watermark = datetime.fromisoformat(response.json()["watermark"])
+        assert watermark < datetime.now(timezone.utc) - timedelta(minutes=1)
+
+        response = requests.get(f"{BASE_URL}/api/reports/sales-funnel", params={"lead_source": source}, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        stages = {stage["stage"]: stage for stage in data["stages"]}
+        assert stages["new"]["entered"] == 1 and stages["new"]["conversion_rate"] == 1.0
+        assert stages["qualified"]["entered"] == 1, "Re-saving the same status is not a transition"
+        assert stages["qualified"]["loss_rate"] == 1.0
+        assert stages["contacted"]["median_days_in_stage"] is not None
+        assert data["lost"] == 1 and data["win_rate"] == 0.0
+        print(f"✓ Funnel for {source}: {[(s, stages[s]['entered']) for s in stages]}")
+
+    def test_funnel_grouped_by_owner(self, admin_token):
+        response = requests.get(
+            f"{BASE_URL}/api/reports/sales-funnel",
+            params={"group_by": "owner"},
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 200
+        for group in response.json()["groups"]:
+            assert "label" in group and "stages" in group
+        print(f"✓ Funnel grouped into {len(response.json()['groups'])} owners")
+
+    def test_refresh_admin_only(self, executive_token):
+        response = requests.post(
+            f"{BASE_URL}/api/reports/sales-funnel/refresh",
+            headers={"Authorization": f"Bearer {executive_token}"}
+        )
+        assert response.status_code == 403
+        print("✓ Funnel refresh restricted to admins")
+
+
+class TestRevenueForecast:
+    """GET /api/reports/revenue-forecast"""
+
+    def test_forecast_shape(self, manager_token):
+        response = requests.get(
+            f"{BASE_URL}/api/reports/revenue-forecast",
+            params={"from_month": "2026-01", "months": 6},
+            headers={"Authorization": f"Bearer {manager_token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [m["month"] for m in data["months"]] == [f"2026-0{i}" for i in range(1, 7)]
+        for month in data["months"]:
+            assert month["expected"] == round(month["committed"] + month["weighted_pipeline"], 2)
+        print(f"✓ Forecast totals: {data['totals']}")
+
+    def test_new_quotation_enters_pipeline(self, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        before = requests.get(f"{BASE_URL}/api/reports/revenue-forecast", headers=headers).json()
+
+        lead = requests.post(f"{BASE_URL}/api/leads", headers=headers, json={
+            "first_name": "Forecast",
+            "last_name": "TEST_Revenue",
+            "company": f"Forecast {uuid.uuid4().hex[:6]} Co"
+        }).json()
+        plan = requests.post(f"{BASE_URL}/api/pricing-plans", headers=headers, json={
+            "lead_id": lead["id"],
+            "project_duration_type": "quarterly",
+            "project_duration_months": 3,
+            "payment_schedule": "monthly",
+            "consultants": [{"consultant_type": "lead", "count": 1, "meetings": 6}]
+        }).json()
+        response = requests.post(f"{BASE_URL}/api/quotations", headers=headers, json={
+            "pricing_plan_id": plan["id"],
+            "lead_id": lead["id"]
+        })
+        assert response.status_code == 200
+        grand_total = response.json()["grand_total"]
+
+        after = requests.get(f"{BASE_URL}/api/reports/revenue-forecast", headers=headers).json()
+        assert after["pipeline_deals"] == before["pipeline_deals"] + 1
+        added = after["totals"]["unweighted_pipeline"] - before["totals"]["unweighted_pipeline"]
+        assert abs(added - grand_total) < 1, "A 3-month quotation falls entirely inside the 12-month window"
+        print(f"✓ Draft quotation of ₹{grand_total:,.2f} added to the pipeline")
+
+    def test_forecast_restricted(self, executive_token):
+        response = requests.get(
+            f"{BASE_URL}/api/reports/revenue-forecast",
+            headers={"Authorization": f"Bearer {executive_token}"}
+        )
+        assert response.status_code == 403
+        print("✓ Revenue forecast restricted to admins and managers")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -237,6 +237,31 @@ class TestSOWCreationAndManagement:
         return sow_id, data.get("item_id")
 
 
+class TestSOWPendingApproval:
+    """Test SOW approval inbox"""
+    
+    def test_pending_approval_route_not_shadowed(self, admin_client):
+        """GET /api/sow/pending-approval is not captured by /sow/{sow_id}"""
+        response = admin_client.get(f"{BASE_URL}/api/sow/pending-approval", params={"limit": 5})
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
+        
+        data = response.json()
+        assert isinstance(data, list)
+        assert len(data) <= 5
+        assert int(response.headers["X-Total-Count"]) >= len(data)
+        for sow in data:
+            assert "version_history" not in sow
+            assert sow["pending_items_count"] == len(
+                [i for i in sow.get("items", []) if i.get("status") == "pending_review"]
+            )
+        print(f"SOWs pending approval: {response.headers['X-Total-Count']}")
+    
+    def test_pending_approval_requires_manager(self, executive_client):
+        """Executives cannot view the approval inbox"""
+        response = executive_client.get(f"{BASE_URL}/api/sow/pending-approval")
+        assert response.status_code == 403
+
+
 class TestKickoffMeeting:
     """Test Kick-off Meeting Scheduling"""
     
@@ -279,6 +304,27 @@ class TestKickoffMeeting:
         
         return data
     
+    def test_kickoff_meetings_paginated_and_filtered(self, admin_client):
+        """GET /api/kickoff-meetings honours limit, date range and reports X-Total-Count"""
+        response = admin_client.get(f"{BASE_URL}/api/kickoff-meetings", params={"limit": 1})
+        assert response.status_code == 200
+        data = response.json()
+        assert isinstance(data, list)
+        assert len(data) <= 1
+        total = int(response.headers["X-Total-Count"])
+        assert total >= len(data)
+        if data:
+            assert "project" in data[0] and "agreement" in data[0]
+        
+        response = admin_client.get(
+            f"{BASE_URL}/api/kickoff-meetings",
+            params={"date_from": "2000-01-01T00:00:00", "date_to": "2000-12-31T00:00:00"}
+        )
+        assert response.status_code == 200
+        assert response.json() == []
+        assert response.headers["X-Total-Count"] == "0"
+        print(f"Kickoff meetings total: {total}")
+    
     def test_schedule_kickoff_meeting(self, admin_client, test_project_with_agreement, consultants):
         """POST /api/kickoff-meetings schedules meeting and freezes SOW"""
         project_id = test_project_with_agreement['id']
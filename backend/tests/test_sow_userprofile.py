@@ -365,6 +365,39 @@ class TestUserProfileAPIs:
         assert "already in use" in response.json().get('detail', '').lower()
         print("✓ Duplicate email prevented correctly")
 
+    def test_profile_image_upload_and_thumbnails(self):
+        """Test POST /api/users/me/profile-image stores a reference, not the image"""
+        png = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+        response = requests.post(f"{BASE_URL}/api/users/me/profile-image", headers=self.headers, json={
+            "file_data": f"data:image/png;base64,{png}"
+        })
+        assert response.status_code == 200, f"Failed to upload image: {response.text}"
+        result = response.json()
+        assert set(result['urls']) == {'small', 'medium', 'original'}
+
+        profile = requests.get(f"{BASE_URL}/api/users/me", headers=self.headers).json()
+        assert isinstance(profile['profile_image'], dict), "User should only hold a reference"
+        assert profile['profile_image']['version'] == result['profile_image']['version']
+
+        thumb = requests.get(f"{BASE_URL}{result['urls']['small']}", headers=self.headers)
+        assert thumb.status_code == 200
+        assert thumb.headers['content-type'] == "image/png"
+        print(f"✓ Profile image stored, version {result['profile_image']['version']}")
+
+        response = requests.delete(f"{BASE_URL}/api/users/me/profile-image", headers=self.headers)
+        assert response.status_code == 200
+        response = requests.get(f"{BASE_URL}/api/users/{self.user_id}/profile-image", headers=self.headers)
+        assert response.status_code == 404
+        print("✓ Profile image removed")
+
+    def test_profile_image_rejects_non_images(self):
+        """Test that non-image uploads are rejected"""
+        response = requests.post(f"{BASE_URL}/api/users/me/profile-image", headers=self.headers, json={
+            "file_data": "aGVsbG8gd29ybGQ="
+        })
+        assert response.status_code == 400
+        print("✓ Non-image upload rejected")
+
 
 class TestAgreementExportWithSOW:
     """Test Agreement Export includes SOW in tabular format"""
@@ -0,0 +1,344 @@
+"""
+Task Scheduling Tests
+Tests for:
+- Bulk task reorder (single bulk write, project validation)
+- Fractional move of a single task between neighbours
+- Critical path, slack and progress roll-up for a project schedule
+- Propagating date changes to dependent tasks
+- If-Match / ETag preconditions on task updates
+"""
+import pytest
+import requests
+import os
+from datetime import datetime, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def auth_header():
+    """Get admin auth header"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "admin@company.com",
+        "password": "admin123"
+    })
+    if response.status_code != 200:
+        pytest.skip("Admin authentication failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="module")
+def project(auth_header):
+    """Create a dedicated project so task ordering is predictable"""
+    response = requests.post(f"{BASE_URL}/api/projects", json={
+        "name": "TEST_Scheduling Project",
+        "client_name": "TEST Client",
+        "start_date": datetime.now().isoformat(),
+        "end_date": (datetime.now() + timedelta(days=90)).isoformat()
+    }, headers=auth_header)
+    assert response.status_code == 200, f"Failed to create project: {response.text}"
+    return response.json()
+
+
+def create_task(auth_header, project, title, **extra):
+    response = requests.post(f"{BASE_URL}/api/tasks", json={
+        "project_id": project["id"],
+        "title": title,
+        **extra
+    }, headers=auth_header)
+    assert response.status_code == 200, f"Failed to create task: {response.text}"
+    return response.json()
+
+
+class TestTaskReorder:
+    """Bulk reorder and single-task move"""
+
+    @pytest.fixture(scope="class")
+    def tasks(self, auth_header, project):
+        return [create_task(auth_header, project, f"TEST_Order {i}", order=i) for i in range(3)]
+
+    def test_reorder_route_not_shadowed(self, auth_header, project, tasks):
+        """PATCH /api/tasks/reorder reaches the reorder handler"""
+        payload = [{"id": t["id"], "order": 2 - i} for i, t in enumerate(tasks)]
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/reorder",
+            params={"project_id": project["id"]},
+            json=payload,
+            headers=auth_header
+        )
+        assert response.status_code == 200, f"Reorder failed: {response.text}"
+        assert response.json()["updated_count"] == 3
+
+        ordered = requests.get(
+            f"{BASE_URL}/api/tasks", params={"project_id": project["id"]}, headers=auth_header
+        ).json()
+        assert [t["id"] for t in ordered] == [t["id"] for t in reversed(tasks)]
+        print("✓ Tasks reordered in one request")
+
+    def test_reorder_rejects_unknown_task(self, auth_header, project):
+        """Unknown task IDs fail validation and nothing is written"""
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/reorder",
+            json=[{"id": "does-not-exist", "order": 1}],
+            headers=auth_header
+        )
+        assert response.status_code == 404
+        print("✓ Unknown task rejected")
+
+    def test_reorder_rejects_wrong_project(self, auth_header, tasks):
+        """Tasks must belong to the project given in the query"""
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/reorder",
+            params={"project_id": "another-project"},
+            json=[{"id": tasks[0]["id"], "order": 5}],
+            headers=auth_header
+        )
+        assert response.status_code == 400
+        print("✓ Cross-project reorder rejected")
+
+    def test_move_between_neighbours(self, auth_header, project, tasks):
+        """PATCH /api/tasks/{id}/move only rewrites the moved task"""
+        ordered = requests.get(
+            f"{BASE_URL}/api/tasks", params={"project_id": project["id"]}, headers=auth_header
+        ).json()
+        first, second, third = ordered[0], ordered[1], ordered[2]
+
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{third['id']}/move",
+            json={"after_task_id": first["id"], "before_task_id": second["id"]},
+            headers=auth_header
+        )
+        assert response.status_code == 200, f"Move failed: {response.text}"
+        assert first["order"] < response.json()["order"] < second["order"]
+
+        reordered = requests.get(
+            f"{BASE_URL}/api/tasks", params={"project_id": project["id"]}, headers=auth_header
+        ).json()
+        assert [t["id"] for t in reordered] == [first["id"], third["id"], second["id"]]
+        print(f"✓ Task moved to order {response.json()['order']}")
+
+    def test_move_requires_neighbour(self, auth_header, tasks):
+        """A move without any neighbour is rejected"""
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{tasks[0]['id']}/move", json={}, headers=auth_header
+        )
+        assert response.status_code == 400
+        print("✓ Move without neighbours rejected")
+
+    def test_move_next_to_itself_rejected(self, auth_header, tasks):
+        """A task used as its own neighbour is a client error, not a server error"""
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{tasks[0]['id']}/move",
+            json={"after_task_id": tasks[0]["id"]},
+            headers=auth_header
+        )
+        assert response.status_code == 400
+        print("✓ Move next to itself rejected")
+
+
+class TestProjectSchedule:
+    """Critical path computation over task dependencies"""
+
+    @pytest.fixture(scope="class")
+    def chain(self, auth_header, project):
+        """design -> (build | docs) -> launch, where build is the long branch"""
+        design = create_task(auth_header, project, "TEST_Design", estimated_hours=16, status="completed")
+        build = create_task(auth_header, project, "TEST_Build", estimated_hours=40, dependencies=[design["id"]])
+        docs = create_task(auth_header, project, "TEST_Docs", estimated_hours=8, dependencies=[design["id"]])
+        launch = create_task(auth_header, project, "TEST_Launch", estimated_hours=8,
+                             dependencies=[build["id"], docs["id"]])
+        return {"design": design, "build": build, "docs": docs, "launch": launch}
+
+    def test_critical_path_follows_longest_branch(self, auth_header, project, chain):
+        """GET /api/projects/{id}/schedule marks the longest chain as critical"""
+        response = requests.get(f"{BASE_URL}/api/projects/{project['id']}/schedule", headers=auth_header)
+        assert response.status_code == 200, f"Schedule failed: {response.text}"
+        data = response.json()
+
+        critical = data["critical_path"]
+        assert critical.index(chain["design"]["id"]) < critical.index(chain["build"]["id"]) \
+            < critical.index(chain["launch"]["id"])
+        assert chain["docs"]["id"] not in critical
+        assert data["tasks"][chain["docs"]["id"]]["slack_days"] == 4
+        assert 0 < data["progress"] < 100
+        print(f"✓ Critical path of {len(critical)} tasks, {data['duration_days']} days")
+
+    def test_critical_only_trims_payload(self, auth_header, project, chain):
+        """critical_only=true returns just the critical tasks"""
+        response = requests.get(
+            f"{BASE_URL}/api/projects/{project['id']}/schedule",
+            params={"critical_only": True},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["tasks"]) == set(data["critical_path"])
+        print("✓ Only critical tasks returned")
+
+    def test_gantt_includes_critical_flags(self, auth_header, project, chain):
+        """Gantt rows carry is_critical and slack_days"""
+        response = requests.get(f"{BASE_URL}/api/projects/{project['id']}/tasks-gantt", headers=auth_header)
+        assert response.status_code == 200
+        rows = {row["id"]: row for row in response.json()}
+        assert rows[chain["build"]["id"]]["is_critical"] is True
+        assert rows[chain["docs"]["id"]]["is_critical"] is False
+        assert rows[chain["design"]["id"]]["progress"] == 100
+        print("✓ Gantt data highlights the critical path")
+
+    def test_schedule_refreshes_after_task_write(self, auth_header, project, chain):
+        """Updating a task invalidates the cached schedule"""
+        requests.get(f"{BASE_URL}/api/projects/{project['id']}/schedule", headers=auth_header)
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{chain['docs']['id']}",
+            json={"estimated_hours": 80},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+
+        data = requests.get(f"{BASE_URL}/api/projects/{project['id']}/schedule", headers=auth_header).json()
+        assert chain["docs"]["id"] in data["critical_path"]
+        assert chain["build"]["id"] not in data["critical_path"]
+        print("✓ Schedule recomputed after update")
+
+    def test_schedule_refreshes_after_start_date_change(self, auth_header, project, chain):
+        """Moving the project start invalidates the cached schedule"""
+        requests.get(f"{BASE_URL}/api/projects/{project['id']}/schedule", headers=auth_header)
+        new_start = datetime(2020, 1, 6)
+        response = requests.patch(
+            f"{BASE_URL}/api/projects/{project['id']}/update-start-date",
+            params={"new_start_date": new_start.isoformat()},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        try:
+            data = requests.get(f"{BASE_URL}/api/projects/{project['id']}/schedule", headers=auth_header).json()
+            assert data["project_start"].startswith("2020-01-06")
+        finally:
+            requests.patch(
+                f"{BASE_URL}/api/projects/{project['id']}/update-start-date",
+                params={"new_start_date": project["start_date"]},
+                headers=auth_header
+            )
+        print("✓ Schedule recomputed after start date change")
+
+    def test_unknown_project(self, auth_header):
+        """Schedule for a missing project returns 404"""
+        response = requests.get(f"{BASE_URL}/api/projects/does-not-exist/schedule", headers=auth_header)
+        assert response.status_code == 404
+        print("✓ Unknown project rejected")
+
+
+class TestSchedulePropagation:
+    """Shifting dependents when a task's dates change"""
+
+    @pytest.fixture
+    def pair(self, auth_header, project):
+        start = datetime(2030, 1, 1)
+        first = create_task(auth_header, project, "TEST_Prerequisite",
+                            start_date=start.isoformat(), due_date=(start + timedelta(days=5)).isoformat())
+        second = create_task(auth_header, project, "TEST_Dependent",
+                             start_date=(start + timedelta(days=5)).isoformat(),
+                             due_date=(start + timedelta(days=8)).isoformat(),
+                             dependencies=[first["id"]])
+        return first, second
+
+    def test_due_date_change_shifts_dependent(self, auth_header, pair):
+        """Moving a due date later pushes the dependent and keeps its duration"""
+        first, second = pair
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{first['id']}",
+            json={"due_date": datetime(2030, 1, 10).isoformat()},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        assert response.json()["shifted_tasks"] == 1
+
+        dependent = requests.get(f"{BASE_URL}/api/tasks/{second['id']}", headers=auth_header).json()
+        assert dependent["start_date"].startswith("2030-01-10")
+        assert dependent["due_date"].startswith("2030-01-13")
+        print("✓ Dependent shifted by five days")
+
+    def test_dry_run_returns_diff_without_writing(self, auth_header, pair):
+        """POST /api/tasks/{id}/propagate?dry_run=true leaves tasks untouched"""
+        first, second = pair
+        # Pull the dependent earlier so it overlaps its prerequisite (propagation only pushes later)
+        requests.patch(
+            f"{BASE_URL}/api/tasks/{second['id']}",
+            json={"start_date": datetime(2030, 1, 2).isoformat()},
+            headers=auth_header
+        )
+        response = requests.post(
+            f"{BASE_URL}/api/tasks/{first['id']}/propagate",
+            params={"dry_run": True},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["dry_run"] is True
+        assert [c["task_id"] for c in data["changes"]] == [second["id"]]
+
+        dependent = requests.get(f"{BASE_URL}/api/tasks/{second['id']}", headers=auth_header).json()
+        assert dependent["start_date"].startswith("2030-01-02")
+        print("✓ Dry run reported the shift without applying it")
+
+    def test_new_dependency_moves_task_and_dependents(self, auth_header, project, pair):
+        """Adding a prerequisite moves the edited task after it, then its own dependents"""
+        first, _ = pair
+        task = create_task(auth_header, project, "TEST_Late joiner",
+                           start_date=datetime(2030, 1, 2).isoformat(), due_date=datetime(2030, 1, 4).isoformat())
+        follower = create_task(auth_header, project, "TEST_Follower",
+                               start_date=datetime(2030, 1, 4).isoformat(), due_date=datetime(2030, 1, 5).isoformat(),
+                               dependencies=[task["id"]])
+
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{task['id']}",
+            json={"dependencies": [first["id"]]},
+            headers=auth_header
+        )
+        assert response.status_code == 200
+        assert response.json()["shifted_tasks"] == 2
+
+        moved = requests.get(f"{BASE_URL}/api/tasks/{task['id']}", headers=auth_header).json()
+        assert moved["start_date"].startswith("2030-01-06")
+        assert moved["due_date"].startswith("2030-01-08")
+        follower = requests.get(f"{BASE_URL}/api/tasks/{follower['id']}", headers=auth_header).json()
+        assert follower["start_date"].startswith("2030-01-08")
+        print("✓ Edited task moved after its new prerequisite and its dependent followed")
+
+    def test_cycle_rejected(self, auth_header, pair):
+        """Making the prerequisite depend on its dependent is rejected"""
+        first, second = pair
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{first['id']}",
+            json={"dependencies": [second["id"]]},
+            headers=auth_header
+        )
+        assert response.status_code == 400
+        print("✓ Dependency cycle rejected")
+
+
+class TestTaskPreconditions:
+    """ETag / If-Match on PATCH /api/tasks/{id}"""
+
+    def test_stale_if_match_rejected(self, auth_header, project):
+        task = create_task(auth_header, project, "TEST_ETag task")
+        etag = requests.get(f"{BASE_URL}/api/tasks/{task['id']}", headers=auth_header).headers["ETag"]
+
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{task['id']}",
+            json={"title": "TEST_ETag task renamed"},
+            headers={**auth_header, "If-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        response = requests.patch(
+            f"{BASE_URL}/api/tasks/{task['id']}",
+            json={"title": "TEST_ETag lost update"},
+            headers={**auth_header, "If-Match": etag}
+        )
+        assert response.status_code == 412
+
+        current = requests.get(f"{BASE_URL}/api/tasks/{task['id']}", headers=auth_header).json()
+        assert current["title"] == "TEST_ETag task renamed"
+        print("✓ Stale task write rejected with 412")
@@ -0,0 +1,60 @@
+import hashlib
+import time
+from typing import Dict, Optional
+
+from ttl_cache import TTLCache
+
+def token_key(token: str) -> str:
+    """Tokens are never stored as-is; cache and revocation entries use their SHA-256"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class TokenClaimsCache:
+    """
+    Verified JWT claims keyed by token hash, so a token's signature is checked once
+    and later requests are a dict lookup. Entries expire with the token's `exp`.
+
+    Also holds the revocation set consulted on every request (cached or not):
+    single tokens revoked at logout, and subjects whose tokens issued up to a
+    point in time are invalid (e.g. after a role change).
+    """
+
+    def __init__(self, max_entries: Optional[int] = 10000):
+        self._claims = TTLCache(ttl_seconds=0, max_entries=max_entries)
+        self._revoked_tokens: Dict[str, float] = {}    # token hash -> exp
+        self._revoked_subjects: Dict[str, float] = {}  # sub -> revoked at (epoch seconds)
+
+    def get(self, token: str) -> Optional[dict]:
+        return self._claims.get(token_key(token))
+
+    def put(self, token: str, claims: dict):
+        ttl = claims.get('exp', 0) - time.time()
+        if ttl > 0:
+            self._claims.set(token_key(token), claims, ttl_seconds=ttl)
+
+    def is_revoked(self, token: str, claims: dict) -> bool:
+        if self._revoked_tokens and token_key(token) in self._revoked_tokens:
+            return True
+        revoked_at = self._revoked_subjects.get(claims.get('sub'))
+        return revoked_at is not None and claims.get('iat', 0) <= revoked_at
+
+    def revoke_token(self, token: str, expires_at: float) -> str:
+        key = token_key(token)
+        self._revoked_tokens[key] = expires_at
+        self._claims.pop(key)
+        return key
+
+    def revoke_subject(self, subject: str, revoked_at: Optional[float] = None) -> float:
+        revoked_at = revoked_at if revoked_at is not None else time.time()
+        self._revoked_subjects[subject] = max(revoked_at, self._revoked_subjects.get(subject, 0))
+        return revoked_at
+
+    def merge_revocations(self, tokens: Dict[str, float], subjects: Dict[str, float]):
+        """Merge in revocations made by other workers (from the database) and drop expired tokens"""
+        now = time.time()
+        merged = {**self._revoked_tokens, **tokens}
+        self._revoked_tokens = {key: exp for key, exp in merged.items() if exp > now}
+        for subject, revoked_at in subjects.items():
+            self._revoked_subjects[subject] = max(revoked_at, self._revoked_subjects.get(subject, 0))
+
+    def __len__(self) -> int:
+        return len(self._claims)
@@ -0,0 +1,65 @@
+from typing import Dict, Iterable, Optional
+from ttl_cache import TTLCache
+
+# Fields kept per user; anything heavier (profile image, password hash) stays in Mongo
+USER_DISPLAY_FIELDS = {"_id": 0, "id": 1, "full_name": 1, "email": 1}
+
+class UserDirectoryCache:
+    """
+    Process-wide user ID -> display info cache used to enrich documents with names.
+
+    Lookups for IDs that are not cached (or have expired) are batched into a single
+    `$in` query. Unknown IDs are cached as misses so repeated enrichment of deleted
+    users does not hit the database either.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: Optional[int] = 20000):
+        self._cache = TTLCache(ttl_seconds, max_entries)
+
+    async def get_many(self, users_collection, user_ids: Iterable[Optional[str]]) -> Dict[str, dict]:
+        """Return {user_id: {"id", "full_name", "email"}} for every known ID"""
+        wanted = list(dict.fromkeys(uid for uid in user_ids if uid))
+
+        result = {}
+        missing = []
+        for uid in wanted:
+            entry = self._cache.get(uid, False)
+            if entry is False:
+                missing.append(uid)
+            elif entry is not None:
+                result[uid] = entry
+
+        if missing:
+            docs = await users_collection.find(
+                {"id": {"$in": missing}},
+                USER_DISPLAY_FIELDS
+            ).to_list(len(missing))
+            found = {doc['id']: doc for doc in docs}
+            for uid in missing:
+                entry = found.get(uid)
+                self._cache.set(uid, entry)
+                if entry is not None:
+                    result[uid] = entry
+
+        return result
+
+    async def get_names(
+        self,
+        users_collection,
+        user_ids: Iterable[Optional[str]],
+        default: str = "Unknown"
+    ) -> Dict[str, str]:
+        """Return {user_id: full_name}, falling back to `default` for unknown IDs"""
+        wanted = list(user_ids)
+        users = await self.get_many(users_collection, wanted)
+        return {
+            uid: users[uid].get('full_name', default) if uid in users else default
+            for uid in wanted if uid
+        }
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user (after a profile update) or the whole cache"""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id)
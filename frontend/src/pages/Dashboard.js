@@ -48,8 +48,8 @@ const Dashboard = () => {
 
   const fetchPendingApprovals = async () => {
     try {
-      const response = await axios.get(`${API}/agreements/pending-approval`);
-      setPendingApprovalsCount(response.data.length);
+      const response = await axios.get(`${API}/agreements/pending-approval`, { params: { limit: 1 } });
+      setPendingApprovalsCount(Number(response.headers['x-total-count'] ?? response.data.length));
     } catch (error) {
       console.error('Failed to fetch pending approvals');
     }
@@ -9,13 +9,17 @@ import { ArrowLeft, CheckCircle, XCircle, Clock, FileCheck, AlertTriangle } from
 import { toast } from 'sonner';
 import { formatINR } from '../../utils/currency';
 
+const PAGE_SIZE = 100;
+
 const ManagerApprovals = () => {
   const { user } = useContext(AuthContext);
   const navigate = useNavigate();
   
   const [pendingApprovals, setPendingApprovals] = useState([]);
+  const [totalCount, setTotalCount] = useState(0);
   const [leads, setLeads] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [rejectDialogOpen, setRejectDialogOpen] = useState(false);
   const [selectedAgreement, setSelectedAgreement] = useState(null);
   const [rejectReason, setRejectReason] = useState('');
@@ -24,13 +28,24 @@ const ManagerApprovals = () => {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    // Everything loaded was approved or rejected but more are waiting
+    if (!loading && pendingApprovals.length === 0 && totalCount > 0) {
+      loadMore();
+    }
+  }, [pendingApprovals.length]);
+
+  const fetchApprovals = (skip) =>
+    axios.get(`${API}/agreements/pending-approval`, { params: { skip, limit: PAGE_SIZE } });
+
   const fetchData = async () => {
     try {
       const [approvalsRes, leadsRes] = await Promise.all([
-        axios.get(`${API}/agreements/pending-approval`),
+        fetchApprovals(0),
         axios.get(`${API}/leads`)
       ]);
       setPendingApprovals(approvalsRes.data);
+      setTotalCount(Number(approvalsRes.headers['x-total-count'] ?? approvalsRes.data.length));
       setLeads(leadsRes.data);
     } catch (error) {
       toast.error('Failed to fetch pending approvals');
@@ -39,11 +54,31 @@ const ManagerApprovals = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      // Approved/rejected cards are removed locally, so the loaded count is the next offset
+      const response = await fetchApprovals(pendingApprovals.length);
+      const loaded = new Set(pendingApprovals.map(item => item.agreement.id));
+      setPendingApprovals(prev => [...prev, ...response.data.filter(item => !loaded.has(item.agreement.id))]);
+      setTotalCount(Number(response.headers['x-total-count'] ?? totalCount));
+    } catch (error) {
+      toast.error('Failed to fetch more approvals');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const removeApproval = (agreementId) => {
+    setPendingApprovals(prev => prev.filter(item => item.agreement.id !== agreementId));
+    setTotalCount(count => Math.max(count - 1, 0));
+  };
+
   const handleApprove = async (agreementId) => {
     try {
       await axios.patch(`${API}/agreements/${agreementId}/approve`);
       toast.success('Agreement approved successfully');
-      fetchData();
+      removeApproval(agreementId);
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to approve agreement');
     }
@@ -65,8 +100,8 @@ const ManagerApprovals = () => {
       });
       toast.success('Agreement rejected');
       setRejectDialogOpen(false);
+      removeApproval(selectedAgreement.id);
       setSelectedAgreement(null);
-      fetchData();
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to reject agreement');
     }
@@ -112,7 +147,10 @@ const ManagerApprovals = () => {
           <h1 className="text-3xl font-semibold tracking-tight uppercase text-zinc-950 mb-2">
             Pending Approvals
           </h1>
-          <p className="text-zinc-500">Review and approve agreements submitted by sales team</p>
+          <p className="text-zinc-500">
+            Review and approve agreements submitted by sales team
+            {totalCount > 0 && ` · ${totalCount} pending`}
+          </p>
         </div>
       </div>
 
@@ -239,6 +277,22 @@ const ManagerApprovals = () => {
               </Card>
             );
           })}
+          {pendingApprovals.length < totalCount && (
+            <div className="flex items-center justify-center gap-4 pt-2">
+              <span className="text-sm text-zinc-500">
+                Showing {pendingApprovals.length} of {totalCount}
+              </span>
+              <Button
+                onClick={loadMore}
+                disabled={loadingMore}
+                data-testid="load-more-approvals-btn"
+                variant="outline"
+                className="rounded-sm border-zinc-200"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </div>
       )}
 
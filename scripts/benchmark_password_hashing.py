@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Measure event-loop lag during a burst of logins (bcrypt verifications).
+
+Compares calling passlib inline in the coroutine (the old login handler) with
+the thread-pool PasswordHasher used by the API. A ticker task sleeps 10ms in a
+loop; how late it wakes up is the latency every other request on the worker
+would see.
+
+Usage: python scripts/benchmark_password_hashing.py [--logins 50] [--rounds 12]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from password_hashing import PasswordHasher  # noqa: E402
+
+TICK_SECONDS = 0.01
+
+async def measure_lag(stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+async def run_storm(name: str, verify, logins: int):
+    stop = asyncio.Event()
+    samples = []
+    ticker = asyncio.create_task(measure_lag(stop, samples))
+    await asyncio.sleep(TICK_SECONDS * 5)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await ticker
+    samples.sort()
+    print(
+        f"{name:<10} {logins} logins in {elapsed:6.2f}s | loop lag ms: "
+        f"p50={statistics.median(samples):7.1f} "
+        f"p99={samples[int(len(samples) * 0.99) - 1]:7.1f} "
+        f"max={samples[-1]:7.1f}"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(rounds=args.rounds, max_workers=args.workers)
+    hashed = hasher.context.hash("benchmark-password")
+
+    async def inline_verify():
+        hasher.context.verify("benchmark-password", hashed)
+
+    async def pooled_verify():
+        await hasher.verify("benchmark-password", hashed)
+
+    await run_storm("inline", inline_verify, args.logins)
+    await run_storm("pooled", pooled_verify, args.logins)
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
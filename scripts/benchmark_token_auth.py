@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of per-request token validation cost.
+
+Compares a full HS256 `jwt.decode` (signature + claims check) with the
+TokenClaimsCache lookup used by get_user_from_token for tokens seen before,
+including the revocation check that runs on every request.
+
+Usage: python scripts/benchmark_token_auth.py [--tokens 2000] [--requests 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from jose import jwt  # noqa: E402
+from token_cache import TokenClaimsCache  # noqa: E402
+
+SECRET_KEY = "benchmark-secret"
+ALGORITHM = "HS256"
+
+def make_tokens(count: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        jwt.encode(
+            {"sub": f"user{i}@company.com", "exp": now + timedelta(days=30), "iat": now.timestamp()},
+            SECRET_KEY,
+            algorithm=ALGORITHM
+        )
+        for i in range(count)
+    ]
+
+def report(name: str, requests: int, elapsed: float):
+    print(f"{name:<14} {elapsed / requests * 1e6:8.2f} µs/request  ({requests / elapsed:,.0f} req/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    workload = [random.choice(tokens) for _ in range(args.requests)]
+
+    started = time.perf_counter()
+    for token in workload:
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    report("jwt.decode", args.requests, time.perf_counter() - started)
+
+    cache = TokenClaimsCache(max_entries=args.tokens * 2)
+    cache.revoke_subject("someone-else@company.com")
+    started = time.perf_counter()
+    for token in workload:
+        claims = cache.get(token)
+        if claims is None:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            cache.put(token, claims)
+        cache.is_revoked(token, claims)
+    report("cached claims", args.requests, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    main()
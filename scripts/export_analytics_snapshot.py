@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Export reporting collections to a partitioned Parquet snapshot.
+
+Streams leads, pricing plans, quotations, agreements, projects, consultant assignments,
+meetings and tasks in cursor batches into <out>/<collection>/updated_month=YYYY-MM/.
+By default only documents changed since the previous run are appended (see
+_export_state.json); --full rewrites every collection. Reads go to a secondary when
+the deployment has one, so the export stays off the primary.
+
+Load a collection with analytics_export.read_snapshot(out, "leads").
+
+Usage: python scripts/export_analytics_snapshot.py [--out analytics_snapshot] [--full]
+       [--collections leads,quotations] [--batch-size 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from dotenv import load_dotenv  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from analytics_export import SNAPSHOT_COLLECTIONS, export_snapshot  # noqa: E402
+
+load_dotenv(Path(__file__).parent.parent / 'backend' / '.env')
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'sales_funnel_db')
+
+async def run(args):
+    client = AsyncIOMotorClient(MONGO_URL, readPreference=args.read_preference)
+    try:
+        started = time.perf_counter()
+        summary = await export_snapshot(
+            client[DB_NAME],
+            args.out,
+            collections=args.collections.split(",") if args.collections else None,
+            incremental=not args.full,
+            batch_size=args.batch_size
+        )
+    finally:
+        client.close()
+
+    for name, result in summary.items():
+        print(f"{name:<24} {result['mode']:<12} {result['documents']:>9,} documents")
+    print(f"Snapshot written to {args.out} in {time.perf_counter() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=os.environ.get('ANALYTICS_SNAPSHOT_DIR', 'analytics_snapshot'))
+    parser.add_argument("--full", action="store_true", help="Rewrite every collection instead of appending changes")
+    parser.add_argument("--collections", help=f"Comma-separated subset of: {', '.join(SNAPSHOT_COLLECTIONS)}")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--read-preference", default="secondaryPreferred")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()